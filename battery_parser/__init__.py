@@ -1,8 +1,55 @@
-from . import exporting
-from . import importing
-from . import modifications
-from . import statistics
-from .exporting import save_sequences
-from .importing import list_files, import_xls
-from .modifications import rename_columns, parse_time, extract_sequences
-from .statistics import generate_statistics, find_pattern
+"""
+Parsing, processing and statistics of battery cycling data.
+Submodules and public names are imported on first access, so tools that use only
+battery_parser.files (or the job runner) start without importing pandas.
+"""
+import importlib
+
+_submodules = ['benchmarks', 'cache', 'downsampling', 'experiment', 'exporting', 'files', 'fitting', 'importing', 'jobs',
+               'modifications', 'parallel', 'pipeline', 'profiling', 'statistics', 'store']
+
+_exports = {
+    'Experiment':'experiment',
+    'ExperimentSet':'experiment',
+    'save_sequences':'exporting',
+    'save_sequence_tensor':'exporting',
+    'load_sequence_tensor':'exporting',
+    'list_files':'importing',
+    'import_xls':'importing',
+    'import_ndax':'importing',
+    'Profiler':'profiling',
+    'extract_sequences_parallel':'parallel',
+    'SharedFrame':'parallel',
+    'Prefetcher':'pipeline',
+    'run_pipeline':'pipeline',
+    'rename_columns':'modifications',
+    'parse_time':'modifications',
+    'extract_sequences':'modifications',
+    'segment_steps':'modifications',
+    'coulomb_counting':'modifications',
+    'save_step_store':'store',
+    'read_steps':'store',
+    'fit_degradation':'fitting',
+    'predict_lifetime':'fitting',
+    'generate_statistics':'statistics',
+    'find_pattern':'statistics',
+    'find_segments':'statistics',
+    'StepPattern':'statistics',
+    'StatisticsCache':'statistics',
+}
+
+__all__ = _submodules + list(_exports)
+
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module(f'.{name}', __name__)
+    if name in _exports:
+        value = getattr(importlib.import_module(f'.{_exports[name]}', __name__), name)
+        globals()[name] = value  # next access does not go through __getattr__
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
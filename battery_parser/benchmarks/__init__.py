@@ -0,0 +1,2 @@
+from .harness import run_benchmarks, benchmark, compare, measure
+from .synthetic import generate_cycling_data, to_cycler_export, write_cycling_xlsx
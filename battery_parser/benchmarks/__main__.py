@@ -0,0 +1,47 @@
+"""
+Run benchmarks from command line:
+    python -m battery_parser.benchmarks --cycles 20 --rows-per-step 1000 --output results.csv
+With --baseline results are compared with previous run, exit code is 1 if regression is found.
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+from .harness import run_benchmarks, compare
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m battery_parser.benchmarks',
+                                     description='Benchmarks of battery_parser on synthetic cycling data')
+    parser.add_argument('--cycles', type=int, default=20)
+    parser.add_argument('--rows-per-step', type=int, default=1000)
+    parser.add_argument('--sampling-rate', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--xlsx-rows', type=int, default=50000)
+    parser.add_argument('--include', nargs='*', default=None, help='names of benchmarks to run')
+    parser.add_argument('--output', help='csv file to save results')
+    parser.add_argument('--baseline', help='csv file with baseline results for comparison')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(cycles=args.cycles,
+                             rows_per_step=args.rows_per_step,
+                             sampling_rate=args.sampling_rate,
+                             repeat=args.repeat,
+                             xlsx_rows=args.xlsx_rows,
+                             include=args.include)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(results)
+        if args.output:
+            results.to_csv(args.output)
+        if args.baseline:
+            comparison = compare(results, pd.read_csv(args.baseline, index_col='name'), args.tolerance)
+            print(comparison)
+            if comparison['regression'].any():
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Repeatable benchmarks for main processing functions on synthetic data.
+Every benchmark reports best wall time of several repeats, throughput (rows/s, MB/s)
+and peak memory allocated during one call (tracemalloc).
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from .synthetic import generate_cycling_data, to_cycler_export, write_cycling_xlsx
+from ..exporting import save_experiment
+from ..files.file import File
+from ..importing import import_xls
+from ..modifications import rename_columns, parse_time, extract_sequences
+from ..statistics import generate_statistics, find_pattern
+
+SEQUENCE_PATTERN = '++0-0'
+
+
+def measure(func, setup=None, repeat: int = 3):
+    """
+    Measure function call: best wall time of repeats and peak memory of one separate call
+    (tracemalloc slows down the call, so it is not used for timing).
+    Args:
+        func (callable): function with arguments returned by setup, func(*setup())
+        setup (callable): creates arguments for every call, not timed. None - no arguments
+        repeat (int): number of timed calls
+
+    Returns:
+        (best time in seconds, peak memory in bytes)
+    """
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    args = setup() if setup else ()
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def benchmark(name: str, func, setup=None, rows: int = None, nbytes: int = None, repeat: int = 3):
+    """
+    Run one benchmark and create result record.
+    Args:
+        name (str): benchmark name
+        func (callable): benchmarked function
+        setup (callable): function, that creates arguments for func
+        rows (int): number of processed rows for throughput
+        nbytes (int): number of processed bytes for throughput
+        repeat (int): number of timed calls
+
+    Returns:
+        (dict) with name, rows, MB, time_s, rows_per_s, MB_per_s, peak_memory_MB
+    """
+    best, peak = measure(func, setup, repeat)
+    megabytes = nbytes / 1024 ** 2 if nbytes else None
+    return {'name':name,
+            'rows':rows,
+            'MB':megabytes,
+            'time_s':best,
+            'rows_per_s':rows / best if rows else None,
+            'MB_per_s':megabytes / best if megabytes else None,
+            'peak_memory_MB':peak / 1024 ** 2}
+
+
+def run_benchmarks(cycles: int = 20,
+                   rows_per_step: int = 1000,
+                   sampling_rate: float = 1.0,
+                   repeat: int = 3,
+                   xlsx_rows: int = 50000,
+                   workdir: str = None,
+                   include: list[str] = None):
+    """
+    Generate synthetic data and run benchmarks for generate_statistics, find_pattern,
+    extract_sequences, rename_columns, parse_time, import_xls and file hashing.
+    import_xls is skipped (with warning) if there is no Excel writer engine.
+    Args:
+        cycles (int): number of generated cycles
+        rows_per_step (int): rows in every generated step
+        sampling_rate (float): records per second
+        repeat (int): number of timed calls for every benchmark
+        xlsx_rows (int): max rows written to Excel file for import_xls benchmark
+        workdir (str): directory for generated files, None - temporary directory
+        include (list[str]): names of benchmarks to run, None - all
+
+    Returns:
+        pd.DataFrame with benchmark results, one row per benchmark
+    """
+    data = generate_cycling_data(cycles=cycles, rows_per_step=rows_per_step, sampling_rate=sampling_rate)
+    rows = len(data)
+    nbytes = int(data.memory_usage(deep=True).sum())
+    statistics = generate_statistics(data)
+    windows = find_pattern(statistics['I_mean'], SEQUENCE_PATTERN)
+    raw, _ = to_cycler_export(data)
+
+    def renamed():
+        frame = raw.copy()
+        rename_columns(frame)
+        return frame,
+
+    benchmarks = {
+        'generate_statistics':lambda:benchmark('generate_statistics', generate_statistics,
+                                               lambda:(data,), rows, nbytes, repeat),
+        'find_pattern':lambda:benchmark('find_pattern', find_pattern,
+                                        lambda:(statistics['I_mean'], SEQUENCE_PATTERN),
+                                        len(statistics), None, repeat),
+        'extract_sequences':lambda:benchmark('extract_sequences', extract_sequences,
+                                             lambda:(data, windows, 'remove_first'), rows, nbytes, repeat),
+        'rename_columns':lambda:benchmark('rename_columns', rename_columns,
+                                          lambda:(raw.copy(),), rows, None, repeat),
+        'parse_time':lambda:benchmark('parse_time',
+                                      lambda frame:parse_time(frame, time_column='Time',
+                                                              datetime_column='Datetime'),
+                                      renamed, rows, int(raw.memory_usage(deep=True).sum()), repeat),
+    }
+
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = workdir or temporary
+        csv_path = os.path.join(directory, 'synthetic.csv')
+        xlsx_path = os.path.join(directory, 'synthetic.xlsx')
+
+        def file_hash():
+            if not os.path.exists(csv_path):
+                save_experiment(data, csv_path, index=False)
+            # File.hash is lazy, so the hash itself is timed, not creation of File
+            return benchmark('file_hash', lambda path:File(path).hash, lambda:(csv_path,),
+                             None, os.path.getsize(csv_path), repeat)
+
+        def excel_import():
+            excel_data = data.iloc[:xlsx_rows]
+            try:
+                write_cycling_xlsx(excel_data, xlsx_path)
+            except ImportError as error:
+                print(f'Warning! import_xls benchmark skipped: {error}')
+                return None
+            return benchmark('import_xls', import_xls, lambda:(xlsx_path,),
+                             len(excel_data), os.path.getsize(xlsx_path), repeat)
+
+        benchmarks['file_hash'] = file_hash
+        benchmarks['import_xls'] = excel_import
+
+        results = []
+        for name, run in benchmarks.items():
+            if include is None or name in include:
+                result = run()
+                if result is not None:
+                    results.append(result)
+    return pd.DataFrame(results).set_index('name')
+
+
+def compare(results: pd.DataFrame, baseline: pd.DataFrame, tolerance: float = 0.2):
+    """
+    Compare benchmark results with baseline results (for example, saved from previous version).
+    Benchmark is marked as regression if time increased more than tolerance (relative).
+    Args:
+        results (pd.DataFrame): current results of run_benchmarks
+        baseline (pd.DataFrame): baseline results of run_benchmarks
+        tolerance (float): allowed relative slowdown
+
+    Returns:
+        pd.DataFrame with time, baseline time, their ratio and regression flag
+    """
+    joined = results[['time_s', 'peak_memory_MB']].join(baseline[['time_s', 'peak_memory_MB']],
+                                                        rsuffix='_baseline', how='inner')
+    joined['ratio'] = joined['time_s'] / joined['time_s_baseline']
+    joined['regression'] = joined['ratio'] > 1 + tolerance
+    return joined
@@ -0,0 +1,148 @@
+"""
+Synthetic cycling data, similar to cycler exports: CC charge, CV charge, rest, CC discharge, rest.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+CYCLE_STEPS = ['CC_Chg', 'CV_Chg', 'Rest', 'CC_DChg', 'Rest']
+
+CYCLER_COLUMNS = {'Index':'Record Index',
+                  'I':'Cur(A)',
+                  'E':'Voltage(V)',
+                  'Q':'CapaCity(Ah)',
+                  'Datetime':'Absolute Time',
+                  'Time':'Relative Time(h:min:s.ms)'}
+
+EXCEL_MAX_ROWS = 1048575
+
+
+def generate_cycling_data(cycles: int = 10,
+                          rows_per_step: int = 1000,
+                          sampling_rate: float = 1.0,
+                          current: float = 1.0,
+                          e_min: float = 2.8,
+                          e_max: float = 4.2,
+                          temperature: float = 25.0,
+                          noise: float = 1e-3,
+                          start: str = '2025-01-01 00:00:00',
+                          seed: int = 0):
+    """
+    Generate synthetic cycling data with normalized column names
+    (Index, Step, Status, Time, Datetime, E, I, Q, T), like data after rename_columns and parse_time.
+    Every cycle consists of CC charge, CV charge, rest, CC discharge and rest steps,
+    every step has rows_per_step records. Time is relative time of step in seconds,
+    Q is step capacity in Ah (resets every step as in cycler exports).
+    Args:
+        cycles (int): number of cycles
+        rows_per_step (int): number of records in every step
+        sampling_rate (float): records per second
+        current (float): CC current, A
+        e_min (float): discharge cut-off voltage, V
+        e_max (float): charge (CV) voltage, V
+        temperature (float): ambient temperature, °C
+        noise (float): std of gaussian noise for voltage (V) and temperature (10 * noise °C)
+        start (str): datetime of first record
+        seed (int): random seed
+
+    Returns:
+        pd.DataFrame with synthetic data
+    """
+    rng = np.random.default_rng(seed)
+    n_steps = cycles * len(CYCLE_STEPS)
+    n_rows = n_steps * rows_per_step
+    dt = 1 / sampling_rate
+
+    step_type = np.tile(np.arange(len(CYCLE_STEPS)), cycles)
+    u = np.tile(np.linspace(0, 1, rows_per_step), n_steps).reshape(n_steps, rows_per_step)
+    kind = step_type[:, None]
+    drop = 0.05 * (e_max - e_min)
+
+    current_values = np.select([kind == 0, kind == 1, kind == 3],
+                               [np.full_like(u, current), current * np.exp(-5 * u), np.full_like(u, -current)],
+                               0.0)
+    voltage = np.select([kind == 0, kind == 1, kind == 2, kind == 3, kind == 4],
+                        [e_min + drop + (e_max - e_min - drop) * np.sqrt(u),
+                         np.full_like(u, e_max),
+                         e_max - drop * (1 - np.exp(-5 * u)),
+                         e_max - drop - (e_max - e_min - drop) * u ** 1.5,
+                         e_min + drop * (1 - np.exp(-5 * u))])
+    voltage += rng.normal(0, noise, voltage.shape)
+    capacity = np.cumsum(np.abs(current_values), axis=1) * dt / 3600
+    capacity -= capacity[:, :1]
+    temp = temperature + 2 * (current_values / current) ** 2 * (1 - np.exp(-3 * u))
+    temp += rng.normal(0, 10 * noise, temp.shape)
+
+    step_time = np.tile(np.arange(rows_per_step) * dt, n_steps)
+    total_time = np.arange(n_rows) * dt
+    data = pd.DataFrame({'Index':np.arange(1, n_rows + 1),
+                         'Step':np.repeat(np.arange(1, n_steps + 1), rows_per_step),
+                         'Status':np.array(CYCLE_STEPS)[np.repeat(step_type, rows_per_step)],
+                         'Time':step_time,
+                         'Datetime':pd.Timestamp(start) + pd.to_timedelta(total_time, unit='s'),
+                         'E':voltage.ravel(),
+                         'I':current_values.ravel(),
+                         'Q':capacity.ravel(),
+                         'T':temp.ravel()})
+    return data
+
+
+def format_time(seconds: np.ndarray):
+    """
+    Format seconds to cycler time strings 'h:mm:ss.fff'.
+    Args:
+        seconds (np.ndarray): time in seconds
+
+    Returns:
+        np.ndarray of strings
+    """
+    milliseconds = np.round(np.asarray(seconds) * 1000).astype(np.int64)
+    hours, milliseconds = np.divmod(milliseconds, 3600000)
+    minutes, milliseconds = np.divmod(milliseconds, 60000)
+    secs, milliseconds = np.divmod(milliseconds, 1000)
+    text = (pd.Series(hours).astype(str)
+            + ':' + pd.Series(minutes).astype(str).str.zfill(2)
+            + ':' + pd.Series(secs).astype(str).str.zfill(2)
+            + '.' + pd.Series(milliseconds).astype(str).str.zfill(3))
+    return text.to_numpy()
+
+
+def to_cycler_export(data: pd.DataFrame):
+    """
+    Transform generated data to raw cycler format: specific column names, time as text,
+    datetime as text and temperature in separate frame (as aux channel).
+    Args:
+        data (pd.DataFrame): data from generate_cycling_data
+
+    Returns:
+        (data, temperature) - two dataframes with raw cycler columns
+    """
+    export = data.drop(columns='T').rename(columns=CYCLER_COLUMNS)
+    export['Relative Time(h:min:s.ms)'] = format_time(data['Time'])
+    export['Absolute Time'] = data['Datetime'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    temperature = pd.DataFrame({'Record Index':data['Index'], 'T(°C)':data['T']})
+    return export, temperature
+
+
+def write_cycling_xlsx(data: pd.DataFrame, filepath: str, max_rows: int = EXCEL_MAX_ROWS):
+    """
+    Write generated data to Excel file in cycler structure: data in 'Detail_i' sheets,
+    temperature in 'DetailTemp_i' sheets, each sheet not longer than max_rows.
+    Requires Excel writer engine (openpyxl).
+    Args:
+        data (pd.DataFrame): data from generate_cycling_data
+        filepath (str): destination of Excel file
+        max_rows (int): max rows in one sheet
+
+    Returns:
+        None
+    """
+    directory = os.path.dirname(filepath)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    export, temperature = to_cycler_export(data)
+    with pd.ExcelWriter(filepath) as writer:
+        for i, start in enumerate(range(0, len(export), max_rows), 1):
+            export.iloc[start:start + max_rows].to_excel(writer, sheet_name=f'Detail_{i}', index=False)
+            temperature.iloc[start:start + max_rows].to_excel(writer, sheet_name=f'DetailTemp_{i}', index=False)
@@ -0,0 +1,268 @@
+"""
+Memory-bounded storage for loaded and computed dataframes.
+"""
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def frame_memory(value) -> int:
+    """
+    Estimate memory footprint of cached value in bytes.
+    Handles DataFrame, Series and lists/tuples/dicts of them, other objects counts as 0.
+    Python objects are measured (O(rows)) only if there are object columns or index,
+    buffers of numeric, categorical and arrow columns are counted without it.
+    Args:
+        value (): cached object
+
+    Returns:
+        (int) size in bytes
+    """
+    if isinstance(value, pd.DataFrame):
+        deep = _has_objects(value.index) or any(_is_object(dtype) for dtype in value.dtypes)
+        return int(value.memory_usage(deep=deep).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=_has_objects(value.index) or _is_object(value.dtype)))
+    if isinstance(value, (list, tuple)):
+        return sum(frame_memory(i) for i in value)
+    if isinstance(value, dict):
+        return sum(frame_memory(i) for i in value.values())
+    return 0
+
+
+def _is_object(dtype) -> bool:
+    """Values are python objects: object dtype or python-backed strings."""
+    return dtype == object or getattr(dtype, 'storage', None) == 'python'
+
+
+def _has_objects(index: pd.Index) -> bool:
+    if isinstance(index, pd.MultiIndex):
+        return any(_is_object(level.dtype) for level in index.levels)
+    return _is_object(index.dtype)
+
+
+class FrameCache:
+    """
+    LRU storage of dataframes with RAM budget. When total size of stored values exceeds
+    memory_limit, least recently used values are evicted. If cache_dir is given,
+    evicted values are spilled to disk (parquet for dataframes, pickle for anything else)
+    and read back on the next access instead of being recomputed.
+    Pinned keys (pin/unpin) are never evicted, they are still counted in memory_usage.
+    One cache is usually shared by all experiments of an experiment set.
+    Args:
+        memory_limit (int): RAM budget in bytes
+        cache_dir (str): directory for spilled values, None - evicted values are dropped
+    """
+
+    def __init__(self, memory_limit: int = 2 * 1024 ** 3, cache_dir: str = None):
+        self.memory_limit = memory_limit
+        self.cache_dir = cache_dir
+        self._values = OrderedDict()
+        self._sizes = {}
+        self._spilled = {}
+        self._pinned = {}
+        self._lock = threading.RLock()
+        if cache_dir is not None and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get(self, key, factory=None):
+        """
+        Returns value for key. Missing values are read from spill or created with factory().
+        Args:
+            key (): hashable key
+            factory (callable): function without arguments that creates value
+
+        Returns:
+            stored value
+        """
+        with self._lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                return self._values[key]
+            if key in self._spilled:
+                value = self._read_spill(self._spilled[key])
+                self._store(key, value)
+                return value
+        if factory is None:
+            raise KeyError(key)
+        value = factory()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        """Stores value under key and evicts old values if RAM budget is exceeded."""
+        with self._lock:
+            self._drop_spill(key)
+            self._store(key, value)
+
+    def pin(self, *keys):
+        """
+        Protect keys from eviction until unpin (pins are counted, keys may be stored later).
+        Used for values loaded ahead, which must stay in memory until they are used.
+        """
+        with self._lock:
+            for key in keys:
+                self._pinned[key] = self._pinned.get(key, 0) + 1
+
+    def unpin(self, *keys):
+        """Removes one pin from every key and evicts values over the budget."""
+        with self._lock:
+            for key in keys:
+                count = self._pinned.pop(key, 0) - 1
+                if count > 0:
+                    self._pinned[key] = count
+            self._evict()
+
+    def discard(self, key):
+        """Removes key from memory and from spill directory."""
+        with self._lock:
+            if key in self._values:
+                del self._values[key]
+                del self._sizes[key]
+            self._drop_spill(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._spilled):
+                self._drop_spill(key)
+            self._values.clear()
+            self._sizes.clear()
+
+    @property
+    def memory_usage(self) -> int:
+        """Total size of values resident in memory, in bytes."""
+        return sum(self._sizes.values())
+
+    def memory_of(self, *keys) -> int:
+        """Size of resident values of keys in bytes (measured once, when value is stored), 0 for others."""
+        with self._lock:
+            return sum(self._sizes.get(key, 0) for key in keys)
+
+    def resident(self):
+        """Keys of values resident in memory, from least to most recently used."""
+        return list(self._values)
+
+    def __contains__(self, key):
+        return key in self._values or key in self._spilled
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return (f"<FrameCache(resident={len(self._values)}, spilled={len(self._spilled)}, "
+                f"memory={self.memory_usage / 1024 ** 2:.4}MB, limit={self.memory_limit / 1024 ** 2:.4}MB)>")
+
+    def _store(self, key, value):
+        if key in self._values:
+            del self._values[key]
+            del self._sizes[key]
+        self._values[key] = value
+        self._sizes[key] = frame_memory(value)
+        self._evict()
+
+    def _evict(self):
+        # Last inserted value and pinned values are kept even if they alone exceed the budget
+        usage = self.memory_usage
+        for key in list(self._values)[:-1]:
+            if usage <= self.memory_limit:
+                break
+            if key in self._pinned:
+                continue
+            value = self._values.pop(key)
+            usage -= self._sizes.pop(key)
+            if self.cache_dir is not None:
+                self._spilled[key] = self._write_spill(key, value)
+
+    def _spill_path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest)
+
+    def _write_spill(self, key, value):
+        path = self._spill_path(key)
+        if isinstance(value, pd.DataFrame):
+            try:
+                value.to_parquet(path + '.parquet')
+                return path + '.parquet'
+            except (ImportError, ValueError, TypeError):
+                pass  # no parquet engine or unsupported column types - fall back to pickle
+        with open(path + '.pkl', 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path + '.pkl'
+
+    @staticmethod
+    def _read_spill(path):
+        if path.endswith('.parquet'):
+            return pd.read_parquet(path)
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def _drop_spill(self, key):
+        path = self._spilled.pop(key, None)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+
+class DiskStore:
+    """
+    Persistent key-value store of pickled values in directory, shared between processes and sessions.
+    When total size exceeds size_limit, least recently used files are deleted
+    (file modification time is updated on every read).
+    Args:
+        directory (str): store directory
+        size_limit (int): max total size in bytes, None - no limit
+    """
+
+    def __init__(self, directory: str, size_limit: int = None):
+        self.directory = directory
+        self.size_limit = size_limit
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + '.pkl')
+
+    def get(self, key, default=None):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return default
+        try:
+            os.utime(path)
+        except FileNotFoundError:  # evicted by other process
+            pass
+        return value
+
+    def put(self, key, value):
+        path = self.path(key)
+        temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+        if self.size_limit is not None:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used files until total size is under size_limit."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.size_limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
@@ -0,0 +1,318 @@
+"""
+Downsampling of long time series for plotting: Largest-Triangle-Three-Buckets (LTTB)
+and per-bucket min/max envelopes. Buckets can be aligned to step boundaries, so
+every step keeps its own points. DownsamplePyramid caches several resolutions
+for interactive zoom.
+"""
+import numpy as np
+import pandas as pd
+
+
+def step_boundaries(steps) -> np.ndarray:
+    """
+    Positions where step value changes (including 0 and len(steps)).
+    Args:
+        steps (array-like): step column
+
+    Returns:
+        np.ndarray of boundary positions
+    """
+    steps = np.asarray(steps)
+    if steps.size == 0:
+        return np.array([0])
+    changes = np.flatnonzero(steps[1:] != steps[:-1]) + 1
+    return np.concatenate([[0], changes, [steps.size]])
+
+
+def merge_boundaries(boundaries, max_segments: int) -> np.ndarray:
+    """
+    Keep no more than max_segments segments: consecutive small steps are merged, so that
+    point budget is not spent on thousands of tiny steps. Boundaries nearest after every
+    n / max_segments points are kept, long steps keep their own boundaries.
+    Args:
+        boundaries (array-like): segment boundaries from step_boundaries
+        max_segments (int): maximal number of segments
+
+    Returns:
+        np.ndarray of boundaries (subset of given, with 0 and n)
+    """
+    boundaries = np.asarray(boundaries, dtype=np.int64)
+    max_segments = max(1, max_segments)
+    if len(boundaries) - 1 <= max_segments:
+        return boundaries
+    grid = np.linspace(boundaries[0], boundaries[-1], max_segments + 1)
+    kept = boundaries[np.clip(np.searchsorted(boundaries, grid), 0, len(boundaries) - 1)]
+    return np.unique(np.concatenate([boundaries[[0, -1]], kept]))
+
+
+def _allocate(lengths: np.ndarray, total: int, minimum: int) -> np.ndarray:
+    """Share total between segments proportionally to lengths: minimum per segment, sum not above total."""
+    base = np.minimum(lengths, minimum)
+    rest = total - base.sum()
+    extra = lengths - base
+    if rest <= 0 or extra.sum() == 0:
+        return base
+    return np.minimum(lengths, base + (extra * rest) // extra.sum())
+
+
+def bucket_edges(n: int, n_buckets: int, boundaries=None) -> np.ndarray:
+    """
+    Split n points to no more than n_buckets consecutive buckets. If boundaries are given,
+    buckets do not cross them: every segment gets number of buckets proportional to its
+    length (at least one), small steps are merged if there are more steps than buckets.
+    Args:
+        n (int): number of points
+        n_buckets (int): number of buckets
+        boundaries (array-like): segment boundaries from step_boundaries
+
+    Returns:
+        np.ndarray of bucket edges (first is 0, last is n)
+    """
+    n_buckets = max(1, min(n_buckets, n))
+    if boundaries is None:
+        return np.unique(np.linspace(0, n, n_buckets + 1).astype(np.int64))
+    boundaries = merge_boundaries(boundaries, n_buckets)
+    lengths = np.diff(boundaries)
+    per_segment = np.maximum(_allocate(lengths, n_buckets, 1), 1)
+    # positions inside every segment: start + length * k / buckets, k = 0..buckets-1
+    segment = np.repeat(np.arange(len(lengths)), per_segment)
+    k = _ranges(per_segment)
+    edges = boundaries[:-1][segment] + (lengths[segment] * k) // per_segment[segment]
+    return np.unique(np.concatenate([edges, [n]]))
+
+
+def _first_of_max(values: np.ndarray, offsets: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Position of first maximal value in every consecutive group of values (groups are not empty)."""
+    group = np.repeat(np.arange(len(offsets)), counts)
+    hits = np.flatnonzero(values == np.repeat(np.maximum.reduceat(values, offsets), counts))
+    _, first = np.unique(group[hits], return_index=True)
+    return hits[first]
+
+
+def minmax(y, n_points: int, boundaries=None) -> np.ndarray:
+    """
+    Positions of first, minimal and maximal value in every bucket (envelope), no more than
+    n_points in total. Fully vectorized.
+    Args:
+        y (array-like): values
+        n_points (int): wanted number of points (three per bucket)
+        boundaries (array-like): step boundaries for buckets
+
+    Returns:
+        np.ndarray of sorted unique positions
+    """
+    y = np.asarray(y, dtype=float)
+    n = y.size
+    if n <= n_points:
+        return np.arange(n)
+    edges = bucket_edges(n, n_points // 3, boundaries)
+    starts, counts = edges[:-1], np.diff(edges)
+    positions = [starts]
+    for sign in (-1, 1):
+        values = np.nan_to_num(sign * y, nan=-np.inf)
+        positions.append(starts[0] + _first_of_max(values[starts[0]:], starts - starts[0], counts))
+    return np.unique(np.concatenate(positions))
+
+
+def lttb(x, y, n_points: int, boundaries=None) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling: first and last points are kept, from every
+    bucket between them the point forming the largest triangle with average of previous bucket
+    and average of next bucket is selected (averages instead of previously selected point make
+    buckets independent, so all buckets are computed at once).
+    With boundaries every step is downsampled separately (first and last point of every step are
+    kept, other points are shared proportionally to step length), small steps are merged if they do not
+    fit in n_points. Total number of points is not above n_points.
+    Args:
+        x (array-like): x values (time)
+        y (array-like): y values
+        n_points (int): wanted number of points
+        boundaries (array-like): step boundaries
+
+    Returns:
+        np.ndarray of sorted positions
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = x.size
+    if n <= n_points:
+        return np.arange(n)
+    if n_points < 3:
+        return np.array([0, n - 1][:n_points], dtype=np.int64)
+    if boundaries is None or len(boundaries) <= 2:
+        boundaries = np.array([0, n])
+    boundaries = merge_boundaries(boundaries, n_points // 3)
+    starts, lengths = boundaries[:-1], np.diff(boundaries)
+    points = _allocate(lengths, n_points, 2)
+
+    full = points >= lengths  # short steps are kept completely
+    selected = [np.repeat(starts[full], lengths[full]) + _ranges(lengths[full])]
+    split = ~full
+    selected += [starts[split], starts[split] + lengths[split] - 1]
+    n_buckets = np.where(split, points - 2, 0)
+    if n_buckets.sum():
+        segment = np.repeat(np.arange(len(starts)), n_buckets)
+        j = _ranges(n_buckets)
+        m, inner = n_buckets[segment], lengths[segment] - 2
+        bucket_start = starts[segment] + 1 + (inner * j) // m
+        bucket_stop = starts[segment] + 1 + (inner * (j + 1)) // m
+        counts = bucket_stop - bucket_start
+
+        def centroid(values):
+            finite = np.isfinite(values)
+            total = np.concatenate([[0.0], np.cumsum(np.where(finite, values, 0.0))])
+            number = np.concatenate([[0], np.cumsum(finite)])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return (total[bucket_stop] - total[bucket_start]) / (number[bucket_stop] - number[bucket_start])
+
+        mean_x, mean_y = centroid(x), centroid(y)
+        first, last = j == 0, j == m - 1
+        previous_x = np.where(first, x[starts[segment]], np.roll(mean_x, 1))
+        previous_y = np.where(first, y[starts[segment]], np.roll(mean_y, 1))
+        segment_end = starts[segment] + lengths[segment] - 1
+        next_x = np.where(last, x[segment_end], np.roll(mean_x, -1))
+        next_y = np.where(last, y[segment_end], np.roll(mean_y, -1))
+
+        bucket = np.repeat(np.arange(len(counts)), counts)
+        rows = bucket_start[bucket] + _ranges(counts)
+        area = np.abs((previous_x[bucket] - next_x[bucket]) * (y[rows] - previous_y[bucket])
+                      - (previous_x[bucket] - x[rows]) * (next_y[bucket] - previous_y[bucket]))
+        area = np.where(np.isnan(area), -np.inf, area)
+        offsets = np.cumsum(counts) - counts
+        selected.append(rows[_first_of_max(area, offsets, counts)])
+    return np.unique(np.concatenate(selected).astype(np.int64))
+
+
+def _ranges(counts: np.ndarray) -> np.ndarray:
+    """Concatenated ranges 0..count-1 for every count."""
+    counts = np.asarray(counts, dtype=np.int64)
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def select_points(data: pd.DataFrame,
+                  y: str | list[str],
+                  x: str = None,
+                  n_points: int = 2000,
+                  method: str = 'lttb',
+                  step_column: str = None) -> np.ndarray:
+    """
+    Positions of rows selected for plotting, see downsample.
+    """
+    if isinstance(y, str):
+        y = [y]
+    x_values = np.arange(len(data), dtype=float) if x is None else _numeric(data[x])
+    steps = data[step_column].to_numpy() if step_column else None
+    return _select(x_values, [data[column].to_numpy(dtype=float) for column in y], steps, n_points, method)
+
+
+def _select(x_values: np.ndarray, y_values: list, steps, n_points: int, method: str) -> np.ndarray:
+    boundaries = step_boundaries(steps) if steps is not None else None
+    selected = [np.array([], dtype=np.int64)]
+    for values in y_values:
+        match method:
+            case 'lttb':
+                selected.append(lttb(x_values, values, n_points, boundaries))
+            case 'minmax':
+                selected.append(minmax(values, n_points, boundaries))
+            case _:
+                raise ValueError(f'Unknown downsampling method {method}')
+    return np.unique(np.concatenate(selected))
+
+
+def downsample(data: pd.DataFrame,
+               y: str | list[str],
+               x: str = None,
+               n_points: int = 2000,
+               method: str = 'lttb',
+               step_column: str = None):
+    """
+    Select rows of data for plotting. For several y columns union of selected rows is returned.
+    Args:
+        data (pd.DataFrame): experiment
+        y (str|list[str]): plotted columns
+        x (str): x column (monotonic time or datetime), None - row number
+        n_points (int): wanted number of points for every y column
+        method (str): 'lttb' or 'minmax'
+        step_column (str): column for step boundaries, None - buckets ignore steps
+
+    Returns:
+        pd.DataFrame with selected rows
+    """
+    return data.iloc[select_points(data, y, x, n_points, method, step_column)]
+
+
+def _numeric(series: pd.Series) -> np.ndarray:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype('datetime64[ns]').to_numpy().astype(np.int64).astype(float)
+    return series.to_numpy(dtype=float)
+
+
+class DownsamplePyramid:
+    """
+    Multi-resolution views of experiment. Level 0 is raw data, every next level has
+    factor times fewer points (downsampled from previous level with method, so building a level
+    costs as much as its previous level, not as raw data), levels are computed on
+    first request and cached as row positions. view() selects the coarsest level, which still has
+    enough points in requested x range, so zooming never ships more than about n_points points.
+    Args:
+        data (pd.DataFrame): experiment
+        y (str|list[str]): plotted columns
+        x (str): monotonic x column (datetime or total time), None - row number
+        step_column (str): keep step boundaries in buckets
+        method (str): 'lttb' or 'minmax'
+        factor (int): reduction factor between levels
+        min_points (int): size of the coarsest level
+    """
+
+    def __init__(self, data: pd.DataFrame, y, x: str = None, step_column: str = None,
+                 method='minmax', factor: int = 4, min_points: int = 2000):
+        self.data = data
+        self.y = [y] if isinstance(y, str) else list(y)
+        self.x = x
+        self.step_column = step_column
+        self.method = method
+        self.factor = factor
+        self.x_values = np.arange(len(data)) if x is None else data[x].to_numpy()
+        self._x_numeric = np.arange(len(data), dtype=float) if x is None else _numeric(data[x])
+        self._y_values = [data[column].to_numpy(dtype=float) for column in self.y]
+        self._steps = data[step_column].to_numpy() if step_column else None
+        self.levels = {0:np.arange(len(data))}
+        n_levels = 0
+        while len(data) / factor ** (n_levels + 1) >= min_points:
+            n_levels += 1
+        self.n_levels = n_levels
+
+    def level(self, number: int) -> np.ndarray:
+        """Row positions of level (0 - raw data)."""
+        if number not in self.levels:
+            previous = self.level(number - 1)
+            n_points = max(1, len(self.data) // self.factor ** number)
+            steps = None if self._steps is None else self._steps[previous]
+            selected = _select(self._x_numeric[previous], [values[previous] for values in self._y_values],
+                               steps, n_points, self.method)
+            self.levels[number] = previous[selected]
+        return self.levels[number]
+
+    def view(self, x_min=None, x_max=None, n_points: int = 2000) -> pd.DataFrame:
+        """
+        Rows for x range with no more than about n_points points.
+        Args:
+            x_min (): start of range (value of x column), None - from start
+            x_max (): end of range, None - to end
+            n_points (int): max number of points
+
+        Returns:
+            pd.DataFrame for plotting
+        """
+        for number in range(self.n_levels, -1, -1):
+            positions = self.level(number)
+            x_values = self.x_values[positions]
+            start = 0 if x_min is None else np.searchsorted(x_values, x_min, side='left')
+            stop = len(positions) if x_max is None else np.searchsorted(x_values, x_max, side='right')
+            positions = positions[start:stop]
+            if len(positions) >= n_points or number == 0:
+                break
+        selection = self.data.iloc[positions]
+        if len(selection) > n_points:
+            selection = downsample(selection, self.y, self.x, n_points, self.method, self.step_column)
+        return selection
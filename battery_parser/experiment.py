@@ -0,0 +1,250 @@
+"""
+Experiment objects with lazily loaded raw data, statistics and segments.
+"""
+import os
+from collections.abc import MutableMapping
+
+import pandas as pd
+
+from .cache import FrameCache
+from .exporting import load_experiment
+from .importing import import_ndax, import_xls
+from .statistics import generate_statistics, find_segments
+
+
+def load_data(path: str, **kwargs):
+    """
+    Load raw cycling data by file extension: csv, xls/xlsx, ndax or nda (requires NewareNDA).
+    Args:
+        path (str): path to experiment file
+        **kwargs (): arguments for specific import function
+
+    Returns:
+        pd.DataFrame with raw data
+    """
+    extension = os.path.splitext(path)[-1].lower()
+    match extension:
+        case '.csv':
+            return load_experiment(path, **kwargs)
+        case '.xls' | '.xlsx':
+            return import_xls(path, **kwargs)
+        case '.ndax':
+            return import_ndax(path, **kwargs)
+        case '.nda':
+            import NewareNDA
+            return NewareNDA.read(path, **kwargs)
+        case _:
+            raise ValueError(f'Unknown experiment file format {extension}')
+
+
+class Segments(MutableMapping):
+    """
+    Dict-like view on experiment segments. Segment patterns are given as
+    name:(column, values) and found in statistics on first access.
+    Found segments are stored in experiment cache.
+    """
+
+    def __init__(self, experiment, patterns: dict = None):
+        self._experiment = experiment
+        self.patterns = dict(patterns) if patterns else {}
+        self._names = dict.fromkeys(self.patterns)
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        return self._experiment.cache.get(self._experiment.cache_key('segments', name),
+                                          lambda: self._find(name))
+
+    def __setitem__(self, name, value):
+        self._names[name] = None
+        self._experiment.cache.put(self._experiment.cache_key('segments', name), value)
+
+    def __delitem__(self, name):
+        del self._names[name]
+        self.patterns.pop(name, None)
+        self._experiment.cache.discard(self._experiment.cache_key('segments', name))
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
+
+    def _find(self, name):
+        if name not in self.patterns:
+            raise KeyError(f'Segment {name} was dropped from cache and has no pattern to recompute.')
+        column, values = self.patterns[name]
+        return find_segments(self._experiment.statistics, column, values)
+
+
+class Experiment:
+    """
+    Single experiment (pouch) with lazy properties:
+        data - raw data, loaded from path with loader on first access;
+        statistics - loaded from statistics_path or generated from data with statistics_pattern;
+        segments - dict-like of segments found in statistics by segment_patterns.
+    All values are stored in cache (FrameCache), so they can be evicted when memory budget is
+    exceeded and reloaded/recomputed (or read from spill) on the next access.
+    Args:
+        path (str): path to raw data file
+        pouch (str): pouch name, used as experiment key
+        channel (str): cycler channel
+        loader (callable): function(path) -> pd.DataFrame, default load_data by file extension
+        statistics_path (str): path to already generated statistics csv
+        statistics_pattern (dict): pattern for generate_statistics
+        group_marker (str): group marker for generate_statistics
+        segment_patterns (dict): name:(column, values) for find_segments
+        cache (FrameCache): cache for loaded data, usually shared by experiment set
+    """
+
+    def __init__(self, path=None, pouch=None, channel=None, *,
+                 loader=None,
+                 statistics_path=None,
+                 statistics_pattern=None,
+                 group_marker='Step',
+                 segment_patterns=None,
+                 cache: FrameCache = None):
+        self.path = path
+        self.pouch = pouch
+        self.channel = channel
+        self.loader = load_data if loader is None else loader
+        self.statistics_path = statistics_path
+        self.statistics_pattern = statistics_pattern
+        self.group_marker = group_marker
+        self.cache = FrameCache() if cache is None else cache
+        self.segments = Segments(self, segment_patterns)
+
+    @property
+    def key(self):
+        return self.pouch if self.pouch is not None else self.path
+
+    def cache_key(self, *parts):
+        return (self.key,) + parts
+
+    @property
+    def data(self) -> pd.DataFrame:
+        return self.cache.get(self.cache_key('data'), self._load_data)
+
+    @data.setter
+    def data(self, value):
+        self.cache.put(self.cache_key('data'), value)
+
+    @property
+    def statistics(self) -> pd.DataFrame:
+        return self.cache.get(self.cache_key('statistics'), self._load_statistics)
+
+    @statistics.setter
+    def statistics(self, value):
+        self.cache.put(self.cache_key('statistics'), value)
+
+    def release(self, *names):
+        """
+        Drop stored values (all by default: 'data', 'statistics', segments) from cache.
+        """
+        names = names or ('data', 'statistics', 'segments')
+        for name in names:
+            if name == 'segments':
+                for segment in self.segments:
+                    self.cache.discard(self.cache_key('segments', segment))
+            else:
+                self.cache.discard(self.cache_key(name))
+
+    def _load_data(self):
+        if self.path is None:
+            raise ValueError(f'Experiment {self.key} has no path to load data.')
+        return self.loader(self.path)
+
+    def _load_statistics(self):
+        if self.statistics_path is not None:
+            return load_experiment(self.statistics_path)
+        kwargs = {'group_marker': self.group_marker}
+        if self.statistics_pattern is not None:
+            kwargs['statistics_pattern'] = self.statistics_pattern
+        return generate_statistics(self.data, **kwargs)
+
+    def __repr__(self):
+        return f"<Experiment(pouch={self.pouch}, channel={self.channel}, path={self.path})>"
+
+
+class ExperimentSet(dict):
+    """
+    Dict of experiments by key (pouch), which share one FrameCache with given RAM budget.
+    Iterating over hundreds of experiments keeps only the most recently used data in memory.
+    Args:
+        memory_limit (int): RAM budget in bytes for all data of the set
+        cache_dir (str): directory for spilled data, None - evicted data is reloaded from source
+        **experiment_kwargs (): default arguments for every Experiment of set
+    """
+
+    def __init__(self, memory_limit: int = 2 * 1024 ** 3, cache_dir: str = None, **experiment_kwargs):
+        super().__init__()
+        self.cache = FrameCache(memory_limit=memory_limit, cache_dir=cache_dir)
+        self.experiment_kwargs = experiment_kwargs
+
+    def add(self, path=None, pouch=None, channel=None, **kwargs) -> Experiment:
+        """Creates experiment with shared cache and adds it to set."""
+        arguments = dict(self.experiment_kwargs)
+        arguments.update(kwargs)
+        experiment = Experiment(path=path, pouch=pouch, channel=channel, cache=self.cache, **arguments)
+        self[experiment.key] = experiment
+        return experiment
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame,
+                   path_column='path',
+                   pouch_column='pouch',
+                   channel_column='channel',
+                   **kwargs):
+        """
+        Creates experiment set from table of files (for example result of Regex_parse merged
+        with mapping). kwargs goes to ExperimentSet.
+        """
+        experiments = cls(**kwargs)
+        columns = [path_column, pouch_column, channel_column]
+        for path, pouch, channel in frame.reindex(columns=columns).itertuples(index=False):
+            experiments.add(path=path, pouch=pouch, channel=channel)
+        return experiments
+
+    def prefetch(self, names=('data',), prefetch: int = 2, workers: int = None, memory_limit: int = None):
+        """
+        Iterate over experiments, loading values (attributes 'data', 'statistics') of next experiments
+        in reader threads while the current one is processed, see pipeline.Prefetcher.
+        Loaded values are pinned in cache until the experiment is processed (the next one is requested),
+        so they are not evicted before use, and read-ahead is limited to half of cache budget.
+        Args:
+            names (tuple[str]): attributes loaded ahead
+            prefetch (int): max number of experiments read ahead
+            workers (int): number of reader threads
+            memory_limit (int): RAM budget for read-ahead values, default (and maximum) half of cache budget
+
+        Returns:
+            generator of experiments
+        """
+        from .pipeline import Prefetcher
+        budget = self.cache.memory_limit // 2
+        memory_limit = budget if memory_limit is None else min(memory_limit, budget)
+        pinned = []
+
+        def loader(experiment):
+            keys = [experiment.cache_key(name) for name in names]
+            self.cache.pin(*keys)  # before loading, so values are not evicted by other readers
+            pinned.append(keys)
+            for name in names:
+                getattr(experiment, name)
+            return self.cache.memory_of(*keys)  # values stay pinned in cache, sizes are not measured again
+
+        iterator = iter(Prefetcher(self.values(), loader, prefetch=prefetch, workers=workers,
+                                   memory_limit=memory_limit, size=int))
+        try:
+            for experiment, _ in iterator:
+                yield experiment
+                keys = [experiment.cache_key(name) for name in names]
+                pinned.remove(keys)
+                self.cache.unpin(*keys)
+        finally:
+            iterator.close()  # waits for running reads
+            for keys in pinned:
+                self.cache.unpin(*keys)
+
+    def __repr__(self):
+        return f"<ExperimentSet(experiments={len(self)}, cache={self.cache})>"
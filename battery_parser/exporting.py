@@ -1,8 +1,15 @@
+import importlib.util
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
 
+from .profiling import profiled
 
+
+@profiled(writes='filepath')
 def save_experiment(data: pd.DataFrame, filepath: str, **kwargs):
     """
     Saves experiment as csv to given destination. kwargs for saving function df.to_csv
@@ -21,10 +28,93 @@ def save_experiment(data: pd.DataFrame, filepath: str, **kwargs):
     data.to_csv(filepath, **kwargs)
 
 
+@profiled(reads='filepath')
 def load_experiment(filepath: str, **kwargs):
     return pd.read_csv(filepath, **kwargs)
 
 
+def _read_csv_fast(filepath: str, index_col=None, **kwargs):
+    """
+    Read csv with pyarrow engine (multithreaded, releases GIL), fall back to default engine.
+    Names are the same for both engines: blank header is 'Unnamed: i' column (i - position in file),
+    or unnamed index level if selected by index_col (name or position, as for pd.read_csv).
+    """
+    if importlib.util.find_spec('pyarrow') is not None:
+        try:
+            frame = pd.read_csv(filepath, engine='pyarrow', **kwargs)
+        except ValueError:  # options not supported by pyarrow engine
+            pass
+        else:
+            blank = {f'Unnamed: {i}' for i, column in enumerate(frame.columns) if column == ''}
+            frame.columns = [f'Unnamed: {i}' if column == '' else column for i, column in enumerate(frame.columns)]
+            if index_col is None or index_col is False:
+                return frame
+            keys = index_col if isinstance(index_col, list) else [index_col]
+            keys = [frame.columns[key] if isinstance(key, int) else key for key in keys]
+            frame = frame.set_index(keys)
+            frame.index.names = [None if name in blank else name for name in frame.index.names]
+            return frame
+    return pd.read_csv(filepath, index_col=index_col, **kwargs)
+
+
+def _pouch(filepath: str) -> str:
+    return os.path.splitext(os.path.basename(filepath))[0]
+
+
+@profiled
+def load_experiment_set(directory: str,
+                        filetype: str = 'csv',
+                        index_col=None,
+                        workers: int = None,
+                        as_dict: bool = False,
+                        recursive: bool = False,
+                        exclude: tuple = ('summary',),
+                        **kwargs):
+    """
+    Load all files (per-pouch statistics) from directory concurrently in thread pool and
+    concatenate them to one dataframe indexed by (pouch, step). Pouch is file name without
+    extension, pouch index level is categorical. Files are read with pyarrow csv reader if installed.
+    Args:
+        directory (str): directory with files
+        filetype (str): file extension
+        index_col (str|int): column (name or position, as for pd.read_csv) used as step level of index,
+            None - row number in file
+        workers (int): number of reading threads, default ThreadPoolExecutor default
+        as_dict (bool): also return dict pouch:dataframe of row slices of concatenated frame
+        recursive (bool): also load files of subdirectories (as list_files), files with the same
+            name in different subdirectories raise ValueError
+        exclude (tuple): file names (without extension) to skip, default - report of run_job
+        **kwargs (): arguments for pd.read_csv
+
+    Returns:
+        pd.DataFrame, or (pd.DataFrame, dict) if as_dict
+    """
+    if recursive:
+        from .importing import list_files
+        files = list_files(directory, filetype)
+    else:
+        files = sorted(entry.path for entry in os.scandir(directory)
+                       if entry.is_file() and os.path.splitext(entry.name)[-1] == '.' + filetype)
+    files = [filepath for filepath in files if _pouch(filepath) not in exclude]
+    pouches = [_pouch(filepath) for filepath in files]
+    duplicates = sorted(pouch for pouch, count in pd.Series(pouches).value_counts().items() if count > 1)
+    if duplicates:
+        raise ValueError(f'Files of several directories have the same pouch names: {duplicates}')
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        frames = list(executor.map(lambda filepath:_read_csv_fast(filepath, index_col=index_col, **kwargs), files))
+    if not frames:
+        return (pd.DataFrame(), {}) if as_dict else pd.DataFrame()
+    step_name = frames[0].index.name if index_col is not None and frames[0].index.name is not None else 'step'
+    data = pd.concat(frames, keys=pouches, names=['pouch', step_name])
+    data.index = data.index.set_levels(pd.CategoricalIndex(data.index.levels[0]), level='pouch')
+    if not as_dict:
+        return data
+    bounds = np.cumsum([0] + [len(frame) for frame in frames])
+    views = {pouch:data.iloc[start:stop] for pouch, start, stop in zip(pouches, bounds[:-1], bounds[1:])}
+    return data, views
+
+
+@profiled
 def save_sequences(splits_data: list[pd.DataFrame], dir_path: str, **kwargs):
     """
     Saves sequence of dataframes to given directory, as i.csv files where i -
@@ -41,3 +131,90 @@ def save_sequences(splits_data: list[pd.DataFrame], dir_path: str, **kwargs):
         filename = f'{i}.csv'
         save_path = os.path.join(dir_path, filename)
         save_experiment(experiment, save_path, **kwargs)
+
+
+def _sidecar_paths(filepath: str):
+    root = os.path.splitext(filepath)[0]
+    return root + '_mask.npy', root + '.json'
+
+
+@profiled(writes='filepath')
+def save_sequence_tensor(sequences: list[pd.DataFrame],
+                         filepath: str,
+                         channels: list[str],
+                         grid_column: str = None,
+                         n_points: int = None,
+                         step_column: str = 'Step',
+                         dtype='float32'):
+    """
+    Saves sequences as one fixed-shape tensor (sequence x timestep x channel) in .npy file,
+    which can be memory-mapped by training loaders without parsing.
+    Without grid_column sequences are padded with zeros to the longest sequence (or cut to n_points).
+    With grid_column (for example 'Time' or 'Q') every sequence is resampled (linear interpolation)
+    onto common grid from 0 to the longest sequence extent with n_points points, grid values are
+    relative to the first value of every sequence. Points beyond sequence length/extent are masked.
+    Also writes '<name>_mask.npy' (bool, sequence x timestep) and '<name>.json' with channels,
+    lengths, source steps and grid.
+    Args:
+        sequences (list[pd.DataFrame]): sequences, for example from extract_sequences
+        filepath (str): destination .npy file
+        channels (list[str]): columns to save
+        grid_column (str): column for common grid, None - padding
+        n_points (int): number of timesteps, default - length of the longest sequence
+        step_column (str): column with source steps for sidecar, skipped if not found
+        dtype (): tensor dtype
+
+    Returns:
+        None
+    """
+    directory = os.path.dirname(filepath)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    lengths = [len(sequence) for sequence in sequences]
+    n_points = n_points or max(lengths, default=0)
+    meta = {'channels':list(channels), 'lengths':lengths, 'grid_column':grid_column, 'grid':None}
+    if grid_column is not None:
+        extents = [float(s[grid_column].iloc[-1] - s[grid_column].iloc[0]) if len(s) else 0.0 for s in sequences]
+        grid = np.linspace(0, max(extents, default=0.0), n_points)
+        meta['grid'] = grid.tolist()
+    meta['steps'] = [pd.unique(s[step_column]).tolist() if step_column in s.columns else None for s in sequences]
+
+    mask_path, meta_path = _sidecar_paths(filepath)
+    shape = (len(sequences), n_points, len(channels))
+    tensor = np.lib.format.open_memmap(filepath, mode='w+', dtype=dtype, shape=shape)
+    mask = np.lib.format.open_memmap(mask_path, mode='w+', dtype=bool, shape=shape[:2])
+    for i, sequence in enumerate(sequences):
+        values = sequence[channels].to_numpy(dtype=float)
+        if grid_column is None:
+            length = min(len(values), n_points)
+            tensor[i, :length] = values[:length]
+            mask[i, :length] = True
+        elif len(values):
+            x = sequence[grid_column].to_numpy(dtype=float)
+            x = x - x[0]
+            order = np.argsort(x, kind='stable')
+            inside = grid <= x[order[-1]]
+            for channel in range(len(channels)):
+                tensor[i, inside, channel] = np.interp(grid[inside], x[order], values[order, channel])
+            mask[i] = inside
+    tensor.flush()
+    mask.flush()
+    del tensor, mask
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, default=str)
+
+
+def load_sequence_tensor(filepath: str, mmap_mode='r'):
+    """
+    Loads tensor saved by save_sequence_tensor (memory-mapped by default).
+    Args:
+        filepath (str): path to .npy tensor
+        mmap_mode (): mode for np.load, None - load to memory
+
+    Returns:
+        (tensor, mask, meta) - arrays and dict from json sidecar
+    """
+    mask_path, meta_path = _sidecar_paths(filepath)
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    return np.load(filepath, mmap_mode=mmap_mode), np.load(mask_path, mmap_mode=mmap_mode), meta
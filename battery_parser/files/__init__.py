@@ -0,0 +1,16 @@
+"""
+Работа с файлами архива экспериментов: поиск дубликатов, перемещение, переименование папок.
+Подпакет использует только стандартную библиотеку (без pandas), FileIndex (нужен NumPy)
+импортируется при первом обращении.
+"""
+from .file import File, FileInfo, FileAction
+from .directory import FileList, DirectoryIter, delete_duplicates, remove_empty_dirs, remove_existing_files
+from .refactor_dirs import rename_dirs
+from .transaction import Plan, Transaction, run_plan
+
+
+def __getattr__(name):
+    if name == 'FileIndex':
+        from .index import FileIndex
+        return FileIndex
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
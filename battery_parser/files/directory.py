@@ -1,10 +1,10 @@
 """
 Модуль предназначен для работы с файлами: сортировки, переименования, перемещения, удаления.
 """
-from itertools import combinations, product
 from pathlib import Path
 
-from file import File
+from .file import File
+from .transaction import Plan, run_plan, file_hash, file_size, file_size_descending
 
 
 class FileList(list):
@@ -14,17 +14,14 @@ class FileList(list):
     file_type = File
 
     def __init__(self, *args, **kwargs):
-        self._check_type(args)
-        self._check_type(kwargs.values())
-
         super().__init__(*args, **kwargs)
+        self._check_type(self)
 
-    def _check_type(self, el):
-        if hasattr(el, '__iter__'):
-            for i in el:
-                self._check_type(i)
-        else:
-            if not isinstance(el, self.file_type):
+    def _check_type(self, elements):
+        """Проверка типа элементов (один проход по списку, без рекурсии)."""
+        file_type = self.file_type
+        for el in elements:
+            if not isinstance(el, file_type):
                 raise TypeError('Элемент не принадлежит нужному типу.')
 
 
@@ -61,11 +58,15 @@ class DirectoryIter:
 
 
 def delete_duplicates(source: DirectoryIter,
-                      duplicate_key=lambda x:x.hash,
-                      delete_key=lambda x:-x.size):
+                      duplicate_key=file_hash,
+                      delete_key=file_size_descending,
+                      journal: str = None,
+                      workers: int = 8):
     """
     Функция принимает список файлов (итерируемый, наследуемый
-    от FileList или DirectoryIter).
+    от FileList или DirectoryIter, или FileIndex). Удаление выполняется по плану (см. transaction.Plan).
+    Для FileIndex с ключами по умолчанию или строковыми (duplicate_key='hash', delete_key='-size')
+    дубликаты ищутся по массивам индекса.
 
     :param source:
     :type source:
@@ -73,60 +74,40 @@ def delete_duplicates(source: DirectoryIter,
     :type duplicate_key:
     :param delete_key:
     :type delete_key:
+    :param journal: путь к журналу операций для продолжения и отката, None - без журнала
+    :type journal: str
+    :param workers: число потоков
+    :type workers: int
     :return:
     :rtype:
     """
-    duplicates = dict()
-    for first, second in combinations(source, 2):
-        if duplicate_key(first) == duplicate_key(second):
-            if duplicate_key(first) in duplicates:
-                duplicates[duplicate_key(first)].update([first, second])
-            else:
-                duplicates[duplicate_key(first)] = {first, second}
-    for value in duplicates.values():
-        files = list(value)
-        files.sort(key=delete_key)
-        for file in files[1:]:
-            print('Удалён', file)
-            file.delete()
+    plan = Plan()
+    plan.delete_duplicates(source, duplicate_key, delete_key)
+    run_plan(plan, journal, workers)
     source.update()
 
 
-def remove_empty_dirs(dir_path: Path):
+def remove_empty_dirs(dir_path: Path, journal: str = None):
     """Удаляет пустые папки в переданном пути класса Path"""
-    # Перебираем все подкаталоги в директории
-    if isinstance(dir_path, DirectoryIter):
-        dir_path = dir_path.path
-    for subdir in dir_path.iterdir():
-        if subdir.is_dir():
-            remove_empty_dirs(subdir)  # Рекурсивно проверяем подкаталоги
-
-            # Если директория пустая, удаляем её
-            if not any(subdir.iterdir()):
-                print(f"Удаление пустой папки: {subdir}")
-                subdir.rmdir()
+    plan = Plan()
+    plan.remove_empty_dirs(dir_path)
+    run_plan(plan, journal, workers=1)
 
 
 def remove_existing_files(source: DirectoryIter,
                           target: DirectoryIter,
-                          duplicate_key=lambda x:x.hash,
-                          move_key=lambda x:x.size
+                          duplicate_key=file_hash,
+                          move_key=file_size,
+                          journal: str = None,
+                          workers: int = 8
                           ):
-    delete_set = set()
-
-    for s, d in product(source, target):
-        if duplicate_key(s) == duplicate_key(d):
-            print(f'Найден дубликат {s}')
-            if move_key(s) > move_key(d):
-                print(f'Новый файл лучше, перемещение')
-                s.copy(d)
-                d.update_hash()
-                delete_set.add(s)
-            else:
-                print(f'Новый файл не нужен, удаление')
-                delete_set.add(s)
-    for s in delete_set:
-        s.delete()
+    """
+    Удаляет из source файлы, которые уже есть в target. Если файл в source лучше (по move_key),
+    он сначала копируется поверх файла в target. Операции выполняются по плану (см. transaction.Plan).
+    """
+    plan = Plan()
+    plan.remove_existing_files(source, target, duplicate_key, move_key)
+    run_plan(plan, journal, workers)
     source.update()
     target.update()
 
@@ -65,7 +65,18 @@ class FileAction(FileInfo):
                  root_dir: (Path, str) = None):
         super().__init__(file_path)
         self.root_dir = None if root_dir is None else Path(root_dir)
-        self.hash = self._compute_hash()
+        self._hash = None
+
+    @property
+    def hash(self) -> str:
+        """Хэш файла, вычисляется при первом обращении."""
+        if self._hash is None:
+            self._hash = self._compute_hash()
+        return self._hash
+
+    @hash.setter
+    def hash(self, value: str):
+        self._hash = value
 
     def copy(self, destination: Path):
         """Создаёт копию файла по переданному пути
@@ -108,7 +119,7 @@ class FileAction(FileInfo):
         return hash_func.hexdigest()
 
     def update_hash(self):
-        self.hash = self._compute_hash()
+        self._hash = self._compute_hash()
 
     @property
     def algorithm(self):
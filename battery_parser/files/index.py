@@ -0,0 +1,358 @@
+"""
+Колоночный индекс файлов для больших архивов (миллионы выгрузок циклеров и aux-файлов).
+Вместо списка объектов File хранятся массивы NumPy: номер папки, имя, номер расширения,
+размер, время изменения и хэш. Хэши вычисляются только когда нужны (и только для файлов
+с совпадающим размером при поиске дубликатов), объекты File создаются при обращении:
+
+    index = FileIndex(archive)
+    ndax = index.filter(extension='.ndax', min_size=1024).sort('mtime', descending=True)
+    plan = Plan()
+    plan.delete_duplicates(ndax, 'hash', '-size')
+
+Для индекса нужен NumPy (остальной подпакет использует только стандартную библиотеку).
+"""
+import fnmatch
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from .file import File
+
+SORT_KEYS = ('name', 'extension', 'size', 'mtime', 'dir', 'hash')
+
+
+class FileIndex:
+    """
+    Индекс файлов папки (включая подпапки) в виде массивов. Срез, маска или массив номеров
+    дают новый индекс над теми же данными (списки папок и расширений общие).
+    Итерация и обращение по номеру возвращают File - он создаётся при обращении и не хранится.
+    Поддерживает интерфейс DirectoryIter (path, update, итерация), поэтому подходит для Plan
+    и функций directory.
+    """
+    file_class = File
+    record_dtype = np.dtype([('dir', '<i4'), ('extension', '<i4'), ('size', '<i8'), ('mtime', '<f8')])
+
+    def __init__(self, dir_path: str = None, filter_pattern='*', algorithm: str = None, workers: int = 8):
+        self.path = None if dir_path is None else Path(dir_path).resolve()
+        self.filter_pattern = filter_pattern
+        self.algorithm = algorithm or self.file_class._algorithm
+        self.workers = workers
+        self._parent = None
+        self._positions = None
+        if self.path is not None and not self.path.is_dir():
+            raise ValueError(f"'{dir_path}' не является директорией.")
+        self._set_data(*self._scan()) if self.path is not None else self._set_data([], [], [], [])
+
+    def _set_data(self, dirs: list, extensions: list, names: list, rows: list):
+        self.dirs = dirs
+        self.extensions = extensions
+        self.names = np.array(names, dtype=object)
+        self.records = np.array(rows, dtype=self.record_dtype)
+        size = hashlib.new(self.algorithm).digest_size
+        self.digests = np.zeros(len(self.records), dtype=f'S{size}')
+        self.hashed = np.zeros(len(self.records), dtype=bool)
+
+    def _scan(self):
+        """Обход папки через os.scandir: размер и время берутся из записей каталога, без объектов Path."""
+        dirs, extensions, extension_ids = [], [], {}
+        names, rows = [], []
+        stack = [str(self.path)]
+        while stack:
+            directory = stack.pop()
+            dir_id = None
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file() and fnmatch.fnmatch(entry.name, self.filter_pattern):
+                    if dir_id is None:
+                        dir_id = len(dirs)
+                        dirs.append(directory)
+                    extension = os.path.splitext(entry.name)[1].lower()
+                    if extension not in extension_ids:
+                        extension_ids[extension] = len(extensions)
+                        extensions.append(extension)
+                    stat = entry.stat()
+                    names.append(entry.name)
+                    rows.append((dir_id, extension_ids[extension], stat.st_size, stat.st_mtime))
+        return dirs, extensions, names, rows
+
+    @classmethod
+    def from_paths(cls, paths, algorithm: str = None, workers: int = 8):
+        """Индекс по списку путей файлов (без обхода папки)."""
+        index = cls(algorithm=algorithm, workers=workers)
+        dirs, dir_ids, extensions, extension_ids, names, rows = [], {}, [], {}, [], []
+        for path in map(str, paths):
+            directory, name = os.path.split(os.path.abspath(path))
+            if directory not in dir_ids:
+                dir_ids[directory] = len(dirs)
+                dirs.append(directory)
+            extension = os.path.splitext(name)[1].lower()
+            if extension not in extension_ids:
+                extension_ids[extension] = len(extensions)
+                extensions.append(extension)
+            stat = os.stat(path)
+            names.append(name)
+            rows.append((dir_ids[directory], extension_ids[extension], stat.st_size, stat.st_mtime))
+        index._set_data(dirs, extensions, names, rows)
+        return index
+
+    def _subset(self, positions: np.ndarray):
+        """Новый индекс из строк positions; хэши, вычисленные позже, видны и в исходном индексе."""
+        subset = object.__new__(self.__class__)
+        subset.__dict__.update(self.__dict__)
+        root = self if self._parent is None else self._parent
+        base = positions if self._positions is None else self._positions[positions]
+        subset._parent, subset._positions = root, base
+        subset.names = root.names[base]
+        subset.records = root.records[base]
+        return subset
+
+    @property
+    def _hash_owner(self):
+        return self if self._parent is None else self._parent
+
+    def _base_positions(self) -> np.ndarray:
+        return np.arange(len(self.records)) if self._positions is None else self._positions
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return self._file(int(item))
+        if isinstance(item, slice):
+            return self._subset(np.arange(len(self))[item])
+        item = np.asarray(item)
+        if item.dtype == bool:
+            item = np.flatnonzero(item)
+        return self._subset(item.astype(np.int64))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._file(i)
+
+    def _file(self, i: int) -> File:
+        """Создание File для строки i: известный хэш передаётся, чтобы не считать его заново."""
+        file = self.file_class(self.path_of(i), root_dir=self.path)
+        owner, position = self._hash_owner, self._base_positions()[i]
+        if owner.hashed[position] and file.algorithm == self.algorithm:
+            file.hash = owner.digests[position:position + 1].tobytes().hex()  # скаляр 'S' теряет нулевые байты
+        return file
+
+    def path_of(self, i: int) -> Path:
+        record = self.records[i]
+        return Path(self.dirs[record['dir']], self.names[i])
+
+    def paths(self) -> list[str]:
+        """Полные пути всех файлов индекса (строками)."""
+        dirs = np.array(self.dirs + [''], dtype=object)[self.records['dir']]
+        return [os.path.join(d, n) for d, n in zip(dirs.tolist(), self.names.tolist())]
+
+    @property
+    def sizes(self) -> np.ndarray:
+        return self.records['size']
+
+    @property
+    def mtimes(self) -> np.ndarray:
+        """Время изменения (секунды от эпохи)."""
+        return self.records['mtime']
+
+    @property
+    def extension_names(self) -> np.ndarray:
+        return np.array(self.extensions, dtype=object)[self.records['extension']] if len(self) \
+            else np.array([], dtype=object)
+
+    def hashes(self, positions=None) -> np.ndarray:
+        """
+        Хэши (байты) файлов индекса, недостающие вычисляются пулом потоков и запоминаются.
+        positions - номера строк, для которых нужны хэши (None - все).
+        """
+        owner = self._hash_owner
+        base = self._base_positions() if positions is None else self._base_positions()[positions]
+        missing = np.unique(base[~owner.hashed[base]])
+        if len(missing):
+            paths = owner.paths_at(missing)
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                digests = list(executor.map(self._digest, paths))
+            owner.digests[missing] = digests
+            owner.hashed[missing] = True
+        return owner.digests[base]
+
+    def paths_at(self, positions) -> list[str]:
+        return [str(self.path_of(int(i))) for i in positions]
+
+    def _digest(self, path: str) -> bytes:
+        hash_func = hashlib.new(self.algorithm)
+        with open(path, 'rb') as f:
+            while chunk := f.read(1024 * 1024):
+                hash_func.update(chunk)
+        return hash_func.digest()
+
+    def filter(self, extension=None, pattern: str = None, min_size: int = None, max_size: int = None,
+               modified_after: datetime | float = None, modified_before: datetime | float = None,
+               mask: np.ndarray = None):
+        """
+        Отбор файлов по маскам массивов.
+        Args:
+            extension (str|list[str]): расширения ('.ndax'), без учёта регистра
+            pattern (str): шаблон имени (fnmatch)
+            min_size, max_size (int): границы размера в байтах (включительно)
+            modified_after, modified_before (datetime|float): границы времени изменения
+            mask (np.ndarray): дополнительная булева маска
+
+        Returns:
+            FileIndex
+        """
+        keep = np.ones(len(self), dtype=bool) if mask is None else np.asarray(mask, dtype=bool).copy()
+        if extension is not None:
+            extension = [extension] if isinstance(extension, str) else list(extension)
+            wanted = [i for i, e in enumerate(self.extensions) if e in {x.lower() for x in extension}]
+            keep &= np.isin(self.records['extension'], wanted)
+        if pattern is not None:
+            matched = set(fnmatch.filter(set(self.names.tolist()), pattern))
+            keep &= np.fromiter((name in matched for name in self.names), dtype=bool, count=len(self))
+        if min_size is not None:
+            keep &= self.sizes >= min_size
+        if max_size is not None:
+            keep &= self.sizes <= max_size
+        if modified_after is not None:
+            keep &= self.mtimes >= _timestamp(modified_after)
+        if modified_before is not None:
+            keep &= self.mtimes <= _timestamp(modified_before)
+        return self[keep]
+
+    def order(self, by='name', descending=False) -> np.ndarray:
+        """
+        Порядок строк (стабильная сортировка) по одному или нескольким ключам из SORT_KEYS.
+        Ключ с '-' в начале сортируется по убыванию.
+        """
+        if not len(self):
+            return np.array([], dtype=np.int64)
+        keys = [by] if isinstance(by, str) else list(by)
+        columns = []
+        for key in reversed(keys):  # np.lexsort: последний ключ - главный
+            reverse = key.startswith('-') != descending
+            column = self._sort_column(key.lstrip('-'))
+            if reverse:
+                column = -column
+            columns.append(column)
+        return np.lexsort(columns)
+
+    def _sort_column(self, key: str) -> np.ndarray:
+        """Числовой столбец для сортировки (строки и хэши заменяются номерами по порядку)."""
+        match key:
+            case 'size' | 'mtime':
+                return self.records[key].astype(np.float64) if key == 'mtime' else self.records[key]
+            case 'name':
+                return np.unique(self.names, return_inverse=True)[1].ravel()
+            case 'extension':
+                return np.unique(self.extension_names, return_inverse=True)[1].ravel()
+            case 'dir':
+                rank = np.argsort(np.argsort(np.array(self.dirs, dtype=object)))
+                return rank[self.records['dir']]
+            case 'hash':
+                return np.unique(self.hashes(), return_inverse=True)[1].ravel()
+        raise ValueError(f'Неизвестный ключ сортировки {key}, доступны {SORT_KEYS}')
+
+    def sort(self, by='name', descending=False):
+        """Отсортированный индекс, см. order."""
+        return self[self.order(by, descending)]
+
+    def keys(self, key='hash') -> np.ndarray:
+        """Ключ сравнения файлов: номера групп одинаковых значений ('hash', 'name', 'size', 'name_size')."""
+        match key:
+            case 'hash':
+                candidates = self._same_size()
+                groups = np.full(len(self), -1, dtype=np.int64)
+                if candidates.any():
+                    digests = self.hashes(np.flatnonzero(candidates))
+                    groups[candidates] = np.unique(digests, return_inverse=True)[1].ravel()
+                unique = ~candidates  # файлы с уникальным размером не могут совпадать с другими
+                groups[unique] = groups.max(initial=-1) + 1 + np.arange(unique.sum())
+                return groups
+            case 'name':
+                return np.unique(self.names, return_inverse=True)[1].ravel() if len(self) else np.array([], int)
+            case 'size':
+                return self.sizes.copy()
+            case 'name_size':
+                names = self.keys('name')
+                return np.unique(np.stack([names, self.sizes]), axis=1, return_inverse=True)[1].ravel() \
+                    if len(self) else np.array([], int)
+        raise ValueError(f'Неизвестный ключ {key}')
+
+    def _same_size(self) -> np.ndarray:
+        """Маска файлов, размер которых встречается больше одного раза."""
+        sizes = self.sizes
+        _, inverse, counts = np.unique(sizes, return_inverse=True, return_counts=True)
+        return counts[inverse.ravel()] > 1 if len(sizes) else np.zeros(0, dtype=bool)
+
+    def duplicate_groups(self, key='hash') -> np.ndarray:
+        """Номер группы дубликатов для каждого файла, -1 - у файла нет дубликатов."""
+        groups = self.keys(key)
+        if not len(groups):
+            return groups
+        _, inverse, counts = np.unique(groups, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        return np.where(counts[inverse] > 1, inverse, -1)
+
+    def redundant(self, key='hash', keep_by='-size'):
+        """
+        Лишние копии: из каждой группы дубликатов по key остаётся первый файл по keep_by
+        (см. order), возвращается индекс остальных.
+        """
+        groups = self.duplicate_groups(key)
+        duplicated = np.flatnonzero(groups >= 0)
+        if not len(duplicated):
+            return self[duplicated]
+        inner = self[duplicated].order(keep_by)
+        ordered = duplicated[inner]
+        ordered = ordered[np.argsort(groups[ordered], kind='stable')]
+        first = np.concatenate([[True], groups[ordered][1:] != groups[ordered][:-1]])
+        return self[np.sort(ordered[~first])]
+
+    def matches(self, other, key='hash'):
+        """
+        Пары совпадающих по key файлов self и other.
+        Returns:
+            (np.ndarray, np.ndarray) - номера строк в self и в other
+        """
+        if key == 'hash':
+            both = np.intersect1d(self.sizes, other.sizes)
+            mine, theirs = np.flatnonzero(np.isin(self.sizes, both)), np.flatnonzero(np.isin(other.sizes, both))
+            left, right = self.hashes(mine), other.hashes(theirs)
+        elif key in ('name', 'size'):
+            mine, theirs = np.arange(len(self)), np.arange(len(other))
+            left, right = (self.names, other.names) if key == 'name' else (self.sizes, other.sizes)
+        else:
+            raise ValueError(f'Неизвестный ключ {key}')
+        values, codes = np.unique(np.concatenate([left, right]), return_inverse=True)
+        codes = codes.ravel()
+        left_codes, right_codes = codes[:len(left)], codes[len(left):]
+        order = np.argsort(right_codes, kind='stable')
+        starts = np.searchsorted(right_codes[order], left_codes, side='left')
+        stops = np.searchsorted(right_codes[order], left_codes, side='right')
+        counts = stops - starts
+        self_rows = np.repeat(mine, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        other_rows = theirs[order[np.repeat(starts, counts) + offsets]]
+        return self_rows, other_rows
+
+    def update(self):
+        """Повторный обход папки (для индекса-подмножества - обновление исходного индекса не делается)."""
+        if self.path is not None and self._parent is None:
+            self._set_data(*self._scan())
+
+    def __repr__(self):
+        return f"<FileIndex(path={self.path}, files={len(self)}, size={self.sizes.sum() / 1024 ** 2:.4}MB)>"
+
+
+def _timestamp(value) -> float:
+    return value.timestamp() if isinstance(value, datetime) else float(value)
@@ -1,34 +1,27 @@
-import shutil
 from pathlib import Path
 
-from directory import DirectoryIter
+from .directory import DirectoryIter
+from .transaction import Plan, run_plan
 
 
-def rename_dirs(target: Path, experiment_names: list):
+def rename_dirs(target: Path, experiment_names: list, journal: str = None):
     """
     Принимает путь к папке (target), в которой переименовываются все папки по списку (experiment_names).
      Исходные папки находятся по алфавитному порядку - и целевой список названий тоже должен идти по алфавитному порядку.
+     Переименования выполняются по плану (см. transaction.Plan), с журналом их можно продолжить или откатить.
 
     :param target:
     :type target:
     :param experiment_names:
     :type experiment_names:
+    :param journal: путь к журналу операций, None - без журнала
+    :type journal: str
     :return:
     :rtype:
     """
-    # Заменяем имена в существующей директории
-    current_dirs = list(target.iterdir())
-    for source_dir, target_name in zip(current_dirs, experiment_names):
-        target_dir = target / target_name
-        if source_dir != target_dir:
-            print(f'В папке "{target}" заменил "{source_dir.name}" на "{target_dir.name}"')
-            shutil.move(source_dir, target_dir)
-    # Создаём нужные папки, которые ещё отсутствуют
-    for target_name in experiment_names:
-        target_dir = target / target_name
-        if not target_dir.exists():
-            target_dir.mkdir(exist_ok=True)
-            print(f'Создал в папке "{target}" папку "{target_dir.name}" ')
+    plan = Plan()
+    plan.rename_dirs(target, experiment_names)
+    run_plan(plan, journal, workers=1)
 
 
 if __name__ == '__main__':
@@ -57,8 +50,12 @@ if __name__ == '__main__':
     #     test_dir.mkdir(exist_ok=True, parents=True)
 
     # Находим папки на нужном углублении и переименовываем по нужному алгоритму.
+    # Все переименования собираются в один план и выполняются с журналом.
+    # Журнал и корзина лежат рядом с архивом, а не внутри него, чтобы не попасть в план.
     depth = 2
+    plan = Plan()
     for directory in target.path.rglob('*'):
         if directory.is_dir() and len(directory.relative_to(target.path).parts) == depth:
             print(directory)
-            rename_dirs(directory, experiment_names)
+            plan.rename_dirs(directory, experiment_names)
+    run_plan(plan, target.path.parent / f'{target.path.name}.rename_dirs.journal', workers=1)
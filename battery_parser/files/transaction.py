@@ -0,0 +1,469 @@
+"""
+Массовая реорганизация файлов в два этапа: сначала строится план (Plan) - полный список операций
+mkdir / rename / copy / move / delete / rmdir, затем план выполняется (Transaction) пулом потоков.
+Каждая выполненная операция записывается в журнал (JSON lines, только дозапись), поэтому
+прерванный запуск можно продолжить, а выполненный - откатить:
+
+    plan = Plan()
+    plan.rename_dirs(target, experiment_names)
+    plan.remove_empty_dirs(target)
+    transaction = Transaction('reorganize.journal')
+    transaction.run(plan)        # повторный запуск после сбоя продолжит с места остановки
+    transaction.rollback()       # отмена всех выполненных операций
+    transaction.purge()          # удаление копий из корзины, после этого откат удалений невозможен
+
+Подряд идущие операции copy, move или delete одного типа выполняются параллельно,
+остальные операции и переход между типами - последовательно, в порядке плана.
+"""
+import json
+import os
+import shutil
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PARALLEL_OPERATIONS = ('copy', 'move', 'delete')
+
+
+def file_hash(file):
+    """Ключ по умолчанию для поиска дубликатов, для FileIndex - 'hash'."""
+    return file.hash
+
+
+def file_size(file):
+    """Ключ по умолчанию для выбора лучшего файла, для FileIndex - 'size'."""
+    return file.size
+
+
+def file_size_descending(file):
+    """Ключ по умолчанию для порядка файлов в группе дубликатов, для FileIndex - '-size'."""
+    return -file.size
+
+
+# ключи по умолчанию и их строковые аналоги для FileIndex
+_INDEX_KEYS = {file_hash:'hash', file_size:'size', file_size_descending:'-size'}
+
+
+def _is_index(*sources) -> bool:
+    # FileIndex может существовать, только если модуль index уже импортирован (NumPy здесь не импортируется)
+    index = sys.modules.get(f'{__package__}.index')
+    return index is not None and all(isinstance(source, index.FileIndex) for source in sources)
+
+
+def _index_keys(sources: tuple, duplicate_key, other_key):
+    """
+    Строковые ключи FileIndex для (duplicate_key, other_key) или None, если сравнение идёт по объектам File:
+    источники - не FileIndex или ключи - произвольные функции. Строковый duplicate_key с произвольной
+    функцией other_key - ошибка.
+    """
+    keys = (duplicate_key, other_key)
+    if not isinstance(duplicate_key, str) and not _is_index(*sources):
+        return None
+    if all(isinstance(key, str) or key in _INDEX_KEYS for key in keys):
+        return [key if isinstance(key, str) else _INDEX_KEYS[key] for key in keys]
+    if isinstance(duplicate_key, str):
+        raise TypeError(f'Для FileIndex ключи задаются строками (например, "size" или "-mtime"), а не {other_key!r}')
+    return None
+
+
+class Plan:
+    """
+    Список операций над файлами и папками. Пути хранятся строками, операции - словарями
+    {'id', 'op', 'source', 'target'}, план можно сохранить в журнал и восстановить из него.
+    При построении учитываются предыдущие операции плана (например, remove_empty_dirs
+    считает пустыми папки, файлы из которых будут удалены или перемещены).
+    """
+
+    def __init__(self, operations: list = None):
+        self.operations = []
+        self._removed = set()
+        self._added = set()
+        for operation in operations or []:
+            self.add(operation['op'], operation.get('source'), operation.get('target'))
+
+    def add(self, op: str, source=None, target=None):
+        if op not in ('mkdir', 'rename', 'copy', 'move', 'delete', 'rmdir'):
+            raise ValueError(f'Неизвестная операция {op}')
+        source = None if source is None else str(source)
+        target = None if target is None else str(target)
+        self.operations.append({'id':len(self.operations), 'op':op, 'source':source, 'target':target})
+        if op in ('move', 'delete', 'rename', 'rmdir'):
+            self._removed.add(source)
+        if op in ('copy', 'move', 'rename', 'mkdir'):
+            self._added.add(target)
+
+    def mkdir(self, target):
+        self.add('mkdir', target=target)
+
+    def rename(self, source, target):
+        """Переименование (перемещение) папки."""
+        self.add('rename', source, target)
+
+    def copy(self, source, target):
+        """Копирование файла. Если target - существующая папка, файл копируется в неё с тем же именем."""
+        self.add('copy', source, _file_target(source, target))
+
+    def move(self, source, target):
+        self.add('move', source, _file_target(source, target))
+
+    def delete(self, source):
+        self.add('delete', source)
+
+    def rmdir(self, source):
+        self.add('rmdir', source)
+
+    def rename_dirs(self, target: Path, experiment_names: list):
+        """План для refactor_dirs.rename_dirs: переименование папок по алфавитному порядку и создание недостающих."""
+        target = Path(target)
+        current_dirs = sorted(target.iterdir())
+        for source_dir, target_name in zip(current_dirs, experiment_names):
+            target_dir = target / target_name
+            if source_dir != target_dir:
+                self.rename(source_dir, target_dir)
+        renamed = {str(target / name) for name in experiment_names[:len(current_dirs)]}
+        for target_name in experiment_names:
+            target_dir = target / target_name
+            if not target_dir.exists() and str(target_dir) not in renamed:
+                self.mkdir(target_dir)
+
+    def remove_existing_files(self, source, target, duplicate_key=file_hash, move_key=file_size):
+        """
+        План для directory.remove_existing_files: файлы source, которые уже есть в target
+        (по duplicate_key), удаляются, а если они лучше (больше по move_key) - сначала копируются поверх.
+        Сравнение идёт по словарю ключей, а не по всем парам файлов.
+        Для FileIndex ключи по умолчанию и строковые ключи ('hash', 'name', 'size' и столбец move_key 'size'
+        или 'mtime') сравниваются по массивам индекса, хэши считаются только для файлов одного размера.
+        """
+        index_keys = _index_keys((source, target), duplicate_key, move_key)
+        if index_keys is not None:
+            duplicate_key, move_key = index_keys
+            mine, theirs = source.matches(target, duplicate_key)
+            for s, d in zip(mine.tolist(), theirs.tolist()):
+                if source.records[move_key][s] > target.records[move_key][d]:
+                    self.copy(source.path_of(s), target.path_of(d))
+            for s in sorted(set(mine.tolist())):
+                self.delete(source.path_of(s))
+            return
+        target_keys = {}
+        for d in target:
+            target_keys.setdefault(duplicate_key(d), []).append(d)
+        deleted = []
+        for s in source:
+            found = target_keys.get(duplicate_key(s), [])
+            for d in found:
+                if move_key(s) > move_key(d):
+                    self.copy(s.path, d.path)
+            if found:
+                deleted.append(s.path)
+        for path in deleted:
+            self.delete(path)
+
+    def delete_duplicates(self, source, duplicate_key=file_hash, delete_key=file_size_descending):
+        """
+        План для directory.delete_duplicates: из каждой группы одинаковых файлов остаётся первый по delete_key.
+        Для FileIndex ключи по умолчанию и строковые ключи сравниваются по массивам индекса (см. FileIndex.redundant).
+        """
+        index_keys = _index_keys((source,), duplicate_key, delete_key)
+        if index_keys is not None:
+            for path in source.redundant(*index_keys).paths():
+                self.delete(path)
+            return
+        groups = {}
+        for file in source:
+            groups.setdefault(duplicate_key(file), []).append(file)
+        for files in groups.values():
+            for file in sorted(files, key=delete_key)[1:]:
+                self.delete(file.path)
+
+    def remove_empty_dirs(self, dir_path):
+        """
+        План для directory.remove_empty_dirs: удаление папок (снизу вверх), которые будут пустыми
+        после выполнения предыдущих операций плана.
+        """
+        dir_path = Path(getattr(dir_path, 'path', dir_path))
+        empty = set()
+        for root, dirs, files in os.walk(dir_path, topdown=False):
+            if root == str(dir_path):
+                continue
+            children = [os.path.join(root, i) for i in files] + [os.path.join(root, i) for i in dirs]
+            if all(child in self._removed or child in empty for child in children) \
+                    and not any(os.path.dirname(i) == root for i in self._added):
+                empty.add(root)
+                self.rmdir(root)
+
+    def batches(self):
+        """Операции, сгруппированные для выполнения: подряд идущие copy/move/delete одного типа - одна группа."""
+        batches = []
+        for operation in self.operations:
+            if batches and operation['op'] in PARALLEL_OPERATIONS and batches[-1][0]['op'] == operation['op']:
+                batches[-1].append(operation)
+            else:
+                batches.append([operation])
+        return batches
+
+    def __len__(self):
+        return len(self.operations)
+
+    def __iter__(self):
+        return iter(self.operations)
+
+    def __eq__(self, other):
+        return isinstance(other, Plan) and self.operations == other.operations
+
+    def __repr__(self):
+        counts = {}
+        for operation in self.operations:
+            counts[operation['op']] = counts.get(operation['op'], 0) + 1
+        return f"<Plan({', '.join(f'{op}={n}' for op, n in counts.items())})>"
+
+
+def _file_target(source, target) -> Path:
+    target = Path(target)
+    return target / Path(source).name if target.is_dir() else target
+
+
+class Transaction:
+    """
+    Выполнение плана с журналом. Журнал - файл JSON lines, куда дописываются записи
+    {'event': 'plan', 'run': ..., 'operations': [...]}, {'event': 'start'|'done'|'failed'|'undone', 'id': ...},
+    {'event': 'purged'}.
+    Если журнал уже содержит незавершённый план, run() продолжает его (выполненные операции пропускаются).
+    При reversible=True удаляемые и перезаписываемые файлы не удаляются, а переносятся в папку
+    '<journal>.trash/<run>', где run - уникальный номер плана, поэтому rollback() может восстановить их.
+    Корзина предыдущего плана очищается при записи нового плана в журнал, корзину текущего
+    плана очищает purge(). Журнал (и корзину) нельзя хранить внутри реорганизуемой папки.
+    Args:
+        journal_path (str): путь к журналу, None - журнал только в памяти (без продолжения после сбоя)
+        workers (int): число потоков для параллельных операций
+        reversible (bool): сохранять удаляемые файлы для отката, по умолчанию - если есть журнал
+        verbose (bool): печатать каждую операцию
+    """
+
+    def __init__(self, journal_path: str = None, workers: int = 8, reversible: bool = None, verbose: bool = False):
+        self.journal_path = None if journal_path is None else Path(journal_path)
+        self.workers = workers
+        self.reversible = self.journal_path is not None if reversible is None else reversible
+        if self.reversible and self.journal_path is None:
+            raise ValueError('Для отката операций нужен журнал.')
+        self.trash = None if self.journal_path is None else Path(str(self.journal_path) + '.trash')
+        self.verbose = verbose
+        self.plan = None
+        self.run_id = None
+        self.done = {}
+        self.started = set()
+        self.errors = {}
+        self._lock = threading.Lock()
+        if self.journal_path is not None and self.journal_path.exists():
+            self._read_journal()
+
+    def _read_journal(self):
+        with open(self.journal_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:  # запись, прерванная сбоем
+                    continue
+                self._apply(record)
+
+    def _apply(self, record):
+        match record['event']:
+            case 'plan':
+                self.plan = Plan(record['operations'])
+                self.run_id = record.get('run')  # журналы старых версий - без номера
+                self.done, self.started, self.errors = {}, set(), {}
+            case 'start':
+                self.started.add(record['id'])
+            case 'done':
+                self.done[record['id']] = record.get('backup')
+                self.errors.pop(record['id'], None)
+            case 'failed':
+                self.errors[record['id']] = record['error']
+            case 'undone':
+                self.done.pop(record['id'], None)
+                self.started.discard(record['id'])
+            case 'purged':
+                self.done = dict.fromkeys(self.done)
+
+    def _write(self, **record):
+        with self._lock:
+            self._apply(record)
+            if self.journal_path is not None:
+                with open(self.journal_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    @property
+    def pending(self) -> list:
+        """Операции плана, которые ещё не выполнены."""
+        return [] if self.plan is None else [i for i in self.plan if i['id'] not in self.done]
+
+    def begin(self, plan: Plan):
+        """
+        Записывает новый план в журнал. Незавершённый план журнала с теми же операциями
+        продолжается, с другими операциями - вызывает ошибку. Завершённый план (или полностью
+        откатанный) не продолжается: тот же план записывается заново, с новым номером запуска.
+        """
+        started = bool(self.done or self.started)
+        if self.plan is not None and self.pending and started and self.plan != plan:
+            raise RuntimeError(f'Журнал {self.journal_path} содержит незавершённый план, '
+                               f'выполните run() без плана или rollback().')
+        if self.plan != plan or not self.pending:
+            if self.plan is not None:
+                self._purge_trash()  # откат предыдущего плана после записи нового невозможен
+            self._write(event='plan', run=uuid.uuid4().hex, operations=plan.operations)
+
+    def run(self, plan: Plan = None) -> dict:
+        """
+        Выполняет план (или продолжает план из журнала, если plan не передан).
+        Returns:
+            (dict) число выполненных, пропущенных и неудачных операций
+        """
+        if plan is not None:
+            self.begin(plan)
+        if self.plan is None:
+            raise RuntimeError('Нет плана для выполнения.')
+        skipped = len(self.plan) - len(self.pending)
+        for batch in self.plan.batches():
+            batch = [i for i in batch if i['id'] not in self.done]
+            if len(batch) > 1 and self.workers > 1:
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    list(executor.map(self._execute, batch))
+            else:
+                for operation in batch:
+                    self._execute(operation)
+        result = {'done':len(self.done) - skipped, 'skipped':skipped, 'failed':len(self.errors)}
+        print(f'План выполнен: {result}')
+        return result
+
+    def rollback(self) -> dict:
+        """Отменяет выполненные операции в обратном порядке."""
+        if self.plan is None:
+            return {'undone':0, 'failed':0}
+        undone, failed = 0, 0
+        for batch in reversed(self.plan.batches()):
+            batch = [i for i in reversed(batch) if i['id'] in self.done]
+            if len(batch) > 1 and self.workers > 1:
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    results = list(executor.map(self._undo, batch))
+            else:
+                results = [self._undo(operation) for operation in batch]
+            undone += sum(results)
+            failed += len(results) - sum(results)
+        result = {'undone':undone, 'failed':failed}
+        print(f'Откат выполнен: {result}')
+        return result
+
+    def purge(self):
+        """
+        Удаляет копии файлов текущего плана из корзины. После этого удаления и перезаписи
+        не откатываются, остальные операции - откатываются.
+        """
+        if self.pending:
+            raise RuntimeError(f'Журнал {self.journal_path} содержит незавершённый план, '
+                               f'выполните run() или rollback() перед очисткой корзины.')
+        self._purge_trash()
+        if self.plan is not None:
+            self._write(event='purged')
+
+    def _purge_trash(self):
+        if self.trash is not None and self.trash.exists():
+            shutil.rmtree(self.trash)
+
+    def _backup_path(self, operation) -> Path:
+        run = self.trash if self.run_id is None else self.trash / self.run_id
+        return run / str(operation['id'])
+
+    def _execute(self, operation):
+        op, source, target = operation['op'], operation['source'], operation['target']
+        resumed = operation['id'] in self.started  # операция начиналась до сбоя
+        self._write(event='start', id=operation['id'])
+        backup = None
+        try:
+            match op:
+                case 'mkdir':
+                    os.makedirs(target, exist_ok=True)
+                case 'rename' | 'move':
+                    if resumed and not os.path.exists(source) and os.path.exists(target):
+                        backup = self._keep(operation, None, resumed)  # перемещено до сбоя
+                    else:
+                        if op == 'move':
+                            backup = self._keep(operation, target, resumed)
+                        shutil.move(source, target)
+                case 'copy':
+                    backup = self._keep(operation, target, resumed)
+                    temporary = f'{target}.part'
+                    shutil.copy2(source, temporary)  # sendfile / fcopyfile там, где они есть
+                    os.replace(temporary, target)
+                case 'delete':
+                    # файл, оставшийся на месте после сбоя, ещё не перенесён в корзину
+                    backup = self._keep(operation, source, resumed and not os.path.exists(source))
+                    if not self.reversible and os.path.exists(source):
+                        os.remove(source)
+                case 'rmdir':
+                    if os.path.isdir(source):
+                        os.rmdir(source)
+        except OSError as error:
+            self._write(event='failed', id=operation['id'], error=repr(error))
+            print(f'Ошибка {op} {source or ""} -> {target or ""}: {error!r}')
+            return
+        if self.verbose:
+            print(f'{op}: {source or ""} -> {target or ""}')
+        self._write(event='done', id=operation['id'], backup=None if backup is None else str(backup))
+
+    def _keep(self, operation, path, resumed=False):
+        """
+        Переносит существующий файл path в корзину журнала (для отката), возвращает путь копии.
+        Если операция уже начиналась до сбоя, копия в корзине - её собственная, а файл без копии
+        в корзине - результат самой операции. Копия, оставшаяся от другой операции, - ошибка.
+        """
+        if not self.reversible:
+            return None
+        backup = self._backup_path(operation)
+        if backup.exists():
+            if resumed:
+                return backup
+            raise FileExistsError(f'В корзине уже есть {backup}, не созданный этой операцией')
+        if path is None or resumed or not os.path.exists(path):
+            return None
+        backup.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(path, backup)
+        return backup
+
+    def _undo(self, operation) -> bool:
+        op, source, target = operation['op'], operation['source'], operation['target']
+        backup = self.done.get(operation['id'])
+        try:
+            match op:
+                case 'mkdir':
+                    if os.path.isdir(target) and not any(os.scandir(target)):
+                        os.rmdir(target)
+                case 'rename' | 'move':
+                    shutil.move(target, source)
+                case 'copy':
+                    os.remove(target)
+                case 'delete':
+                    if backup is None:
+                        raise OSError(f'{source} удалён без сохранения копии')
+                case 'rmdir':
+                    os.makedirs(source, exist_ok=True)
+            if backup is not None:
+                shutil.move(backup, source if op == 'delete' else target)
+        except OSError as error:
+            print(f'Не удалось отменить {op} {source or ""} -> {target or ""}: {error!r}')
+            return False
+        self._write(event='undone', id=operation['id'])
+        return True
+
+
+def run_plan(plan: Plan, journal_path: str = None, workers: int = 8, verbose: bool = True,
+             purge: bool = False) -> dict:
+    """
+    Выполняет план через Transaction, с журналом - с возможностью продолжения и отката.
+    purge=True очищает корзину, если все операции выполнены (откат удалений станет невозможен).
+    """
+    transaction = Transaction(journal_path, workers=workers, verbose=verbose)
+    result = transaction.run(plan)
+    if purge and not transaction.pending:
+        transaction.purge()
+    return result
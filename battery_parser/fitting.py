@@ -0,0 +1,347 @@
+"""
+Batched fitting of capacity-fade models to SoH trajectories of many cells at once.
+Trajectories are padded to one (cells x points) array with mask, all cells are fitted
+together by vectorized Levenberg-Marquardt (one batched linear solve per iteration):
+
+    parameters = fit_degradation(table, x='cycle', y='SoH', group='pouch', model='power_law')
+    eol = predict_lifetime(parameters, threshold=0.8, horizon=5000)
+"""
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy import stats
+except ImportError:
+    stats = None
+
+
+class FadeModel:
+    """
+    Capacity-fade model y = function(x, p) with analytic jacobian and initial guess.
+    Args:
+        name (str): model name
+        parameters (list[str]): parameter names
+        function (callable): (x, p) -> y, x of shape (cells, points), p of shape (cells, k)
+        jacobian (callable): (x, p) -> dy/dp of shape (cells, points, k)
+        initial (callable): (x, y, mask) -> initial parameters (cells, k)
+    """
+
+    def __init__(self, name, parameters, function, jacobian, initial):
+        self.name = name
+        self.parameters = parameters
+        self.function = function
+        self.jacobian = jacobian
+        self.initial = initial
+
+    def __repr__(self):
+        return f"<FadeModel({self.name}, parameters={self.parameters})>"
+
+
+def _first_last(x, y, mask):
+    """First and last valid x, y of every cell."""
+    count = mask.sum(axis=1)
+    last = np.maximum(count - 1, 0)
+    rows = np.arange(len(x))
+    return x[:, 0], y[:, 0], x[rows, last], y[rows, last]
+
+
+def _power_initial(x, y, mask):
+    x0, y0, x1, y1 = _first_last(x, y, mask)
+    c = np.full(len(x), 0.5)
+    b = (y0 - y1) / np.where(x1 > 0, np.sqrt(np.abs(x1)), 1.0)
+    return np.column_stack([y0, b, c])
+
+
+def _power_function(x, p):
+    return p[:, [0]] - p[:, [1]] * np.abs(x) ** p[:, [2]]
+
+
+def _power_jacobian(x, p):
+    power = np.abs(x) ** p[:, [2]]
+    log = np.log(np.where(x > 0, np.abs(x), 1.0))
+    return np.stack([np.ones_like(x), -power, -p[:, [1]] * power * log], axis=-1)
+
+
+def _sqrt_linear_initial(x, y, mask):
+    x0, y0, x1, y1 = _first_last(x, y, mask)
+    return np.column_stack([y0, np.zeros(len(x)), (y0 - y1) / np.where(x1 != x0, x1 - x0, 1.0)])
+
+
+def _sqrt_linear_function(x, p):
+    return p[:, [0]] - p[:, [1]] * np.sqrt(np.abs(x)) - p[:, [2]] * x
+
+
+def _sqrt_linear_jacobian(x, p):
+    return np.stack([np.ones_like(x), -np.sqrt(np.abs(x)), -x], axis=-1)
+
+
+def _double_exponential_initial(x, y, mask):
+    """
+    Rates b, d from grid (in units of 1 / x span) where amplitudes a, c are linear least squares,
+    the pair with the smallest residuals is taken for every cell.
+    """
+    x0, y0, x1, y1 = _first_last(x, y, mask)
+    span = np.where(x1 > x0, x1 - x0, 1.0)[:, None]
+    weights = mask.astype(float)
+    grid_b, grid_d = np.meshgrid(np.linspace(-2.0, 0.0, 9), np.geomspace(0.5, 40.0, 20), indexing='ij')
+    best = np.full(len(x), np.inf)
+    initial = np.column_stack([y0, np.zeros(len(x)), -0.01 * y0, 1.0 / span[:, 0]])
+    for b, d in zip(grid_b.ravel(), grid_d.ravel()):
+        with np.errstate(over='ignore', invalid='ignore'):
+            first = np.exp(b * (x - x0[:, None]) / span) * weights
+            second = np.exp(d * (x - x1[:, None]) / span) * weights  # scaled to 1 at last point
+        basis = np.stack([first, second], axis=-1)
+        normal = np.einsum('cpi,cpj->cij', basis, basis) + 1e-12 * np.eye(2)
+        amplitudes = np.linalg.solve(normal, np.einsum('cpi,cp->ci', basis, y * weights)[..., None])[..., 0]
+        cost = np.sum((y * weights - np.einsum('cpi,ci->cp', basis, amplitudes)) ** 2, axis=1)
+        better = np.isfinite(cost) & (cost < best)
+        best = np.where(better, cost, best)
+        rates = np.column_stack([b / span[:, 0], d / span[:, 0]])
+        with np.errstate(over='ignore'):
+            a = amplitudes[:, 0] * np.exp(-rates[:, 0] * x0)
+            c = amplitudes[:, 1] * np.exp(-rates[:, 1] * x1)
+        candidate = np.column_stack([a, rates[:, 0], c, rates[:, 1]])
+        initial[better] = candidate[better]
+    return initial
+
+
+def _double_exponential_function(x, p):
+    return p[:, [0]] * np.exp(p[:, [1]] * x) + p[:, [2]] * np.exp(p[:, [3]] * x)
+
+
+def _double_exponential_jacobian(x, p):
+    first = np.exp(p[:, [1]] * x)
+    second = np.exp(p[:, [3]] * x)
+    return np.stack([first, p[:, [0]] * x * first, second, p[:, [2]] * x * second], axis=-1)
+
+
+MODELS = {
+    'power_law':FadeModel('power_law', ['a', 'b', 'c'],
+                          _power_function, _power_jacobian, _power_initial),
+    'sqrt_linear':FadeModel('sqrt_linear', ['a', 'b', 'c'],
+                            _sqrt_linear_function, _sqrt_linear_jacobian, _sqrt_linear_initial),
+    'double_exponential':FadeModel('double_exponential', ['a', 'b', 'c', 'd'],
+                                   _double_exponential_function, _double_exponential_jacobian,
+                                   _double_exponential_initial),
+}
+MODELS['power_law'].__doc__ = 'y = a - b * x ** c'
+MODELS['sqrt_linear'].__doc__ = 'y = a - b * sqrt(x) - c * x'
+MODELS['double_exponential'].__doc__ = 'y = a * exp(b * x) + c * exp(d * x)'
+
+
+def get_model(model) -> FadeModel:
+    if isinstance(model, FadeModel):
+        return model
+    if model not in MODELS:
+        raise ValueError(f'Unknown model {model}, available: {list(MODELS)}')
+    return MODELS[model]
+
+
+def pad_groups(table: pd.DataFrame, x: str, y: str, group: str):
+    """
+    Pad trajectories of all groups to one array without python loop over groups.
+    Rows with missing x or y are dropped, points are sorted by x inside groups.
+    Args:
+        table (pd.DataFrame): long table with group, x and y columns
+        x (str): x column (cycle or time)
+        y (str): y column (SoH or capacity)
+        group (str): cell column
+
+    Returns:
+        (groups, x, y, mask) - group labels and arrays (groups x max points)
+    """
+    table = table[[group, x, y]].dropna().sort_values([group, x], kind='stable')
+    codes, groups = pd.factorize(table[group], sort=True)
+    position = table.groupby(codes, sort=False).cumcount().to_numpy()
+    shape = (len(groups), position.max() + 1 if len(position) else 0)
+    x_values = np.zeros(shape)
+    y_values = np.zeros(shape)
+    mask = np.zeros(shape, dtype=bool)
+    x_values[codes, position] = table[x].to_numpy(dtype=float)
+    y_values[codes, position] = table[y].to_numpy(dtype=float)
+    mask[codes, position] = True
+    return groups, x_values, y_values, mask
+
+
+def levenberg_marquardt(model: FadeModel, x, y, mask, initial=None, max_iterations: int = 200,
+                        tolerance: float = 1e-10, damping: float = 1e-3):
+    """
+    Batched Levenberg-Marquardt: every cell has its own damping factor and parameters,
+    step is accepted for cells where residual sum of squares decreased. Damping is updated
+    from ratio of actual to predicted decrease (Nielsen), so long narrow valleys of
+    double_exponential are followed with few rejected steps.
+    Args:
+        model (FadeModel): model
+        x, y (np.ndarray): padded arrays (cells x points)
+        mask (np.ndarray): valid points
+        initial (np.ndarray): initial parameters (cells x k), default model.initial
+        max_iterations (int): iterations limit
+        tolerance (float): relative decrease of residuals for convergence
+        damping (float): initial damping factor
+
+    Returns:
+        (parameters, jacobian, residual sum of squares, converged, iterations)
+    """
+    weights = mask.astype(float)
+    parameters = model.initial(x, y, mask) if initial is None else np.array(initial, dtype=float)
+    n_parameters = parameters.shape[1]
+
+    def residuals(p):
+        with np.errstate(over='ignore', invalid='ignore'):
+            r = (y - model.function(x, p)) * weights
+        return np.where(np.isfinite(r), r, np.inf)
+
+    def sum_squares(r):
+        with np.errstate(over='ignore'):
+            return np.sum(r ** 2, axis=1)
+
+    r = residuals(parameters)
+    cost = sum_squares(r)
+    damping = np.full(len(x), damping)
+    factor = np.full(len(x), 2.0)
+    converged = np.zeros(len(x), dtype=bool)
+    iterations = np.zeros(len(x), dtype=int)
+    eye = np.eye(n_parameters)
+    for _ in range(max_iterations):
+        active = ~converged
+        if not active.any():
+            break
+        with np.errstate(over='ignore', invalid='ignore'):
+            jacobian = model.jacobian(x[active], parameters[active]) * weights[active, :, None]
+        jacobian = np.nan_to_num(jacobian, nan=0.0, posinf=0.0, neginf=0.0)
+        normal = np.einsum('cpi,cpj->cij', jacobian, jacobian)
+        gradient = np.einsum('cpi,cp->ci', jacobian, np.nan_to_num(r[active], posinf=0.0))
+        diagonal = np.einsum('cii->ci', normal)
+        scaled = normal + damping[active, None, None] * (diagonal[:, :, None] * eye + 1e-12 * eye)
+        step = np.linalg.solve(scaled, gradient[..., None])[..., 0]
+
+        candidate = parameters.copy()
+        candidate[active] = parameters[active] + step
+        new_r = residuals(candidate)
+        new_cost = sum_squares(new_r)
+        better = active & (new_cost < cost)
+        relative = np.abs(cost - new_cost) / np.maximum(cost, 1e-300)
+        predicted = np.ones(len(x))
+        predicted[active] = np.einsum('ci,ci->c', step, damping[active, None] * (diagonal + 1e-12) * step + gradient)
+        gain = (cost - new_cost) / np.where(predicted > 0, predicted, np.inf)
+        parameters[better] = candidate[better]
+        r[better] = new_r[better]
+        converged |= better & (relative < tolerance)
+        converged |= active & ~better & (damping > 1e12)
+        cost = np.where(better, new_cost, cost)
+        with np.errstate(invalid='ignore'):
+            shrink = np.maximum(1 / 3, 1 - (2 * np.clip(gain, 0, 1) - 1) ** 3)
+        damping = np.where(better, damping * shrink, np.where(active, damping * factor, damping))
+        factor = np.where(better, 2.0, np.where(active, factor * 2, factor))
+        iterations += active
+    with np.errstate(over='ignore', invalid='ignore'):
+        jacobian = np.nan_to_num(model.jacobian(x, parameters) * weights[:, :, None])
+    return parameters, jacobian, cost, converged, iterations
+
+
+def fit_degradation(table,
+                    x: str = 'cycle',
+                    y: str = 'SoH',
+                    group: str = 'pouch',
+                    model='power_law',
+                    confidence: float = 0.95,
+                    max_iterations: int = 200):
+    """
+    Fit capacity-fade model to trajectories of all cells at once.
+    Confidence intervals are p ± t * se, se from covariance s² (JᵀJ)⁻¹ at solution, t quantile of
+    Student distribution (normal quantile if scipy is not installed).
+    Args:
+        table (pd.DataFrame|dict): long table with group, x and y columns, or dict group:dataframe
+                                   (for example processed cycles of every pouch)
+        x (str): x column (cycle number, days, throughput)
+        y (str): y column (SoH, capacity)
+        group (str): cell column (name for dict keys)
+        model (str|FadeModel): 'power_law', 'sqrt_linear', 'double_exponential' or FadeModel
+        confidence (float): confidence level of intervals
+        max_iterations (int): iterations limit
+
+    Returns:
+        pd.DataFrame indexed by group: parameters, their standard errors (_se), intervals (_low, _high),
+        rmse, n_points, converged, iterations and model name. Cells without visible knee have
+        ill-determined double_exponential parameters and may stop at max_iterations (converged False)
+    """
+    model = get_model(model)
+    if isinstance(table, dict):
+        table = pd.concat(table, names=[group]).reset_index(level=group)
+    groups, x_values, y_values, mask = pad_groups(table, x, y, group)
+    parameters, jacobian, cost, converged, iterations = levenberg_marquardt(
+        model, x_values, y_values, mask, max_iterations=max_iterations)
+
+    n_points = mask.sum(axis=1)
+    n_parameters = len(model.parameters)
+    dof = n_points - n_parameters
+    variance = np.where(dof > 0, cost / np.maximum(dof, 1), np.nan)
+    normal = np.einsum('cpi,cpj->cij', jacobian, jacobian)
+    covariance = np.linalg.pinv(normal) * variance[:, None, None]
+    se = np.sqrt(np.abs(np.einsum('cii->ci', covariance)))
+    if stats is not None:
+        quantile = stats.t.ppf(0.5 + confidence / 2, np.maximum(dof, 1))
+    else:
+        quantile = np.full(len(dof), NormalDist().inv_cdf(0.5 + confidence / 2))
+
+    result = pd.DataFrame(index=pd.Index(groups, name=group))
+    for i, name in enumerate(model.parameters):
+        result[name] = parameters[:, i]
+        result[f'{name}_se'] = se[:, i]
+        result[f'{name}_low'] = parameters[:, i] - quantile * se[:, i]
+        result[f'{name}_high'] = parameters[:, i] + quantile * se[:, i]
+    result['rmse'] = np.sqrt(cost / np.maximum(n_points, 1))
+    result['n_points'] = n_points
+    result['converged'] = converged
+    result['iterations'] = iterations
+    result['model'] = model.name
+    return result
+
+
+def predict(parameters: pd.DataFrame, x, model=None) -> pd.DataFrame:
+    """
+    Model values for every fitted cell.
+    Args:
+        parameters (pd.DataFrame): result of fit_degradation
+        x (array-like): x values, common for all cells
+        model (str|FadeModel): model, default from parameters table
+
+    Returns:
+        pd.DataFrame (cells x x values)
+    """
+    model = get_model(parameters['model'].iloc[0] if model is None else model)
+    x = np.asarray(x, dtype=float)
+    p = parameters[model.parameters].to_numpy(dtype=float)
+    with np.errstate(over='ignore', invalid='ignore'):
+        values = model.function(np.broadcast_to(x, (len(p), len(x))), p)
+    return pd.DataFrame(values, index=parameters.index, columns=x)
+
+
+def predict_lifetime(parameters: pd.DataFrame, threshold: float = 0.8, horizon: float = 10_000,
+                     n_points: int = 10_001, model=None) -> pd.Series:
+    """
+    x where model first drops below threshold (end of life), for all cells at once.
+    Crossing is found on grid from 0 to horizon and refined by linear interpolation.
+    Args:
+        parameters (pd.DataFrame): result of fit_degradation
+        threshold (float): end-of-life value of y (0.8 for SoH)
+        horizon (float): max predicted x
+        n_points (int): grid points
+        model (str|FadeModel): model, default from parameters table
+
+    Returns:
+        pd.Series of end-of-life x, NaN if threshold is not reached before horizon
+    """
+    grid = np.linspace(0, horizon, n_points)
+    values = predict(parameters, grid, model).to_numpy()
+    below = values < threshold
+    found = below.any(axis=1)
+    first = np.argmax(below, axis=1)
+    previous = np.maximum(first - 1, 0)
+    rows = np.arange(len(values))
+    y0, y1 = values[rows, previous], values[rows, first]
+    fraction = np.where(y0 != y1, (y0 - threshold) / np.where(y0 != y1, y0 - y1, 1.0), 0.0)
+    lifetime = grid[previous] + fraction * (grid[first] - grid[previous])
+    return pd.Series(np.where(found, lifetime, np.nan), index=parameters.index, name='end_of_life')
@@ -1,9 +1,13 @@
 import os
 import re
 
+import numpy as np
 import pandas as pd
 
+from .profiling import profiled
 
+
+@profiled
 def list_files(directory: str, filetype: str | list[str]):
     """
     Create list of all files in directory (without recurrent walking in dirs)
@@ -26,21 +30,35 @@ def list_files(directory: str, filetype: str | list[str]):
     return files
 
 
+AUX_TIME_COLUMNS = ['Absolute Time', 'Date', 'Realtime', 'Record Index', 'DataPoint']
+
+
+@profiled(reads='filepath')
 def import_xls(filepath: str,
                data_name_pattern='Detail_',
                temp_name_pattern='DetailTemp_',
-               temp_column_pattern='T(°C)'):
+               temp_column_pattern='T(°C)',
+               time_column: str = None,
+               tolerance=None,
+               interpolate=False):
     f"""
     Get cycling data and temperature data from Excel file.
     Specific for multiple sheet structure, where all data sheets have in name
     a string like {data_name_pattern} (specified) and go one by another
     temperature have in name string like {temp_name_pattern} (specified) and go one by another.
-    Temperature column name should consist of {temp_column_pattern} to add temperature to dataframe
+    Temperature column name should consist of {temp_column_pattern} to add temperature to dataframe,
+    all such columns (aux channels T1..Tn) are added.
+    Temperature is aligned to data by time_column (as-of join, see AuxAligner). If time_column is
+    not given, it is searched in both tables from {AUX_TIME_COLUMNS}, if not found - temperature
+    is added by row position.
 
     Args:
         temp_name_pattern (str): Unique name filter_pattern in sheets for temperature
         data_name_pattern (str): Unique name filter_pattern in sheets for data
         filepath (str):destination to Excel file with cycling data and/or temperature
+        time_column (str): column with time (or record index) in both data and temperature sheets
+        tolerance (float|str|pd.Timedelta): max distance to temperature record, seconds for datetime
+        interpolate (bool): interpolate temperature linearly between records instead of nearest
 
     Returns:
         pd.Dataframe with data (and temperature if exist)
@@ -49,18 +67,131 @@ def import_xls(filepath: str,
     data = extract_data_xls(import_data, data_name_pattern)
     temp = extract_data_xls(import_data, temp_name_pattern)
     if temp is not None:
-        if all(isinstance(i, str) for i in temp.iloc[0]):
-            temp.rename(columns=temp.iloc[0], inplace=True)
-            temp.drop(temp.index[0], inplace=True)
-            temp.reset_index(inplace=True, drop=True)
+        if pd.api.types.infer_dtype(temp.iloc[0], skipna=False) == 'string':
+            temp.columns = temp.iloc[0]
+            temp = temp.iloc[1:].reset_index(drop=True).infer_objects()
         temp_column = [i for i
                        in temp.columns
-                       if temp_column_pattern in i]
-
-        data = pd.concat([data, temp[temp_column]], axis=1)
+                       if temp_column_pattern in str(i)]
+        if time_column is None:
+            time_column = next((i for i in AUX_TIME_COLUMNS if i in data.columns and i in temp.columns), None)
+        if time_column is None:
+            if len(temp) != len(data):
+                print(f'import_xls: Warning! No time column to align temperature, '
+                      f'{len(temp)} temperature rows are added to {len(data)} data rows by position.')
+            data = pd.concat([data, temp[temp_column]], axis=1)
+        else:
+            data = align_aux(data, temp, on=time_column, columns=temp_column,
+                             tolerance=tolerance, interpolate=interpolate)
     return data
 
 
+class AuxAligner:
+    """
+    Aligns auxiliary channels (temperature etc.) to data by time with as-of join.
+    Auxiliary table is prepared (converted and sorted) once, so aligner can be applied to
+    many chunks of data. Every data row gets values of nearest auxiliary record
+    (or linearly interpolated values) if it is not farther than tolerance.
+    Args:
+        aux (pd.DataFrame): auxiliary table with time column
+        on (str): time column (datetime, text datetime or numeric) in aux and data
+        columns (list[str]): aux columns to add, default all except time column
+        tolerance (float|str|pd.Timedelta): max distance to aux record, numbers are seconds for
+                                            datetime columns. None - no limit
+        interpolate (bool): linear interpolation between aux records instead of nearest record
+    """
+
+    def __init__(self, aux: pd.DataFrame, on: str, columns: list = None, tolerance=None, interpolate=False):
+        self.on = on
+        self.columns = [i for i in aux.columns if i != on] if columns is None else list(columns)
+        self.interpolate = interpolate
+        self.tz = self._timezone(aux[on])
+        key = self._key(aux[on], self.tz)
+        order = np.argsort(key, kind='stable')
+        self.key = key[order]
+        self.values = {column:pd.to_numeric(aux[column], errors='coerce').to_numpy(dtype=float)[order]
+                       for column in self.columns}
+        self.tolerance = self._tolerance(tolerance)
+
+    def __call__(self, data: pd.DataFrame):
+        """
+        Returns copy of data with aux columns.
+        """
+        key = self._key(data[self.on], self.tz)
+        if not len(self.key):  # empty aux table
+            return data.assign(**{column:np.full(len(data), np.nan) for column in self.columns})
+        position = np.searchsorted(self.key, key)
+        left = np.clip(position - 1, 0, len(self.key) - 1)
+        right = np.clip(position, 0, len(self.key) - 1)
+        left_distance = np.abs(key - self.key[left])
+        right_distance = np.abs(self.key[right] - key)
+        nearest = np.where(right_distance < left_distance, right, left)
+        distance = np.minimum(left_distance, right_distance)
+        outside = np.isnan(key) if self.tolerance is None else ~(distance <= self.tolerance)
+        new_columns = {}
+        for column, values in self.values.items():
+            if self.interpolate:
+                valid = ~np.isnan(values)
+                result = np.interp(key, self.key[valid], values[valid]) if valid.any() \
+                    else np.full(len(key), np.nan)
+            else:
+                result = values[nearest]
+            result[outside] = np.nan
+            new_columns[column] = result
+        return data.assign(**new_columns)
+
+    @staticmethod
+    def _timezone(series: pd.Series):
+        if pd.api.types.is_numeric_dtype(series):
+            return None
+        return pd.to_datetime(series).dt.tz
+
+    @staticmethod
+    def _key(series: pd.Series, tz=None):
+        """
+        Time column as float array: seconds for datetime (and text datetime) columns.
+        Time zone aware times are compared in UTC if aux times are aware (naive times are taken in aux
+        time zone), otherwise as wall times in their own time zone (as naive aux times).
+        """
+        if pd.api.types.is_numeric_dtype(series):
+            return series.to_numpy(dtype=float)
+        series = pd.to_datetime(series)
+        if series.dt.tz is not None:
+            series = series.dt.tz_convert('UTC') if tz is not None else series.dt.tz_localize(None)
+        elif tz is not None:
+            series = series.dt.tz_localize(tz, ambiguous='NaT', nonexistent='NaT').dt.tz_convert('UTC')
+        series = series.dt.tz_localize(None) if series.dt.tz is not None else series
+        key = series.astype('datetime64[ns]').to_numpy().astype(np.int64) / 1e9
+        key[series.isna().to_numpy()] = np.nan
+        return key
+
+    @staticmethod
+    def _tolerance(tolerance):
+        if tolerance is None:
+            return None
+        if isinstance(tolerance, (str, pd.Timedelta)):
+            return pd.Timedelta(tolerance).total_seconds()
+        return float(tolerance)
+
+
+def align_aux(data: pd.DataFrame, aux: pd.DataFrame, on: str, columns: list = None,
+              tolerance=None, interpolate=False):
+    """
+    Add auxiliary channels to data by time, see AuxAligner.
+    Args:
+        data (pd.DataFrame): cycling data
+        aux (pd.DataFrame): auxiliary data with the same time column
+        on (str): time column
+        columns (list[str]): aux columns to add, default all
+        tolerance (float|str|pd.Timedelta): max distance to aux record
+        interpolate (bool): interpolate between aux records
+
+    Returns:
+        pd.DataFrame - copy of data with aux columns
+    """
+    return AuxAligner(aux, on=on, columns=columns, tolerance=tolerance, interpolate=interpolate)(data)
+
+
 def extract_data_xls(imported_data, name_pattern):
     """
     Select Excel sheets from data, and concat them to one dataframe (ignore index)
@@ -191,3 +322,498 @@ def unique_re(pattern: str, files: list):
     n_unique = len(unique_values)
     n_values = len(values)
     return n_values, n_unique, unique_values
+
+
+NDAX_COLUMNS = ['Index', 'Cycle', 'Step', 'Step_Index', 'Status', 'Time', 'Voltage', 'Current(mA)',
+                'Charge_Capacity(mAh)', 'Discharge_Capacity(mAh)', 'Charge_Energy(mWh)', 'Discharge_Energy(mWh)',
+                'Timestamp']
+NDAX_DTYPES = {'Index':'uint32', 'Cycle':'uint32', 'Step':'uint32', 'Step_Index':'uint32', 'Status':'category',
+               'Time':'float32', 'Voltage':'float32', 'Current(mA)':'float32',
+               'Charge_Capacity(mAh)':'float32', 'Discharge_Capacity(mAh)':'float32',
+               'Charge_Energy(mWh)':'float32', 'Discharge_Energy(mWh)':'float32'}
+NDAX_STATUS = {1:'CC_Chg', 2:'CC_DChg', 3:'CV_Chg', 4:'Rest', 5:'Cycle', 7:'CCCV_Chg', 8:'CP_DChg', 9:'CP_Chg',
+               10:'CR_DChg', 13:'Pause', 16:'Pulse', 17:'SIM', 19:'CV_DChg', 20:'CCCV_DChg', 21:'Control',
+               22:'OCV', 26:'CPCV_DChg', 27:'CPCV_Chg'}
+# current/capacity scale by instrument current range
+NDAX_RANGE_MULTIPLIER = {-100000000:10, 0:0, 1:1e-4, 2:1e-4, 5:1e-4,
+                         **{i:1e-2 for i in (-200000, -100000, -60000, -50000, -40000, -30000, -20000, -12000,
+                                             -10000, -6000, -5000, -3000, -2000, -1000)},
+                         **{i:1e-3 for i in (-500, -100, 10, 20, 25, 50)},
+                         **{i:1e-4 for i in (-50, -25, -20, -10)},
+                         **{i:1e-5 for i in (-5, -2, -1)},
+                         **{i:1e-2 for i in (100, 200, 250, 500)},
+                         **{i:1e-1 for i in (1000, 6000, 10000, 12000, 20000, 30000, 40000, 50000, 60000,
+                                             100000, 200000)}}
+NDAX_AUX_TYPES = {'103':'T', '335':'t', '345':'H'}
+NDC_PAGE = 4096
+
+
+def _record_dtype(fields: list, itemsize: int) -> np.dtype:
+    """Structured dtype of fixed-size little-endian binary record from (name, format, offset) fields."""
+    names, formats, offsets = zip(*fields)
+    return np.dtype({'names':list(names), 'formats':list(formats), 'offsets':list(offsets), 'itemsize':itemsize})
+
+
+_RECORD_FIELDS = [('type_v2', 'u1', 0), ('type', 'u1', 7), ('Index', '<u4', 8), ('Cycle', '<u4', 12),
+                  ('Step_Index', 'u1', 16), ('Status', 'u1', 17), ('Time', '<u8', 23), ('Voltage', '<i4', 31),
+                  ('Current', '<i4', 35), ('Charge_Capacity', '<i8', 43), ('Discharge_Capacity', '<i8', 51),
+                  ('Charge_Energy', '<i8', 59), ('Discharge_Energy', '<i8', 67), ('year', '<u2', 75),
+                  ('month', 'u1', 77), ('day', 'u1', 78), ('hour', 'u1', 79), ('minute', 'u1', 80),
+                  ('second', 'u1', 81), ('Range', '<i4', 82)]
+_AUX_FIELDS = [('type_v2', 'u1', 0), ('Aux', 'u1', 3), ('type', 'u1', 7), ('Index', '<u4', 8),
+               ('V', '<i4', 31), ('T', '<i2', 41), ('t', '<i2', 43)]
+_RUN_INFO_FIELDS = [('Time', '<i4', 0), ('Charge_Capacity', '<f4', 5), ('Discharge_Capacity', '<f4', 9),
+                    ('Charge_Energy', '<f4', 13), ('Discharge_Energy', '<f4', 17), ('dt', '<i4', 29),
+                    ('Timestamp', '<i4', 33), ('Step', '<i4', 37), ('Index', '<i4', 41), ('Msec', '<i2', 45)]
+_STEP_FIELDS = [('Cycle', '<i4', 0), ('Step_Index', '<i4', 4), ('Status', 'i1', 24)]
+
+# (version, filetype): (kind, first byte of records in page, bytes at page end, record dtype)
+# version 2 files are not paged, records are found by identifier (see _ndc_v2_records)
+NDC_LAYOUTS = {
+    (5, 1):('records', 125, 56, _record_dtype(_RECORD_FIELDS, 87)),
+    (5, 5):('aux_records', 125, 56, _record_dtype(_AUX_FIELDS, 87)),
+    (11, 1):('voltage_current', 132, 4, _record_dtype([('Voltage', '<f4', 0), ('Current', '<f4', 4)], 8)),
+    (14, 1):('voltage_current', 132, 4, _record_dtype([('Voltage', '<f4', 0), ('Current', '<f4', 4)], 8)),
+    (16, 1):('voltage_current', 132, 4, _record_dtype([('Voltage', '<f4', 0), ('Current', '<f4', 4)], 8)),
+    (17, 1):('voltage_current', 132, 4, _record_dtype([('Voltage', '<f4', 0), ('Current', '<f4', 4)], 8)),
+    (14, 5):('aux_value', 132, 4, _record_dtype([('?', '<f4', 0)], 4)),
+    (16, 5):('aux_voltage_temperature', 132, 2, _record_dtype([('V', '<f4', 1), ('T', '<i2', 5)], 7)),
+    (17, 5):('aux_value', 132, 4, _record_dtype([('?', '<f4', 0)], 4)),
+    (11, 7):('steps', 132, 5, _record_dtype(_STEP_FIELDS, 37)),
+    (14, 7):('steps', 132, 5, _record_dtype(_STEP_FIELDS, 37)),
+    (16, 7):('steps', 132, 64, _record_dtype(_STEP_FIELDS + [('Index', '<i4', 33)], 100)),
+    (17, 7):('steps', 132, 64, _record_dtype(_STEP_FIELDS + [('Index', '<i4', 33)], 100)),
+    (11, 18):('run_info', 132, 16, _record_dtype(_RUN_INFO_FIELDS, 47)),
+    (14, 18):('run_info', 132, 4, _record_dtype(_RUN_INFO_FIELDS, 55)),
+    (16, 18):('run_info', 132, 64, _record_dtype(_RUN_INFO_FIELDS, 100)),
+    (17, 18):('run_info', 132, 64, _record_dtype(_RUN_INFO_FIELDS, 100)),
+}
+# version 11 aux files have two record types, chosen by first record byte
+_NDC_11_AUX = {0x65:(132, 2, _record_dtype([('type', 'u1', 0), ('V', '<f4', 1), ('T', '<i2', 5)], 7)),
+               0x74:(132, 4, _record_dtype([('type', 'u1', 0), ('Index', '<i4', 1), ('Aux', 'i1', 5),
+                                            ('T', '<i2', 35)], 88))}
+
+
+def _status_names(codes: np.ndarray) -> pd.Categorical:
+    # the same categories in every chunk, so concatenated chunks stay categorical
+    lookup = np.array([NDAX_STATUS.get(i) for i in range(256)], dtype=object)
+    return pd.Categorical(lookup[codes.astype(np.uint8)], categories=sorted(set(NDAX_STATUS.values())))
+
+
+def _decode_records(records: np.ndarray) -> pd.DataFrame:
+    """Data records of ndc versions 2 and 5 (one record - all fields of data point)."""
+    multiplier = pd.Series(records['Range']).map(NDAX_RANGE_MULTIPLIER).to_numpy(dtype=float)
+    data = pd.DataFrame({'Index':records['Index'],
+                         'Cycle':records['Cycle'] + 1,
+                         'Step_Index':records['Step_Index'],
+                         'Status':_status_names(records['Status']),
+                         'Time':records['Time'] / 1000,
+                         'Voltage':records['Voltage'] / 10000,
+                         'Current(mA)':records['Current'] * multiplier})
+    for name in ('Charge_Capacity', 'Discharge_Capacity'):
+        data[f'{name}(mAh)'] = records[name] * multiplier / 3600
+    for name in ('Charge_Energy', 'Discharge_Energy'):
+        data[f'{name}(mWh)'] = records[name] * multiplier / 3600
+    data['Timestamp'] = pd.to_datetime(pd.DataFrame({name:records[name] for name in
+                                                     ('year', 'month', 'day', 'hour', 'minute', 'second')}))
+    return data
+
+
+def _decode_aux_records(records: np.ndarray, types: np.ndarray) -> pd.DataFrame:
+    aux = pd.DataFrame({'Index':records['Index'], 'Aux':records['Aux'],
+                        'V':records['V'] / 10000, 'T':records['T'] / 10})
+    if (types == 0x74).any():
+        aux['t'] = np.where(types == 0x74, records['t'] / 10, np.nan)
+    return aux
+
+
+def _decode_run_info(records: np.ndarray, version: int) -> pd.DataFrame:
+    records = records[records['Index'] != 0]
+    scale = 1 / 3600 if version in (11, 16) else 1000
+    data = pd.DataFrame({'Time':records['Time'] / 1000, 'dt':records['dt'] / 1000})
+    for name, unit in (('Charge_Capacity', 'mAh'), ('Discharge_Capacity', 'mAh'),
+                       ('Charge_Energy', 'mWh'), ('Discharge_Energy', 'mWh')):
+        data[f'{name}({unit})'] = records[name].astype(float) * scale
+    microseconds = (records['Timestamp'].astype(np.int64) * 1000 + records['Msec']) * 1000
+    data['Timestamp'] = pd.to_datetime(microseconds, unit='us', utc=True).tz_convert(_local_timezone())
+    data['Step'] = _count_changes(records['Step'])
+    data['Index'] = records['Index']
+    return data.drop_duplicates(subset='Index', keep='first')
+
+
+def _local_timezone():
+    from datetime import datetime
+    return datetime.now().astimezone().tzinfo
+
+
+def _count_changes(values: np.ndarray) -> np.ndarray:
+    """Number of value changes up to every element (first element - 1)."""
+    values = np.asarray(values)
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.cumsum(np.concatenate([[True], values[1:] != values[:-1]]))
+
+
+def _decode_ndc(records: np.ndarray, kind: str, version: int, start_index: int = 0) -> pd.DataFrame:
+    """
+    Decode array of records of one layout kind to dataframe.
+    start_index - number of records before this chunk (for formats, where Index is record position).
+    """
+    match kind:
+        case 'records':
+            return _decode_records(records[records['type'] == 0x55])
+        case 'aux_records':
+            types = records['type']
+            records = records[(types == 0x65) | (types == 0x74)]
+            return _decode_aux_records(records, records['type'])
+        case 'voltage_current':
+            scale_voltage, scale_current = (1e-4, 1) if version in (11, 16) else (1, 1000)
+            data = pd.DataFrame({'Voltage':records['Voltage'] * scale_voltage,
+                                 'Current(mA)':records['Current'] * scale_current})
+            data['Index'] = np.arange(start_index + 1, start_index + len(data) + 1)
+            return data[data['Voltage'] != 0]
+        case 'aux_value':
+            aux = pd.DataFrame({'?':records['?']})
+            aux['Index'] = np.arange(start_index + 1, start_index + len(aux) + 1)
+            return aux
+        case 'aux_voltage_temperature':
+            aux = pd.DataFrame({'V':records['V'] * 1e-4, 'T':records['T'] / 10})
+            aux['Index'] = np.arange(start_index + 1, start_index + len(aux) + 1)
+            return aux
+        case 'aux_11_65':
+            records = records[records['type'] == 0x65]
+            aux = pd.DataFrame({'V':records['V'] / 10000, 'T':records['T'] / 10})
+            aux['Index'] = np.arange(start_index + 1, start_index + len(aux) + 1)
+            return aux
+        case 'aux_11_74':
+            records = records[records['type'] == 0x74]
+            return pd.DataFrame({'Index':records['Index'], 'Aux':records['Aux'], 'T':records['T'] / 10})
+        case 'steps':
+            keep = records['Index'] != 0 if 'Index' in records.dtype.names else records['Step_Index'] != 0
+            records = records[keep]
+            steps = pd.DataFrame({'Cycle':records['Cycle'] + 1, 'Step_Index':records['Step_Index'],
+                                  'Status':_status_names(records['Status'])})
+            steps['Step'] = np.arange(1, len(steps) + 1)
+            return steps
+        case 'run_info':
+            return _decode_run_info(records, version)
+    raise ValueError(f'Unknown ndc record layout {kind}')
+
+
+def _ndc_v2_records(buffer: bytes, dtype: np.dtype) -> np.ndarray:
+    """
+    Records of ndc version 2: 94-byte records starting with identifier (8 bytes at 517 in header).
+    Records usually follow each other, then they are viewed at once, otherwise found by search.
+    """
+    identifier = buffer[517:525]
+    first = buffer.find(identifier) if len(identifier) == 8 else -1
+    if first == -1:
+        return np.zeros(0, dtype=dtype)
+    size = dtype.itemsize
+    count = (len(buffer) - first) // size
+    rows = np.frombuffer(buffer, dtype=np.uint8, count=count * size, offset=first).reshape(count, size)
+    if not (rows[:, :8] == np.frombuffer(identifier, dtype=np.uint8)).all():
+        offsets = []
+        position = first
+        while position != -1 and position + size <= len(buffer):
+            offsets.append(position)
+            position = buffer.find(identifier, position + size)
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        rows = data[np.asarray(offsets)[:, None] + np.arange(size)]
+    return np.ascontiguousarray(rows).view(dtype).ravel()
+
+
+def _paged_records(pages: bytes, start: int, end: int, dtype: np.dtype) -> np.ndarray:
+    """Records from whole 4096-byte pages: every page has records between start and PAGE - end bytes."""
+    n_pages = len(pages) // NDC_PAGE
+    rows = np.frombuffer(pages, dtype=np.uint8, count=n_pages * NDC_PAGE).reshape(n_pages, NDC_PAGE)
+    width = (NDC_PAGE - end - start) // dtype.itemsize * dtype.itemsize
+    return np.ascontiguousarray(rows[:, start:start + width]).view(dtype).ravel()
+
+
+class UnsupportedNdcError(ValueError):
+    """ndax archive or its ndc member has a layout, which import_ndax can not decode."""
+
+
+class _NdcReader:
+    """Reads one ndc member of ndax archive, whole or by chunks of pages."""
+
+    def __init__(self, archive, name: str):
+        self.archive = archive
+        self.name = name
+        with archive.open(name) as f:
+            header = f.read(NDC_PAGE)
+        self.filetype, self.version = header[0], header[2]
+        key = (self.version, self.filetype)
+        if self.version == 2 and self.filetype in (1, 5):
+            kind = 'records' if self.filetype == 1 else 'aux_records'
+            self.layout = (kind, None, None, _record_dtype(_RECORD_FIELDS if self.filetype == 1 else _AUX_FIELDS, 94))
+        elif self.version == 11 and self.filetype == 5:
+            with archive.open(name) as f:
+                first_page = f.read(2 * NDC_PAGE)[NDC_PAGE:]
+            record_type = first_page[132] if len(first_page) > 132 else None
+            start, end, dtype = _NDC_11_AUX.get(record_type, _NDC_11_AUX[0x65])
+            self.layout = ('aux_11_74' if record_type == 0x74 else 'aux_11_65', start, end, dtype)
+        elif key in NDC_LAYOUTS:
+            self.layout = NDC_LAYOUTS[key]
+        else:
+            raise UnsupportedNdcError(f'{name}: ndc version {self.version} filetype {self.filetype} is not supported')
+
+    def chunks(self, chunk_records: int = None):
+        """Decoded dataframes of consecutive records, about chunk_records rows each (None - one chunk)."""
+        kind, start, end, dtype = self.layout
+        if start is None:  # version 2, not paged
+            records = _ndc_v2_records(self.archive.read(self.name), dtype)
+            types = records['type_v2']
+            if kind == 'aux_records':
+                records = records[(types == 0x65) | (types == 0x74)]
+                yield _decode_aux_records(records, records['type_v2'])
+            else:
+                yield _decode_records(records[types == 0x55])
+            return
+        per_page = (NDC_PAGE - end - start) // dtype.itemsize
+        pages = None if chunk_records is None else max(1, chunk_records // per_page)
+        position = 0
+        with self.archive.open(self.name) as f:
+            f.read(NDC_PAGE)
+            while True:
+                block = f.read(-1 if pages is None else pages * NDC_PAGE)
+                if len(block) < NDC_PAGE:
+                    break
+                records = _paged_records(block, start, end, dtype)
+                yield _decode_ndc(records, kind, self.version, position)
+                position += len(records)
+                if pages is None:
+                    break
+
+    def read(self) -> pd.DataFrame:
+        frames = list(self.chunks())
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _interpolate_missing(data: pd.DataFrame):
+    """
+    Newer ndc versions keep time and capacities (runInfo) not for every record.
+    Missing time, timestamp, capacity and energy are filled from previous values and
+    integrated current/energy with last known time step.
+    """
+    valid = data['Time'].notna()
+    groups = valid.cumsum().shift(fill_value=0)
+    data['dt'] = data['dt'].ffill()
+    time_increment = data['dt'].groupby(groups).cumsum() * ~valid
+    data['Time'] = data['Time'].ffill() + time_increment
+    data['Timestamp'] = data['Timestamp'].ffill() + pd.to_timedelta(time_increment, unit='s')
+    capacity = (data['dt'] * data['Current(mA)'] / 3600).groupby(groups).cumsum() * ~valid
+    energy = (data['dt'] * data['Current(mA)'] / 3600 * data['Voltage']).groupby(groups).cumsum() * ~valid
+    for column, increment in (('Charge_Capacity(mAh)', capacity.clip(lower=0)),
+                              ('Discharge_Capacity(mAh)', capacity.clip(upper=0)),
+                              ('Charge_Energy(mWh)', energy.clip(lower=0)),
+                              ('Discharge_Energy(mWh)', energy.clip(upper=0))):
+        data[column] = data[column].ffill().abs() + increment.abs()
+
+
+def software_cycle_number(status, cycle_mode: str = 'chg', state: dict = None):
+    """
+    Cycle number as in Neware "charge first" statistics: new cycle starts at charge step
+    (discharge for 'dchg') after there has been a discharge (or SIM) step. Vectorized:
+    cycle increments at start of charge block if any discharge happened since previous charge block.
+    Args:
+        status (array-like): status names (CC_Chg, CC_DChg, Rest...)
+        cycle_mode (str): 'chg', 'dchg' or 'auto' (by first non-rest status)
+        state (dict): state after previous chunk (cycle, flag, inc, mode), updated in place
+
+    Returns:
+        np.ndarray of cycle numbers
+    """
+    status = pd.Series(status, dtype=object).fillna('')
+    state = {} if state is None else state
+    mode = state.get('mode', cycle_mode).lower()
+    if mode == 'auto':
+        active = status[status != 'Rest']
+        if not len(active):
+            return np.full(len(status), state.get('cycle', 1))
+        mode = active.iloc[0].partition('_')[2].lower() or 'chg'
+        mode = mode if mode in ('chg', 'dchg') else 'chg'
+    if mode not in ('chg', 'dchg'):
+        raise KeyError(f"Cycle_Mode '{cycle_mode}' not recognized. Supported options are 'chg', 'dchg', and 'auto'.")
+    state['mode'] = mode
+    increment_key, other_key = ('Chg', 'DChg') if mode == 'chg' else ('DChg', 'Chg')
+    values = status.to_numpy()
+    suffix = status.str.partition('_')[2].to_numpy()
+    incremental = np.isin(values, [f'CCCV_{increment_key}', f'CC_{increment_key}', f'CP_{increment_key}'])
+    flags = (suffix == other_key) | (values == 'SIM')
+    previous = np.concatenate([[state.get('inc', False)], incremental[:-1]])
+    edges = np.flatnonzero(incremental & ~previous)
+    flag_count = np.concatenate([[0], np.cumsum(flags)])
+    before = flag_count[edges] - np.concatenate([[0], flag_count[edges[:-1]]])
+    if len(edges):
+        before[0] += state.get('flag', False)
+    start = np.zeros(len(values), dtype=np.int64)
+    start[edges[before > 0]] = 1
+    cycles = state.get('cycle', 1) + np.cumsum(start)
+    last_edge = edges[-1] if len(edges) else None
+    if last_edge is None:
+        state['flag'] = bool(state.get('flag', False) or flags.any())
+    else:
+        state['flag'] = bool(flags[last_edge:].any())
+    state['inc'] = bool(incremental[-1]) if len(incremental) else state.get('inc', False)
+    state['cycle'] = int(cycles[-1]) if len(cycles) else state.get('cycle', 1)
+    return cycles
+
+
+def _aux_members(archive) -> list:
+    """Aux ndc members with their TestInfo.xml attributes (AuxID, ChlType), in file number order."""
+    members = []
+    for name in archive.namelist():
+        match = re.search(r'data_AUX_(\d+)_(\d+)_(\d+)\.ndc', name)
+        if match:
+            members.append((name, list(map(int, match.groups()))))
+        else:
+            match = re.search(r'.*_(\d+)\.ndc', name)
+            if match:
+                members.append((name, [int(match.group(1)), 0, 0]))
+    members.sort(key=lambda x:x[1])
+    names = [name for name, _ in members]
+    info = [{} for _ in names]
+    if names and 'TestInfo.xml' in archive.namelist():
+        import xml.etree.ElementTree as ElementTree
+        try:
+            test_info = ElementTree.fromstring(archive.read('TestInfo.xml').decode('gb2312', errors='ignore'))
+            test_info = test_info.find('config/TestInfo')
+            channels = [i.attrib for i in test_info if 'Aux' in i.tag] if test_info is not None else []
+            if len(channels) == len(names):
+                info = channels
+            else:
+                print('import_ndax: Warning! Different number of aux channels in files and TestInfo.xml')
+        except ElementTree.ParseError:
+            print('import_ndax: Warning! Could not read TestInfo.xml')
+    return list(zip(names, info))
+
+
+def _read_aux(archive, name: str, info: dict, number: int) -> pd.DataFrame:
+    """Aux channel table with columns suffixed by aux id (T1, V1...), indexed by Index."""
+    aux = _NdcReader(archive, name).read()
+    aux_id = info.get('AuxID')
+    if aux_id is None:
+        aux_id = aux['Aux'].iloc[0] if 'Aux' in aux.columns and len(aux) else -number - 1
+    if '?' in aux.columns and info.get('ChlType') in NDAX_AUX_TYPES:
+        aux = aux.rename(columns={'?':NDAX_AUX_TYPES[info['ChlType']]})
+    aux = aux.drop(columns=['Aux'], errors='ignore')
+    aux = aux.astype({column:'float32' for column in ('V', 'T', 't', 'H') if column in aux.columns})
+    aux = aux.rename(columns={column:f'{column}{aux_id}' for column in aux.columns if column != 'Index'})
+    return aux.drop_duplicates(subset='Index').set_index('Index')
+
+
+def _open_ndax(filepath: str, aux: bool) -> tuple:
+    """
+    Open ndax archive and read everything except data records: layouts of all members are checked here,
+    so unsupported archives raise UnsupportedNdcError before any data is returned.
+    Returns:
+        (archive, data reader, runInfo, steps, aux tables), runInfo and steps are None for versions 2 and 5
+    """
+    import zipfile
+    archive = zipfile.ZipFile(filepath)
+    try:
+        names = archive.namelist()
+        if 'data.ndc' not in names:
+            raise UnsupportedNdcError(f'{filepath}: ndax without data.ndc is not supported')
+        data_reader = _NdcReader(archive, 'data.ndc')
+        split = 'data_runInfo.ndc' in names and 'data_step.ndc' in names
+        run_info = _NdcReader(archive, 'data_runInfo.ndc').read() if split else None
+        steps = _NdcReader(archive, 'data_step.ndc').read() if split else None
+        aux_tables = [_read_aux(archive, name, info, i) for i, (name, info) in enumerate(_aux_members(archive))] \
+            if aux else []
+    except BaseException:
+        archive.close()
+        raise
+    return archive, data_reader, run_info, steps, aux_tables
+
+
+def _read_ndax_chunks(opened: tuple, columns, chunksize, cycle_mode):
+    archive, data_reader, run_info, steps, aux_tables = opened
+    split = run_info is not None
+    with archive:
+        aux_columns = [column for table in aux_tables for column in table.columns]
+        output_columns = NDAX_COLUMNS + aux_columns if columns is None else list(columns)
+
+        previous = None
+        step_state = {}
+        cycle_state = {}
+        for data in data_reader.chunks(chunksize):
+            if split:
+                if len(data):
+                    first, last = data['Index'].iloc[0], data['Index'].iloc[-1]
+                    chunk_info = run_info[(run_info['Index'] >= first) & (run_info['Index'] <= last)]
+                else:
+                    chunk_info = run_info.iloc[:0]
+                data = data.merge(chunk_info, how='left', on='Index')
+                if previous is not None:  # last complete row of previous chunk continues fills
+                    data = pd.concat([previous, data], ignore_index=True)
+                data['Step'] = data['Step'].ffill()
+                data = data.drop(columns=['Cycle', 'Step_Index', 'Status'], errors='ignore')
+                data = data.merge(steps, how='left', on='Step')
+                if data['Time'].isna().any():
+                    _interpolate_missing(data)
+                if previous is not None:
+                    data = data.iloc[len(previous):].reset_index(drop=True)
+                previous = data.iloc[-1:] if len(data) else previous
+            elif len(data):  # step number counts changes of step index, continued from previous chunk
+                step_index = data['Step_Index'].to_numpy()
+                changes = np.concatenate([[step_index[0] != step_state.get('index')], step_index[1:] != step_index[:-1]])
+                data['Step'] = step_state.get('step', 0) + np.cumsum(changes)
+                step_state.update(index=step_index[-1], step=int(data['Step'].iloc[-1]))
+            data = data.reindex(columns=NDAX_COLUMNS)
+            for table in aux_tables:
+                data = data.join(table, on='Index')
+            if cycle_mode is not None:
+                data['Cycle'] = software_cycle_number(data['Status'], cycle_mode, cycle_state)
+            data = data.astype({column:dtype for column, dtype in NDAX_DTYPES.items()
+                                if column in data.columns and not (dtype != 'category' and data[column].isna().any())})
+            yield data.reindex(columns=output_columns)
+
+
+@profiled(reads='filepath')
+def import_ndax(filepath: str,
+                columns: list[str] = None,
+                chunksize: int = None,
+                aux: bool = True,
+                cycle_mode: str | None = 'chg',
+                fallback: bool = True):
+    """
+    Read Neware .ndax archive without external dependencies. Binary ndc records are decoded
+    with NumPy structured dtypes (whole pages at once, no per-record python code):
+    ndc versions 2 and 5 (all fields in one record) and 11, 14, 16, 17 (voltage/current in data.ndc,
+    time and capacities in data_runInfo.ndc, step types in data_step.ndc).
+    Aux channels (temperature etc.) are merged by record index as T1, V1... columns.
+    Columns and their units are the same as NewareNDA.read output, if the ndc version is not supported
+    and NewareNDA is installed, it is used instead (without chunks), otherwise UnsupportedNdcError is raised.
+    Args:
+        filepath (str): path to .ndax file
+        columns (list[str]): output columns, None - all (with aux columns)
+        chunksize (int): if given, iterator of dataframes with about chunksize records is returned,
+                         only data.ndc is read by chunks (runInfo, steps and aux are read once)
+        aux (bool): merge aux channels
+        cycle_mode (str): regenerate cycle number: 'chg' (charge first), 'dchg', 'auto', None - keep
+                          cycle number from file
+        fallback (bool): use NewareNDA for unsupported versions if installed
+
+    Returns:
+        pd.DataFrame, or iterator of pd.DataFrame if chunksize is given
+    """
+    try:
+        opened = _open_ndax(filepath, aux)
+    except UnsupportedNdcError:
+        import importlib.util
+        if not fallback or importlib.util.find_spec('NewareNDA') is None:
+            raise
+        import NewareNDA
+        data = NewareNDA.read(filepath, software_cycle_number=cycle_mode is not None, cycle_mode=cycle_mode or 'chg')
+        data = data.reindex(columns=columns) if columns is not None else data
+        return iter([data]) if chunksize is not None else data
+    chunks = _read_ndax_chunks(opened, columns, chunksize, cycle_mode)
+    if chunksize is not None:
+        return chunks
+    frames = list(chunks)
+    if not frames:
+        return pd.DataFrame(columns=NDAX_COLUMNS if columns is None else columns)
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
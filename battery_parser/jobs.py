@@ -0,0 +1,369 @@
+"""
+Batch processing of experiment files by declarative job file (TOML or YAML):
+
+    python -m battery_parser job.toml
+
+Job file example (TOML):
+
+    [input]
+    roots = ['D:/cycling/2025-01-10']
+    filetypes = ['ndax']
+    path_regex = '(\\d{3}-\\d-\\d)'
+    regex_columns = ['channel']
+    mapping = 'D:/cycling/mapping.xlsx'     # optional table, merged with parsed columns
+    mapping_sheet = 'Соответствие'
+    mapping_on = ['channel']
+    key_column = 'pouch'                     # column used for output file names
+
+    [normalize]                               # optional
+    rename = {'Voltage' = 'E'}
+    default_rename = true
+    time_column = 'Time'
+    datetime_column = 'Datetime'
+
+    [statistics]
+    group_marker = 'Step'
+    pattern = {'Voltage' = ['mean', 'first', 'last'], 'Time' = ['range', 'diff']}
+
+    [segments]                                # optional, name = {column, values}
+    cycles = {column = 'Step_Index_mean', values = [6, 7, 8, 9, 10]}
+
+    [output]
+    directory = 'D:/cycling/2025-01-10/statistics'
+    format = 'csv'                            # or 'parquet'
+    workers = 4
+    skip = 'mtime'                            # 'mtime', 'hash' or 'none'
+
+Stages for every file: import -> normalize -> statistics -> segments -> export.
+Only standard library is imported at start, processing modules are imported by workers.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+MANIFEST_NAME = '.battery_parser_manifest.json'
+
+
+def load_job(filepath: str) -> dict:
+    """
+    Read job file. Format is chosen by extension: .toml or .yml/.yaml (requires PyYAML).
+    Args:
+        filepath (str): path to job file
+
+    Returns:
+        (dict) job configuration
+    """
+    extension = os.path.splitext(filepath)[-1].lower()
+    match extension:
+        case '.toml':
+            import tomllib
+            with open(filepath, 'rb') as f:
+                job = tomllib.load(f)
+        case '.yml' | '.yaml':
+            import yaml
+            with open(filepath, encoding='utf-8') as f:
+                job = yaml.safe_load(f)
+        case _:
+            raise ValueError(f'Unknown job file format {extension}')
+    if 'input' not in job or 'output' not in job:
+        raise ValueError('Job file should have [input] and [output] sections.')
+    return job
+
+
+def job_fingerprint(job: dict) -> str:
+    """Hash of processing part of job, changed config makes all outputs outdated."""
+    processing = {key:job.get(key) for key in ('normalize', 'statistics', 'segments')}
+    processing['format'] = job['output'].get('format', 'csv')
+    return hashlib.sha1(json.dumps(processing, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def file_state(filepath: str, check: str = 'mtime') -> dict:
+    """
+    State of source file for up-to-date check: size and mtime, and sha256 for 'hash' check.
+    """
+    stat = os.stat(filepath)
+    state = {'size':stat.st_size, 'mtime':stat.st_mtime}
+    if check == 'hash':
+        hash_func = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            while chunk := f.read(1024 * 1024):
+                hash_func.update(chunk)
+        state['hash'] = hash_func.hexdigest()
+    return state
+
+
+def _inside(path: str, directory: str) -> bool:
+    """path is directory or lies under it (paths on different drives never do)."""
+    if os.path.splitdrive(path)[0].lower() != os.path.splitdrive(directory)[0].lower():
+        return False
+    try:
+        return os.path.commonpath([path, directory]) == directory
+    except ValueError:  # mix of absolute and relative paths
+        return False
+
+
+def collect_files(job: dict) -> list[dict]:
+    """
+    Find all input files of job and their metadata (parsed by path_regex and merged with mapping).
+    Args:
+        job (dict): job configuration
+
+    Returns:
+        list of records, every record have 'path' and 'key' (name for output files),
+        records of files not matched by path_regex have 'error' instead of parsed columns
+    """
+    import re
+    from .importing import list_files, Regex_parse
+    job_input = job['input']
+    output_directory = os.path.realpath(job['output']['directory'])
+    files = []
+    for root in job_input['roots']:
+        files.extend(list_files(root, job_input.get('filetypes', ['csv'])))
+    # outputs written under an input root are not inputs
+    files = [path for path in files if not _inside(os.path.realpath(path), output_directory)]
+    if not files:
+        return []
+    if 'path_regex' not in job_input:
+        return [{'path':path, 'key':os.path.splitext(os.path.basename(path))[0]} for path in files]
+
+    import pandas as pd
+    pattern = job_input['path_regex']
+    unmatched = [{'path':path, 'key':os.path.splitext(os.path.basename(path))[0],
+                  'error':f'path_regex {pattern!r} did not match'} for path in files if not re.search(pattern, path)]
+    files = [path for path in files if re.search(pattern, path)]
+    if not files:
+        return unmatched
+    parser = Regex_parse()
+    table = parser(strings=files,
+                   pattern=pattern,
+                   column_names=list(job_input.get('regex_columns', ['key'])))
+    if 'mapping' in job_input:
+        mapping_path = job_input['mapping']
+        if os.path.splitext(mapping_path)[-1].lower() == '.csv':
+            mapping = pd.read_csv(mapping_path)
+        else:
+            mapping = pd.read_excel(mapping_path, sheet_name=job_input.get('mapping_sheet', 0))
+        table = pd.merge(table, mapping, on=job_input.get('mapping_on'), how='left')
+    key_column = job_input.get('key_column', table.columns[0])
+    table['key'] = table[key_column].astype(str)
+    return table.to_dict('records') + unmatched
+
+
+def output_paths(job: dict, key: str) -> dict:
+    """Output file paths for statistics and every segment of job."""
+    output = job['output']
+    extension = output.get('format', 'csv')
+    paths = {'statistics':os.path.join(output['directory'], f'{key}.{extension}')}
+    for name in job.get('segments', {}):
+        paths[name] = os.path.join(output['directory'], name, f'{key}.{extension}')
+    return paths
+
+
+def export_frame(data, filepath: str, output_format: str):
+    if output_format == 'parquet':
+        directory = os.path.dirname(filepath)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        data.to_parquet(filepath)
+    else:
+        from .exporting import save_experiment
+        save_experiment(data, filepath)
+
+
+def process_file(job: dict, record: dict) -> dict:
+    """
+    Run all stages for one file: import -> normalize -> statistics -> segments -> export.
+    Args:
+        job (dict): job configuration
+        record (dict): file record from collect_files
+
+    Returns:
+        (dict) stage timings in seconds, number of rows and output paths
+    """
+    import pandas as pd
+    from .experiment import load_data
+    from .modifications import rename_columns, parse_time
+    from .statistics import generate_statistics, find_segments
+
+    timings = {}
+    start = time.perf_counter()
+    data = load_data(record['path'])
+    timings['import'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    normalize = job.get('normalize', {})
+    rename_columns(data, rename=normalize.get('rename'), default_rename=normalize.get('default_rename', True))
+    if normalize.get('time_column') or normalize.get('datetime_column'):
+        parse_time(data, time_column=normalize.get('time_column'), datetime_column=normalize.get('datetime_column'))
+    timings['normalize'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    statistics_config = job.get('statistics', {})
+    kwargs = {'group_marker':statistics_config.get('group_marker', 'Step')}
+    if 'pattern' in statistics_config:
+        kwargs['statistics_pattern'] = statistics_config['pattern']
+    statistics = generate_statistics(data, **kwargs)
+    rows = len(data)
+    del data
+    timings['statistics'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    segments = {}
+    for name, segment in job.get('segments', {}).items():
+        found = find_segments(statistics, segment['column'], segment['values'])
+        segments[name] = pd.concat(found, keys=range(len(found)),
+                                   names=['segment']).reset_index(level='segment') if found else None
+    timings['segments'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output_format = job['output'].get('format', 'csv')
+    paths = output_paths(job, record['key'])
+    outputs = {'statistics':paths['statistics']}
+    export_frame(statistics, paths['statistics'], output_format)
+    for name, segment in segments.items():
+        if segment is not None:
+            export_frame(segment, paths[name], output_format)
+            outputs[name] = paths[name]
+    timings['export'] = time.perf_counter() - start
+    return {'rows':rows, 'timings':timings, 'outputs':outputs}
+
+
+def load_manifest(directory: str) -> dict:
+    path = os.path.join(directory, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(directory: str, manifest: dict):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def is_up_to_date(entry: dict, state: dict, fingerprint: str) -> bool:
+    if not entry or entry.get('job') != fingerprint:
+        return False
+    if any(entry.get('source', {}).get(key) != value for key, value in state.items()):
+        return False
+    return all(os.path.exists(path) for path in entry.get('outputs', {}).values())
+
+
+def run_job(job: dict, workers: int = None, force: bool = False) -> list[dict]:
+    """
+    Process all files of job and write summary report to output directory (summary.csv,
+    merged with summary of previous runs).
+    Files with unchanged source state (by mtime or hash) and unchanged job config are skipped.
+    Args:
+        job (dict): job configuration
+        workers (int): number of worker processes, default from job [output] workers (1)
+        force (bool): process all files even if outputs are up to date
+
+    Returns:
+        list of summary records, one per file
+    """
+    output = job['output']
+    directory = output['directory']
+    workers = workers or output.get('workers', 1)
+    check = output.get('skip', 'mtime')
+    fingerprint = job_fingerprint(job)
+    manifest = load_manifest(directory)
+
+    summary = []
+    tasks = []
+    for record in collect_files(job):
+        if 'error' in record:
+            line = {'path':record['path'], 'key':record['key'], 'status':'failed', 'error':record['error']}
+            summary.append(line)
+            print(f"failed: {record['path']}")
+            continue
+        state = file_state(record['path'], check) if check != 'none' else {}
+        if not force and check != 'none' and is_up_to_date(manifest.get(record['path']), state, fingerprint):
+            summary.append({'path':record['path'], 'key':record['key'], 'status':'skipped'})
+        else:
+            tasks.append((record, state))
+
+    def finish(record, state, result=None, error=None):
+        line = {'path':record['path'], 'key':record['key']}
+        if error is not None:
+            line.update(status='failed', error=repr(error))
+        else:
+            line.update(status='done', rows=result['rows'], **result['timings'])
+            manifest[record['path']] = {'source':state, 'job':fingerprint, 'outputs':result['outputs']}
+            save_manifest(directory, manifest)
+        summary.append(line)
+        print(f"{line['status']}: {record['path']}")
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(process_file, job, record):(record, state) for record, state in tasks}
+            for future in as_completed(futures):
+                record, state = futures[future]
+                try:
+                    finish(record, state, result=future.result())
+                except Exception as error:
+                    finish(record, state, error=error)
+    else:
+        for record, state in tasks:
+            try:
+                finish(record, state, result=process_file(job, record))
+            except Exception as error:
+                finish(record, state, error=error)
+
+    write_summary(summary, os.path.join(directory, 'summary.csv'))
+    return summary
+
+
+def write_summary(summary: list[dict], filepath: str):
+    """
+    Write summary records to csv with standard library only. Existing summary is merged:
+    records of this run replace records of the same path, skipped files keep their previous record.
+    """
+    import csv
+    directory = os.path.dirname(filepath)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    merged = {}
+    if os.path.exists(filepath):
+        with open(filepath, newline='', encoding='utf-8') as f:
+            merged = {line['path']:line for line in csv.DictReader(f)}
+    for line in summary:
+        if line['status'] != 'skipped' or line['path'] not in merged:
+            merged[line['path']] = line
+    summary = list(merged.values())
+    columns = list(dict.fromkeys(key for line in summary for key in line))
+    with open(filepath, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(summary)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m battery_parser',
+                                     description='Batch processing of cycling data by job file')
+    parser.add_argument('job', nargs='+', help='job files (.toml, .yml, .yaml)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('-f', '--force', action='store_true', help='process up-to-date files too')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for job_path in args.job:
+        summary = run_job(load_job(job_path), workers=args.workers, force=args.force)
+        counts = {}
+        for line in summary:
+            counts[line['status']] = counts.get(line['status'], 0) + 1
+        print(f'{job_path}: ' + ', '.join(f'{status} {n}' for status, n in counts.items()))
+        failed += counts.get('failed', 0)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,17 @@
 import itertools
 import re
 
+import numpy as np
 import pandas as pd
 import pandas.api.types
 
+from .profiling import profiled
+
 
 # TODO add retype functions
 
 
+@profiled
 def rename_columns(data: pd.DataFrame,
                    rename: dict = None,
                    default_rename=True,
@@ -66,6 +70,7 @@ def rename_columns(data: pd.DataFrame,
         return data.rename(mapper=rename_dict, axis=1)
 
 
+@profiled
 def parse_time(dataframe: pd.DataFrame,
                time_column: str = None,
                time_unit: str = 'S',
@@ -98,16 +103,372 @@ def parse_time(dataframe: pd.DataFrame,
 
 def check_unity(data: pd.DataFrame):
     """
-    Check if dataframe have sequential indexes
+    Check if dataframe have sequential indexes (every next index is previous + 1)
     Args:
-        data (): Dataframe for check
+        data (): Dataframe for check or array of index values
 
     Returns:
         bool - if indexes sequential
     """
-    return all(data.index.diff().to_frame().mean() == 1)
+    index = data.index.to_numpy() if isinstance(data, (pd.DataFrame, pd.Series)) else np.asarray(data)
+    return bool(np.all(np.diff(index) == 1))
+
+
+def _runs(mask: np.ndarray):
+    """Start and stop (exclusive) positions of all runs of True values in mask."""
+    bounds = np.diff(np.concatenate([[0], mask.view(np.int8), [0]]))
+    return np.flatnonzero(bounds == 1), np.flatnonzero(bounds == -1)
+
+
+def _issues(issue: str, mask: np.ndarray, values: np.ndarray = None, detail: str = ''):
+    """Issue records for all runs of flagged rows, detail gets value of first row of run."""
+    starts, stops = _runs(mask)
+    records = []
+    for start, stop in zip(starts, stops):
+        value = '' if values is None else f'{values[start]}'
+        records.append({'issue':issue, 'start':start, 'stop':stop, 'count':stop - start,
+                        'detail':(detail + ' ' + value).strip()})
+    return records
+
+
+@profiled
+def scan_integrity(data: pd.DataFrame,
+                   index_column='Index',
+                   time_column='Time',
+                   datetime_column='Datetime',
+                   step_column='Step',
+                   source_column=None,
+                   voltage_column='E',
+                   current_column='I',
+                   voltage_range=(0.0, 5.0),
+                   current_range=None,
+                   gap_periods=10):
+    """
+    Check raw experiment in one vectorized pass and report issues:
+        'duplicated_index' - rows with repeated index value;
+        'missing_index' - index jumps by more than 1 (detail - number of missing rows);
+        'non_monotonic_index', 'non_monotonic_time', 'non_monotonic_datetime' - values going back
+            (time is checked inside steps, because relative time resets every step);
+        'time_gap', 'datetime_gap' - distance between records longer than gap_periods sampling periods
+            (sampling period is median distance);
+        'voltage_out_of_range', 'current_out_of_range' - values outside given ranges;
+        'split_step' - step that appears in several separate blocks of rows;
+        'step_across_sources' - step with rows from several files (source_column).
+    Missing columns are skipped.
+    Args:
+        data (pd.DataFrame): raw experiment
+        index_column (str): record index column, None - dataframe index
+        time_column (str): relative time column in seconds
+        datetime_column (str): absolute datetime column
+        step_column (str): step column
+        source_column (str): column with source file of every row
+        voltage_column (str): voltage column
+        current_column (str): current column
+        voltage_range (tuple): allowed (min, max) voltage, None - not checked
+        current_range (tuple): allowed (min, max) current, None - not checked
+        gap_periods (float): gap threshold in sampling periods
+
+    Returns:
+        pd.DataFrame of issues with columns issue, start, stop (row positions, stop exclusive),
+        count and detail. Empty dataframe means no issues were found.
+    """
+    records = []
+    columns = data.columns
+    if index_column is None:
+        index = data.index.to_numpy()
+    elif index_column in columns:
+        index = data[index_column].to_numpy()
+    else:
+        index = None
+    if index is not None and len(index) > 1:
+        records += _issues('duplicated_index', pd.Series(index).duplicated().to_numpy(), index)
+        step = np.diff(index)
+        missing = np.concatenate([[False], step > 1])
+        records += _issues('missing_index', missing, np.concatenate([[0], step - 1]), 'missing rows:')
+        records += _issues('non_monotonic_index', np.concatenate([[False], step < 0]), index)
+
+    step_values = data[step_column].to_numpy() if step_column in columns else None
+    same_step = None
+    if step_values is not None and len(step_values) > 1:
+        same_step = np.concatenate([[False], step_values[1:] == step_values[:-1]])
+        block_start = ~same_step
+        block_start[0] = True
+        blocks = pd.DataFrame({'step':step_values[block_start], 'position':np.flatnonzero(block_start)})
+        blocks = blocks[blocks['step'].duplicated(keep=False)]
+        split = blocks.groupby('step', sort=False)['position'].agg(['first', 'last', 'count'])
+        for value, first, last, count in split.itertuples():
+            records.append({'issue':'split_step', 'start':first, 'stop':last + 1,
+                            'count':count, 'detail':f'step {value} in {count} blocks'})
+        if source_column in columns:
+            steps = data.groupby(step_column, sort=False)
+            sources = steps[source_column].nunique()
+            rows = pd.Series(np.arange(len(data))).groupby(step_values, sort=False).agg(['first', 'last', 'count'])
+            for value, n_sources in sources[sources > 1].items():
+                first, last, count = rows.loc[value]
+                records.append({'issue':'step_across_sources', 'start':first, 'stop':last + 1,
+                                'count':count, 'detail':f'step {value} in {n_sources} files'})
+
+    for column, name, inside_step in ((time_column, 'time', True), (datetime_column, 'datetime', False)):
+        if column not in columns or len(data) < 2:
+            continue
+        values = data[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = (values - values.min()).dt.total_seconds()
+        elif not pd.api.types.is_numeric_dtype(values):
+            continue
+        delta = np.diff(values.to_numpy(dtype=float))
+        if inside_step and same_step is not None:
+            delta[~same_step[1:]] = np.nan
+        positive = delta[delta > 0]
+        records += _issues(f'non_monotonic_{name}', np.concatenate([[False], delta < 0]),
+                           np.concatenate([[0], delta]), 'step back, s:')
+        if positive.size:
+            period = np.median(positive)
+            records += _issues(f'{name}_gap', np.concatenate([[False], delta > gap_periods * period]),
+                               np.concatenate([[0], delta]), 'gap, s:')
+
+    for column, name, value_range in ((voltage_column, 'voltage', voltage_range),
+                                      (current_column, 'current', current_range)):
+        if value_range is None or column not in columns:
+            continue
+        values = data[column].to_numpy(dtype=float)
+        outside = (values < value_range[0]) | (values > value_range[1])
+        records += _issues(f'{name}_out_of_range', outside, values, 'first value:')
+
+    return pd.DataFrame.from_records(records, columns=['issue', 'start', 'stop', 'count', 'detail'])
+
+
+STEP_STATUSES = {'rest':'Rest',
+                 'cc_charge':'CC_Chg',
+                 'cv_charge':'CV_Chg',
+                 'cc_discharge':'CC_DChg',
+                 'cv_discharge':'CV_DChg'}
+
+
+def _window_change(values: np.ndarray, window: int, run_starts: np.ndarray) -> np.ndarray:
+    """
+    Absolute change of trailing moving average over window records (noise is averaged out).
+    Averages do not cross run boundaries (run_starts - position of run start for every record).
+    """
+    cumsum = np.concatenate([[0.0], np.cumsum(values)])
+    stop = np.arange(1, len(values) + 1)
+    start = np.maximum(run_starts, stop - window)
+    average = (cumsum[stop] - cumsum[start]) / (stop - start)
+    return np.abs(average - average[np.maximum(run_starts, stop - 1 - window)])
+
+
+def _noise_level(values: np.ndarray) -> float:
+    """
+    Standard deviation of measurement noise: median absolute deviation of differences of neighbour
+    records (robust to steps and slow trends), scaled to gaussian std.
+    """
+    differences = np.diff(values)
+    differences = differences[np.isfinite(differences)]
+    if not len(differences):
+        return 0.0
+    return 1.4826 * np.median(np.abs(differences - np.median(differences))) / np.sqrt(2)
+
+
+def _fill_runs(codes: pd.Series, groups: np.ndarray = None, min_points: int = 1) -> np.ndarray:
+    """
+    Hysteresis by forward fill: undecided (NaN) records keep previous decision (inside groups),
+    runs shorter than min_points are treated as undecided too.
+    """
+    codes = _fill(codes, groups)
+    if min_points > 1 and len(codes):
+        values = codes.to_numpy()
+        change = np.concatenate([[True], values[1:] != values[:-1]])
+        if groups is not None:
+            change[1:] |= groups[1:] != groups[:-1]
+        run = np.cumsum(change)
+        length = np.bincount(run)[run]
+        short = length < min_points
+        if short.any() and not short.all():
+            codes = _fill(codes.mask(short), groups)
+    return codes.to_numpy()
+
+
+def _fill(codes: pd.Series, groups: np.ndarray = None) -> pd.Series:
+    """Forward, then backward fill of NaN, both restricted to groups."""
+    if groups is None:
+        return codes.ffill().bfill()
+    return codes.groupby(groups).ffill().groupby(groups).bfill()
+
+
+@profiled
+def segment_steps(data: pd.DataFrame,
+                  current_column='I',
+                  voltage_column='E',
+                  time_column=None,
+                  rest_current: float = None,
+                  hysteresis: float = 2.0,
+                  current_tolerance: float = 0.005,
+                  voltage_tolerance: float = 0.002,
+                  window: int = 5,
+                  min_points: int = 3,
+                  step_column='Step',
+                  status_column='Status',
+                  statuses: dict = None):
+    """
+    Derive steps from raw current and voltage, for data without trustworthy step numbering
+    (EC-Lab exports, merged records). Every record is classified in one vectorized pass:
+        rest - |I| below rest_current (leaves rest only when |I| exceeds rest_current * hysteresis);
+        CC charge / CC discharge - current sign, current stable (relative change of moving average
+            over window records below current_tolerance);
+        CV charge / CV discharge - voltage stable (change below voltage_tolerance, V) while current changes.
+    Undecided records (transients) keep previous class, runs shorter than min_points records are merged
+    to neighbours. New step starts on every class change and where relative time goes back.
+        data[['Step', 'Status']] = segment_steps(data, time_column='Time')
+    Args:
+        data (pd.DataFrame): raw experiment
+        current_column (str): current column
+        voltage_column (str): voltage column
+        time_column (str): relative time column, resets of it start new steps, None - not used
+        rest_current (float): rest threshold in A, default 5 std of current noise (not below 0.1% of max |I|)
+        hysteresis (float): factor of rest threshold for leaving rest
+        current_tolerance (float): relative current change for constant current
+        voltage_tolerance (float): voltage change for constant voltage, V
+        window (int): number of records for moving average
+        min_points (int): minimal number of records in step
+        step_column (str): name for synthetic step column
+        status_column (str): name for synthetic status column
+        statuses (dict): names of classes, keys as in STEP_STATUSES
+
+    Returns:
+        pd.DataFrame with step (from 1) and status columns and the same index as data
+    """
+    statuses = {**STEP_STATUSES, **(statuses or {})}
+    current = data[current_column].to_numpy(dtype=float)
+    voltage = data[voltage_column].to_numpy(dtype=float)
+    absolute = np.abs(current)
+    if rest_current is None:
+        rest_current = max(1e-3 * np.nanmax(absolute), 5 * _noise_level(current)) if len(absolute) else 0.0
+
+    rest = pd.Series(np.where(absolute <= rest_current, 1.0, np.where(absolute > rest_current * hysteresis, 0.0, np.nan)))
+    rest = _fill_runs(rest, min_points=min_points).astype(bool) if len(rest) else np.zeros(0, bool)
+    direction = np.sign(current)
+    direction[rest] = 0
+    direction = _fill_runs(pd.Series(direction).replace(0, np.nan).mask(rest, 0), min_points=min_points)
+
+    boundary = np.concatenate([[True], direction[1:] != direction[:-1]]) if len(direction) else np.zeros(0, bool)
+    if time_column is not None and time_column in data.columns and len(boundary) > 1:
+        boundary[1:] |= np.diff(data[time_column].to_numpy(dtype=float)) < 0
+    run = np.cumsum(boundary)
+    run_starts = np.flatnonzero(boundary)[run - 1]
+
+    current_change = _window_change(current, window, run_starts) / np.maximum(absolute, rest_current)
+    voltage_change = _window_change(voltage, window, run_starts)
+    constant_current = current_change < current_tolerance
+    constant_voltage = (voltage_change < voltage_tolerance) & ~constant_current
+    mode = pd.Series(np.where(constant_current, 1.0, np.where(constant_voltage, 2.0, np.nan)))
+    mode[rest] = 0.0
+    mode = _fill_runs(mode, groups=run, min_points=min_points)
+    mode = np.where(np.isnan(mode), 1.0, mode)
+
+    # class codes: 0 - rest, 1/2 - CC/CV charge, 3/4 - CC/CV discharge
+    code = np.where(direction == 0, 0, np.where(direction > 0, mode, mode + 2)).astype(np.int8)
+    names = np.array([statuses['rest'], statuses['cc_charge'], statuses['cv_charge'],
+                      statuses['cc_discharge'], statuses['cv_discharge']], dtype=object)
+    new_step = boundary.copy()
+    new_step[1:] |= code[1:] != code[:-1]
+    return pd.DataFrame({step_column:np.cumsum(new_step), status_column:names[code]}, index=data.index)
+
+
+def _segment_cumsum(values: np.ndarray, segments: np.ndarray) -> np.ndarray:
+    """Cumulative sum restarting at every new segment (segments - sorted segment numbers of rows)."""
+    total = np.cumsum(values)
+    if not len(values):
+        return total
+    starts = np.flatnonzero(np.concatenate([[True], segments[1:] != segments[:-1]]))
+    before = np.concatenate([[0.0], total[starts[1:] - 1]])
+    return total - np.repeat(before, np.diff(np.append(starts, len(values))))
+
+
+@profiled
+def coulomb_counting(data: pd.DataFrame,
+                     current_column='I',
+                     voltage_column='E',
+                     time_column='Time',
+                     step_column='Step',
+                     reference='max',
+                     reference_soc: float = None,
+                     capacity: float = None,
+                     absolute=True,
+                     capacity_column='Q',
+                     throughput_column='Q_throughput',
+                     energy_column='Energy',
+                     soc_column='SoC'):
+    """
+    Recompute capacity, energy and state of charge from current, voltage and time
+    (cycler Q/Energy columns reset differently, drift or are lost after merging files).
+    Trapezoidal integration over all records in one pass, step resets are made with segment cumsums.
+    Intervals where time goes back (merged files) or is missing are not integrated.
+        data[['Q', 'Q_throughput', 'Energy', 'SoC']] = coulomb_counting(data)
+    Args:
+        data (pd.DataFrame): raw experiment, time in seconds (see parse_time), current in A, voltage in V
+        current_column (str): current column, positive for charge
+        voltage_column (str): voltage column, None - energy is not computed
+        time_column (str): relative time column in seconds
+        step_column (str): capacity and energy restart at every step, None - integrated over all records
+        reference (str|int): record with reference SoC: 'max' - most charged, 'min' - most discharged,
+                             'first', 'last' or index label of record
+        reference_soc (float): SoC at reference record, default 1 for 'max', 0 otherwise
+        capacity (float): capacity for SoC in Ah, default range of net charge (SoC from 0 to 1)
+        absolute (bool): step capacity and energy as absolute values (as cyclers report), otherwise signed
+        capacity_column (str): name for step capacity column, Ah
+        throughput_column (str): name for cumulative charge throughput column, Ah
+        energy_column (str): name for step energy column, Wh
+        soc_column (str): name for relative state of charge column
+
+    Returns:
+        pd.DataFrame with capacity, throughput, energy and SoC columns and the same index as data
+    """
+    current = data[current_column].to_numpy(dtype=float)
+    time = data[time_column].to_numpy(dtype=float)
+    dt = np.diff(time, prepend=time[:1]) if len(time) else time
+    dt = np.where(np.isfinite(dt) & (dt > 0), dt, 0.0)
+    if step_column is not None:
+        steps = pd.factorize(data[step_column])[0]
+        dt[1:][steps[1:] != steps[:-1]] = 0.0  # nothing is integrated over step boundary
+    else:
+        steps = np.zeros(len(data), dtype=np.int64)
+
+    mean_current = (current + np.concatenate([current[:1], current[:-1]])) / 2
+    charge = np.nan_to_num(mean_current * dt / 3600)
+    net = np.cumsum(charge)
+    result = pd.DataFrame(index=data.index)
+    step_capacity = _segment_cumsum(charge, steps)
+    result[capacity_column] = np.abs(step_capacity) if absolute else step_capacity
+    result[throughput_column] = np.cumsum(np.abs(charge))
+    if voltage_column is not None:
+        voltage = data[voltage_column].to_numpy(dtype=float)
+        power = (current * voltage + np.concatenate([current[:1] * voltage[:1], current[:-1] * voltage[:-1]])) / 2
+        step_energy = _segment_cumsum(np.nan_to_num(power * dt / 3600), steps)
+        result[energy_column] = np.abs(step_energy) if absolute else step_energy
+
+    if len(net):
+        match reference:
+            case 'max':
+                position = int(np.argmax(net))
+            case 'min':
+                position = int(np.argmin(net))
+            case 'first':
+                position = 0
+            case 'last':
+                position = len(net) - 1
+            case _:
+                position = data.index.get_loc(reference)
+        if reference_soc is None:
+            reference_soc = 1.0 if reference == 'max' else 0.0
+        if capacity is None:
+            capacity = net.max() - net.min()
+        result[soc_column] = reference_soc + (net - net[position]) / capacity if capacity else np.nan
+    else:
+        result[soc_column] = np.zeros(0)
+    return result
 
 
+@profiled
 def get_steps_data(data: pd.DataFrame, steps: list[int], specified_column='Step'):
     """
     Select steps by number (or other value) in specified column, checks if it
@@ -121,11 +482,12 @@ def get_steps_data(data: pd.DataFrame, steps: list[int], specified_column='Step'
         list[pd.Dataframe] - steps from data.
     """
     data_steps = [data[data[specified_column] == i].copy() for i in steps]
-    if not check_unity(pd.concat(data_steps)):
+    if not check_unity(np.concatenate([step.index.to_numpy() for step in data_steps])):
         print('get_steps_data: Warning! Merging values are not sequential!')
     return data_steps
 
 
+@profiled
 def merge_time(data_steps: list, merging_method = 'remove_first', column='Time'):
     """
     Make relative time from experiments cumulative by selected method
@@ -195,6 +557,7 @@ def overlap_merge(data_steps: list[pd.DataFrame], column='Time', merging_method=
     return data_steps
 
 
+@profiled
 def extract_sequences(data: pd.DataFrame,
                       sequences: list[list[int]],
                       time_merge: str | float,
@@ -222,38 +585,126 @@ def extract_sequences(data: pd.DataFrame,
     return sequences_data
 
 
+def inverted_index(dict_):
+    """
+    Build inverted index value:[keys] for dict key:values in one pass over all values.
+    Args:
+        dict_ (dict): key:iterable of values
+
+    Returns:
+        dict value:list of keys, which have this value
+    """
+    index = {}
+    for key, values in dict_.items():
+        for value in values:
+            keys = index.setdefault(value, [])
+            if key not in keys:
+                keys.append(key)
+    return index
+
+
 def check_dict_intersection(dict_):
+    """
+    Find values, that belong to several keys of dict.
+    Args:
+        dict_ (dict): key:iterable of values
+
+    Returns:
+        list of [key1, key2, intersection] for every pair of keys with common values
+    """
+    intersections = {}
+    for value, keys in inverted_index(dict_).items():
+        for pair in itertools.combinations(keys, 2):
+            intersections.setdefault(pair, set()).add(value)
     result = []
-    for key1, key2 in itertools.combinations(dict_, 2):
-        set1 = set(dict_[key1])
-        set2 = set(dict_[key2])
-        intersection = set1.intersection(set2)
-        if intersection:
-            print(f'{key1} and {key2} has intersection {intersection}!')
-            result.append([key1, key2, intersection])
-        return result
+    for (key1, key2), intersection in intersections.items():
+        print(f'{key1} and {key2} has intersection {intersection}!')
+        result.append([key1, key2, intersection])
+    return result
+
 
+class StepClassifier:
+    """
+    Classifies values (step names, statuses, step types) by dict class:[values].
+    Inverted index value:class is built once, overlapping values are found in the same pass
+    (with strict=True overlaps raise ValueError, otherwise value keeps its first class, see overlaps).
+    Class given by string instead of list matches elements contained in the string (as Find_key did).
+    Whole columns are mapped by unique values (factorize codes), so
+    relabelling costs one dict lookup per unique value, not per row.
+    Args:
+        classes (dict): class:list of values (or string for substring match)
+        strict (bool): raise error if some value belongs to several classes
+    """
 
-class Find_key:
-    def __init__(self, check_dict):
-        self.dictionary = check_dict
+    def __init__(self, classes: dict, strict=False):
+        self.dictionary = classes
+        self.substrings = {key:value for key, value in classes.items() if isinstance(value, str)}
+        self.overlaps = {}
+        self.index = {}
+        listed = {key:value for key, value in classes.items() if not isinstance(value, str)}
+        for value, keys in inverted_index(listed).items():
+            self.index[value] = keys[0]
+            if len(keys) > 1:
+                self.overlaps[value] = keys
+        if self.overlaps and strict:
+            raise ValueError(f'StepClassifier: values in several classes {self.overlaps}')
+
+    def classes(self, element) -> list:
+        """All classes of element: by listed values and by substring classes."""
+        found = list(self.overlaps.get(element, [self.index[element]] if element in self.index else []))
+        if self.substrings and isinstance(element, str):
+            found += [key for key, value in self.substrings.items() if element in value and key not in found]
+        return found
 
     def __call__(self, element):
-        result = [key for key, value in self.dictionary.items() if element in value]
-        if len(result) == 1:
-            return result[0]
-        return result
+        """
+        Class for one element. Returns list of classes if element belongs to
+        several classes and empty list if it is not found.
+        """
+        found = self.classes(element)
+        return found[0] if len(found) == 1 else found
+
+    def map(self, series: pd.Series, default=None, categorical=False):
+        """
+        Classify whole column.
+        Args:
+            series (pd.Series): values for classification
+            default (): class for values not found in classes
+            categorical (bool): return categorical series (compact for long data)
+
+        Returns:
+            pd.Series of classes with the same index
+        """
+        codes, uniques = pd.factorize(series)
+        classes = []
+        for value in uniques:
+            found = self.index.get(value) if not self.substrings else (self.classes(value) or [None])[0]
+            classes.append(default if found is None else found)
+        if categorical:
+            categories = pd.unique(pd.Series([i for i in classes if i is not None], dtype=object))
+            category_codes = pd.Index(categories).get_indexer(pd.Series(classes, dtype=object))
+            result_codes = np.where(codes >= 0, category_codes[codes], -1) if len(category_codes) else codes
+            result = pd.Categorical.from_codes(result_codes, categories=categories)
+        else:
+            lookup = np.array(classes + [default], dtype=object)
+            result = lookup[codes]
+        return pd.Series(result, index=series.index, name=series.name)
+
+
+Find_key = StepClassifier
 
 
+@profiled
 def step_id_creator(pouch, column='Step'):
     step_column = pouch[column]
-    step_unique = step_column.unique()
-    step_unique.sort()
+    codes, step_unique = pd.factorize(step_column, sort=True)
     length = len(step_unique)
     step_id = [1]
     if re.findall(r'2.*4\.1', step_unique[1]):
         step_id.append(2)
     step_id.extend(range(2, length - len(step_id) + 2))
-    step_id_dict = {name:code for name, code in zip(step_unique, step_id)}
-    step_id_ser = step_column.apply(lambda x:step_id_dict[x])
+    step_id = np.asarray(step_id)[codes]
+    if (codes < 0).any():  # missing step names have no id
+        step_id = np.where(codes >= 0, step_id, np.nan)
+    step_id_ser = pd.Series(step_id, index=step_column.index, name=step_column.name)
     return step_id_ser
@@ -0,0 +1,189 @@
+"""
+Parallel processing of one experiment in worker processes without copying it to every worker.
+Columns of experiment are published once in shared memory (SharedFrame), workers
+attach to them and build results from NumPy views.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .exporting import save_experiment
+from .modifications import check_unity, merge_time
+
+_attached = {}
+
+
+class SharedFrame:
+    """
+    Publishes columns of dataframe in shared memory, one block per column.
+    Text (object, str, categorical) columns are shared as integer codes with small list of categories
+    and restored in their dtype, datetime columns as int64 in their unit. spec is small picklable description for workers.
+    Use as context manager, shared memory is released on exit (or by close()).
+    Args:
+        data (pd.DataFrame): dataframe to publish
+        columns (list[str]): published columns, default all
+        extra (dict): additional name:np.ndarray arrays to publish (for example, sort order)
+    """
+
+    def __init__(self, data: pd.DataFrame, columns: list = None, extra: dict = None):
+        columns = list(data.columns) if columns is None else list(columns)
+        self._blocks = []
+        self.spec = {'columns':[], 'arrays':{}, 'index':None}
+        for column in columns:
+            self.spec['columns'].append(self._publish(column, data[column]))
+        self.spec['index'] = self._publish('__index__', pd.Series(data.index.to_numpy()))
+        for name, array in (extra or {}).items():
+            self.spec['arrays'][name] = self._publish(name, pd.Series(array))
+
+    def _publish(self, name, series: pd.Series):
+        kind, categories, dtype = 'values', None, None
+        if pd.api.types.is_datetime64_any_dtype(series):
+            kind = {'unit':series.dt.unit, 'tz':None if series.dt.tz is None else str(series.dt.tz)}
+            array = series.array.asi8
+        elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            array = series.to_numpy()
+        else:
+            kind = 'categorical'
+            codes, categories = pd.factorize(series)
+            array, categories, dtype = codes, list(categories), series.dtype
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        self._blocks.append(block)
+        return {'name':name, 'block':block.name, 'dtype':array.dtype.str, 'length':len(array),
+                'kind':kind, 'categories':categories, 'text_dtype':dtype}
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def attach(spec: dict):
+    """
+    Attach to shared frame in worker process. Attachments are reused between tasks and kept
+    open until worker exits: views returned by previous tasks may still be referenced, and
+    closing their blocks would invalidate them. Pools of this module live for one call,
+    so worker holds only blocks of frames published during this call (parent unlinks them on exit).
+    Args:
+        spec (dict): SharedFrame.spec
+
+    Returns:
+        (columns, index, arrays) - dict of column views, index view and dict of extra arrays
+    """
+    key = spec['index']['block']
+    if key not in _attached:
+        views = {}
+        blocks = []
+        for item in spec['columns'] + [spec['index']] + list(spec['arrays'].values()):
+            block = shared_memory.SharedMemory(name=item['block'])
+            blocks.append(block)
+            views[item['name']] = np.ndarray((item['length'],), dtype=np.dtype(item['dtype']), buffer=block.buf)
+        _attached[key] = (views, blocks)
+    return _attached[key][0]
+
+
+def build_frame(spec: dict, views: dict, positions) -> pd.DataFrame:
+    """
+    Build dataframe of rows at positions (slice or array) from attached views,
+    restoring text and datetime columns.
+    """
+    columns = {}
+    for item in spec['columns']:
+        values = views[item['name']][positions]
+        match item['kind']:
+            case 'values':
+                columns[item['name']] = values
+            case 'categorical':
+                categories = np.asarray(item['categories'] + [None], dtype=object)
+                columns[item['name']] = pd.array(categories[values], dtype=item['text_dtype'])
+            case {'unit':unit, 'tz':tz}:
+                values = pd.DatetimeIndex(values.view(f'datetime64[{unit}]'))
+                columns[item['name']] = values if tz is None else values.tz_localize('UTC').tz_convert(tz)
+    return pd.DataFrame(columns, index=views['__index__'][positions])
+
+
+def step_ranges(steps: np.ndarray):
+    """
+    Stable sort order of steps and row ranges in this order for every step value.
+    Returns:
+        (order, dict step:(start, stop))
+    """
+    order = np.argsort(steps, kind='stable')
+    sorted_steps = steps[order]
+    values, starts = np.unique(sorted_steps, return_index=True)
+    stops = np.append(starts[1:], len(sorted_steps))
+    return order, {value:(start, stop) for value, start, stop in zip(values.tolist(), starts, stops)}
+
+
+def _positions(order, start, stop):
+    positions = order[start:stop]
+    if len(positions) and positions[-1] - positions[0] == len(positions) - 1:
+        return slice(positions[0], positions[-1] + 1)  # contiguous step - zero-copy view
+    return positions
+
+
+def _sequence_task(spec, number, sequence, ranges, time_merge, time_column, save_path, kwargs):
+    views = attach(spec)
+    order = views['__order__']
+    steps = [build_frame(spec, views, _positions(order, start, stop)) for start, stop in ranges]
+    index = np.concatenate([step.index.to_numpy() for step in steps]) if steps else np.array([])
+    if not check_unity(index):
+        print(f'extract_sequences_parallel: Warning! Steps {list(sequence)} of sequence {number} '
+              f'are not consecutive rows of data!')
+    sequence = pd.concat(merge_time(steps, time_merge, column=time_column))
+    if save_path is None:
+        return sequence
+    save_experiment(sequence, save_path, **kwargs)
+    return None
+
+
+def extract_sequences_parallel(data: pd.DataFrame,
+                               sequences: list[list[int]],
+                               time_merge: str | float,
+                               sequence_column='Step',
+                               time_column='Time',
+                               workers: int = None,
+                               dir_path: str = None,
+                               columns: list = None,
+                               **kwargs):
+    """
+    Parallel version of extract_sequences: experiment columns are published in shared memory
+    once, worker processes get only step ranges and merge method, build sequences from
+    views, merge time and (if dir_path is given) save them as i.csv like save_sequences.
+    Args:
+        data (pd.DataFrame): initial dataframe
+        sequences (list[list]): steps of every sequence
+        time_merge (str|float): method for time merge, see merge_time
+        sequence_column (str): name for sequence selection column
+        time_column (str): name for time column
+        workers (int): number of processes, default os.cpu_count()
+        dir_path (str): directory to save sequences in workers, None - sequences are returned
+        columns (list[str]): columns to publish, default all
+        **kwargs (): arguments for df.to_csv when saving
+
+    Returns:
+        list of sequences (as extract_sequences) or None if saved to dir_path
+    """
+    order, ranges = step_ranges(data[sequence_column].to_numpy())
+    empty = (0, 0)
+    with SharedFrame(data, columns=columns, extra={'__order__':order}) as shared, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for i, sequence in enumerate(sequences):
+            save_path = None if dir_path is None else os.path.join(dir_path, f'{i}.csv')
+            task_ranges = [ranges.get(step, empty) for step in sequence]
+            futures.append(executor.submit(_sequence_task, shared.spec, i, sequence, task_ranges, time_merge,
+                                           time_column, save_path, kwargs))
+        results = [future.result() for future in futures]
+    return None if dir_path is not None else results
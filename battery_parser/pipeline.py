@@ -0,0 +1,150 @@
+"""
+Pipelined processing of file batches: reader threads load next files while the current one is processed,
+so total time approaches max(reading, processing) instead of their sum.
+
+    for path, data in Prefetcher(files, bp.importing.import_xls, prefetch=2, memory_limit=4 * 1024 ** 3):
+        bp.rename_columns(data)
+        ...
+
+Reading libraries (openpyxl, zipfile, numpy, pyarrow) spend most of the time in I/O or release GIL,
+so threads are enough for overlapping.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import frame_memory
+
+
+class Prefetcher:
+    """
+    Iterates over (item, loaded value) in order of items, loading next items in reader threads.
+    Back-pressure: no more than prefetch items are read ahead, and new reads are not started while
+    current item and read-ahead items exceed memory_limit (size of items being read is estimated
+    by average size of loaded ones). At least one item is always read ahead, so single big file
+    does not stop the pipeline.
+    Args:
+        items (iterable): items to load (file paths, experiments, records)
+        loader (callable): function item -> value, called in reader threads
+        prefetch (int): max number of items read ahead
+        workers (int): number of reader threads, default prefetch
+        memory_limit (int): RAM budget in bytes for loaded values, None - only prefetch limit
+        size (callable): size of loaded value in bytes, default frame_memory
+        errors (str): 'raise' - loader exceptions are raised in consumer,
+                      'yield' - exception is yielded instead of value
+    """
+
+    def __init__(self, items, loader, prefetch: int = 2, workers: int = None, memory_limit: int = None,
+                 size=frame_memory, errors='raise'):
+        if errors not in ('raise', 'yield'):
+            raise ValueError(f'Unknown errors mode {errors}')
+        self.items = items
+        self.loader = loader
+        self.prefetch = max(1, prefetch)
+        self.workers = workers or self.prefetch
+        self.memory_limit = memory_limit
+        self.size = size
+        self.errors = errors
+        self.read_time = 0.0
+        self.wait_time = 0.0
+        self._sizes = {}
+        self._loaded = []
+        self._lock = threading.Lock()
+
+    def _load(self, item):
+        start = time.perf_counter()
+        value = self.loader(item)
+        size = self.size(value)
+        with self._lock:
+            self.read_time += time.perf_counter() - start
+            self._loaded.append(size)
+        return value, size
+
+    def _buffered(self, pending, current_size):
+        average = sum(self._loaded) / len(self._loaded) if self._loaded else 0
+        total = current_size
+        for _, future in pending:
+            total += future.result()[1] if future.done() and future.exception() is None else average
+        return total
+
+    def __iter__(self):
+        items = iter(self.items)
+        pending = deque()
+        exhausted = False
+        current_size = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            def fill():
+                nonlocal exhausted
+                while not exhausted and len(pending) < self.prefetch:
+                    if pending and self.memory_limit is not None \
+                            and self._buffered(pending, current_size) >= self.memory_limit:
+                        break
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.append((item, executor.submit(self._load, item)))
+
+            fill()
+            while pending:
+                item, future = pending.popleft()
+                start = time.perf_counter()
+                try:
+                    value, current_size = future.result()
+                except Exception as error:
+                    if self.errors == 'raise':
+                        for _, other in pending:
+                            other.cancel()
+                        raise
+                    value, current_size = error, 0
+                self.wait_time += time.perf_counter() - start
+                fill()  # start next reads before processing of current item
+                yield item, value
+                value = None
+                current_size = 0
+                fill()
+
+    def __repr__(self):
+        return (f"<Prefetcher(prefetch={self.prefetch}, workers={self.workers}, "
+                f"read={self.read_time:.4}s, waited={self.wait_time:.4}s)>")
+
+
+def run_pipeline(items, loader, process, prefetch: int = 2, workers: int = None, memory_limit: int = None,
+                 key=str) -> list[dict]:
+    """
+    Load items with Prefetcher and process them one by one in current thread.
+    Errors of loading and processing are recorded, the batch continues.
+    Args:
+        items (iterable): items to process (for example file paths)
+        loader (callable): item -> data, runs in reader threads
+        process (callable): (item, data) -> result, runs in current thread
+        prefetch (int): max number of items read ahead
+        workers (int): number of reader threads
+        memory_limit (int): RAM budget in bytes for loaded data
+        key (callable): item -> label for report
+
+    Returns:
+        list of records with item label, status, result or error, wait and process time in seconds
+    """
+    prefetcher = Prefetcher(items, loader, prefetch=prefetch, workers=workers, memory_limit=memory_limit,
+                            errors='yield')
+    report = []
+    wait_time = 0.0
+    for item, data in prefetcher:
+        record = {'item':key(item), 'wait_s':prefetcher.wait_time - wait_time}
+        wait_time = prefetcher.wait_time
+        if isinstance(data, Exception):
+            record.update(status='failed', error=repr(data))
+        else:
+            start = time.perf_counter()
+            try:
+                record.update(status='done', result=process(item, data))
+            except Exception as error:
+                record.update(status='failed', error=repr(error))
+            record['process_s'] = time.perf_counter() - start
+        del data
+        report.append(record)
+        print(f"{record['status']}: {record['item']}")
+    return report
@@ -0,0 +1,224 @@
+"""
+Opt-in instrumentation of processing stages.
+Public functions of importing, modifications, statistics and exporting are decorated
+with profiled, which does nothing until some Profiler is active:
+
+    with Profiler(cprofile_dir='profiles') as profiler:
+        for path in files:
+            with profiler.file(path):
+                data = bp.import_xls(path)
+                bp.rename_columns(data)
+                bp.parse_time(data, time_column='Time')
+                statistics = bp.generate_statistics(data)
+    profiler.profile_table()
+
+Every call records wall time, rows processed, bytes read/written and increase of peak RSS.
+"""
+import cProfile
+import functools
+import inspect
+import os
+import re
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+_active_profilers = []
+_state = threading.local()
+
+
+def peak_rss():
+    """
+    Peak resident set size of current process in bytes, None if it can not be measured.
+    Uses psutil if installed (peak working set on Windows), otherwise resource.getrusage.
+    """
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        if hasattr(info, 'peak_wset'):
+            return info.peak_wset
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+def count_rows(value):
+    """Number of rows in dataframe/series or total rows in list of them, None for other objects."""
+    if hasattr(value, 'shape') and hasattr(value, 'index'):
+        return value.shape[0]
+    if isinstance(value, (list, tuple)) and value and all(hasattr(i, 'index') and hasattr(i, 'shape')
+                                                          for i in value):
+        return sum(i.shape[0] for i in value)
+    return None
+
+
+def path_size(path):
+    if isinstance(path, (str, os.PathLike)) and os.path.isfile(path):
+        return os.path.getsize(path)
+    return None
+
+
+class Profiler:
+    """
+    Collects records of profiled calls while active (used as context manager).
+    Args:
+        cprofile_dir (str): if given, every top-level profiled call is run under cProfile and
+                            stats are dumped to this directory as '<file>_<stage>_<n>.prof'
+    """
+
+    def __init__(self, cprofile_dir: str = None):
+        self.cprofile_dir = cprofile_dir
+        self.records = []
+        self._lock = threading.Lock()
+        if cprofile_dir is not None and not os.path.exists(cprofile_dir):
+            os.makedirs(cprofile_dir)
+
+    def __enter__(self):
+        _active_profilers.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _active_profilers.remove(self)
+
+    def file(self, label):
+        """Context manager, that marks all calls inside it (in current thread) with file label."""
+        return _FileLabel(label)
+
+    def record(self, **record):
+        with self._lock:
+            self.records.append(record)
+
+    def to_frame(self):
+        """All records as dataframe, one row per call."""
+        import pandas as pd
+        columns = ['file', 'stage', 'depth', 'wall_time_s', 'rows', 'bytes_read', 'bytes_written',
+                   'peak_rss_delta', 'error']
+        return pd.DataFrame(self.records, columns=columns)
+
+    def profile_table(self, depth: int = None):
+        """
+        Per-file profile table: total wall time, rows, bytes and max peak RSS increase
+        for every file and stage.
+        Args:
+            depth (int): use only calls with this nesting depth (0 - top-level calls), None - all calls
+
+        Returns:
+            pd.DataFrame indexed by (file, stage)
+        """
+        frame = self.to_frame()
+        if depth is not None:
+            frame = frame[frame['depth'] == depth]
+        frame = frame.fillna({'file':''})
+        grouped = frame.groupby(['file', 'stage'], sort=False)
+        table = grouped.agg(calls=('wall_time_s', 'size'),
+                            wall_time_s=('wall_time_s', 'sum'),
+                            rows=('rows', 'sum'),
+                            bytes_read=('bytes_read', 'sum'),
+                            bytes_written=('bytes_written', 'sum'),
+                            peak_rss_delta=('peak_rss_delta', 'max'))
+        table['rows_per_s'] = table['rows'] / table['wall_time_s']
+        return table
+
+    def save(self, filepath: str, **kwargs):
+        """Saves profile table to csv."""
+        from .exporting import save_experiment
+        save_experiment(self.profile_table(), filepath, index_label=['file', 'stage'], **kwargs)
+
+    def _cprofile_path(self, stage):
+        label = re.sub(r'[^\w.-]+', '_', os.path.basename(str(current_file() or 'all')))
+        with self._lock:
+            number = len(self.records)
+        return os.path.join(self.cprofile_dir, f'{label}_{stage}_{number}.prof')
+
+
+class _FileLabel:
+    def __init__(self, label):
+        self.label = label
+
+    def __enter__(self):
+        self._previous = current_file()
+        _state.file = self.label
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _state.file = self._previous
+
+
+def current_file():
+    return getattr(_state, 'file', None)
+
+
+def profiled(func=None, *, stage: str = None, reads: str = None, writes: str = None):
+    """
+    Decorator for processing functions. Without active Profiler it just calls function.
+    Args:
+        func (): decorated function
+        stage (str): stage name, default function name
+        reads (str): name of argument with path of read file (for bytes_read)
+        writes (str): name of argument with path of written file (for bytes_written)
+
+    Returns:
+        decorated function
+    """
+    if func is None:
+        return functools.partial(profiled, stage=stage, reads=reads, writes=writes)
+    stage = stage or func.__name__
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _active_profilers:
+            return func(*args, **kwargs)
+        arguments = signature.bind_partial(*args, **kwargs).arguments if (reads or writes) else {}
+        depth = getattr(_state, 'depth', 0)
+        rows = next((count_rows(i) for i in (*args, *kwargs.values()) if count_rows(i) is not None), None)
+        profilers = list(_active_profilers)
+        cprofile_dirs = [p for p in profilers if p.cprofile_dir] if depth == 0 else []
+        rss_start = peak_rss()
+        _state.depth = depth + 1
+        error = None
+        profile = cProfile.Profile() if cprofile_dirs else None
+        start = time.perf_counter()
+        try:
+            if profile is not None:
+                result = profile.runcall(func, *args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+        except Exception as exception:
+            error = repr(exception)
+            result = None
+            raise
+        finally:
+            wall_time = time.perf_counter() - start
+            _state.depth = depth
+            rss_end = peak_rss()
+            if rows is None:
+                rows = count_rows(result)
+            record = {'file':current_file(),
+                      'stage':stage,
+                      'depth':depth,
+                      'wall_time_s':wall_time,
+                      'rows':rows,
+                      'bytes_read':path_size(arguments.get(reads)) if reads else None,
+                      'bytes_written':path_size(arguments.get(writes)) if writes else None,
+                      'peak_rss_delta':None if rss_start is None else rss_end - rss_start,
+                      'error':error}
+            for profiler in profilers:
+                if profile is not None and profiler in cprofile_dirs:
+                    profile.dump_stats(profiler._cprofile_path(stage))
+                profiler.record(**record)
+        return result
+
+    return wrapper
@@ -1,15 +1,27 @@
 """
 This module will provide functions for splitting, parsing battery CC/CV cycles for  modelling
 """
+import hashlib
+
+import numpy as np
 import pandas as pd
 
+from .cache import FrameCache, DiskStore
+from .profiling import profiled
+
+DEFAULT_STATISTICS_PATTERN = {'I':['mean', 'std'],
+                              'Time':['range', 'diff'],
+                              'E':'mean',
+                              'T':['min', 'max']}
+
 
+@profiled
 def generate_statistics(data: pd.DataFrame,
                         group_marker="Step",
-                        statistics_pattern={'I':['mean', 'std'],
-                                            'Time':['range', 'diff'],
-                                            'E':'mean',
-                                            'T':['min', 'max']}):
+                        statistics_pattern=DEFAULT_STATISTICS_PATTERN,
+                        cache=None,
+                        workers: int = None,
+                        executor='thread'):
     """
     Group dataframe by 'group_marker' and summarize explicit columns with given methods.
     'statistic_pattern' configure statistic results.
@@ -24,16 +36,238 @@ def generate_statistics(data: pd.DataFrame,
                                     and value is method you want to use for summarization
                                     ('mean', 'std', 'max', 'min', 'diff', 'count',
                                             'unique_values', 'range')
+        cache (StatisticsCache|True): memoize results by data fingerprint, every column-method
+                                    pair is stored separately, so only new pairs of pattern are computed.
+                                    True - use default in-process cache. None - no memoization.
+        workers (int): split data to contiguous partitions at group marker boundaries and compute
+                        them in parallel (see parallel_statistics), None or 1 - in current thread
+        executor (str): 'thread' or 'process' (columns are shared with processes via shared memory)
 
     Returns: pd.Dataframe, with total statistics via marker.
 
     """
+    if cache is True:
+        cache = default_statistics_cache()
+    if cache is None:
+        frame_dict = compute_statistics(data, group_marker, statistics_pattern, workers, executor)
+    else:
+        frame_dict = cache.statistics(data, group_marker, statistics_pattern, workers, executor)
+    df = pd.DataFrame(frame_dict)
+    return df
+
+
+def compute_statistics(data: pd.DataFrame, group_marker, statistics_pattern: dict,
+                       workers: int = None, executor='thread') -> dict:
+    """Dict 'column_method':pd.Series for pattern, in parallel if workers > 1."""
+    if workers is not None and workers > 1 and len(data):
+        return parallel_statistics(data, group_marker, statistics_pattern, workers, executor)
     grouped_data = data.groupby(group_marker)
     frame_dict = {}
     for column, methods in statistics_pattern.items():
         frame_dict.update(column_statistics(grouped_data, column, methods))
-    df = pd.DataFrame(frame_dict)
-    return df
+    return frame_dict
+
+
+def partition_bounds(markers, n_partitions: int) -> np.ndarray:
+    """
+    Bounds of about n_partitions contiguous partitions of equal size, moved to nearest
+    positions where group marker changes, so groups are not cut.
+    Args:
+        markers (pd.Series|pd.DataFrame): group marker column(s)
+        n_partitions (int): desired number of partitions
+
+    Returns:
+        np.ndarray of unique bounds (first is 0, last is len(markers))
+    """
+    n = len(markers)
+    values = markers.to_numpy()
+    changes = values[1:] != values[:-1]
+    if changes.ndim > 1:
+        changes = changes.any(axis=1)
+    boundaries = np.concatenate([[0], np.flatnonzero(changes) + 1, [n]])
+    targets = np.linspace(0, n, n_partitions + 1)[1:-1]
+    nearest = np.clip(np.searchsorted(boundaries, targets), 1, len(boundaries) - 1)
+    left, right = boundaries[nearest - 1], boundaries[nearest]
+    chosen = np.where(targets - left <= right - targets, left, right)
+    return np.unique(np.concatenate([[0], chosen, [n]]))
+
+
+def _shared_partition_statistics(spec: dict, start: int, stop: int, group_marker, statistics_pattern: dict) -> dict:
+    from .parallel import attach, build_frame
+    return compute_statistics(build_frame(spec, attach(spec), slice(start, stop)), group_marker, statistics_pattern)
+
+
+@profiled
+def parallel_statistics(data: pd.DataFrame,
+                        group_marker="Step",
+                        statistics_pattern: dict = None,
+                        workers: int = None,
+                        executor='thread',
+                        partitions_per_worker: int = 4) -> dict:
+    """
+    Statistics of one experiment computed in parallel. Data is split into contiguous partitions
+    at group marker boundaries, every partition is grouped and summarized in pool, results are
+    concatenated. Groups whose marker value appears in several partitions (repeated steps)
+    are recomputed on all their rows, so results are the same as without partitioning.
+    Threads are enough for pandas groupby reductions (NumPy/Cython code releases GIL),
+    'process' executor is for python-heavy methods ('diff', 'unique_values').
+    Args:
+        data (pd.DataFrame): experiment
+        group_marker (str or list[str]): group column(s)
+        statistics_pattern (dict): column:method(s), see generate_statistics, None - DEFAULT_STATISTICS_PATTERN
+        workers (int): pool size, default os.cpu_count()
+        executor (str): 'thread' or 'process'
+        partitions_per_worker (int): more partitions than workers balance unequal groups
+
+    Returns:
+        (dict) 'column_method':pd.Series
+    """
+    import os
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+    statistics_pattern = DEFAULT_STATISTICS_PATTERN if statistics_pattern is None else statistics_pattern
+    workers = workers or os.cpu_count()
+    markers = [group_marker] if isinstance(group_marker, str) else list(group_marker)
+    columns = list(dict.fromkeys(markers + list(statistics_pattern)))
+    bounds = partition_bounds(data[group_marker], workers * partitions_per_worker)
+    ranges = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+    match executor:
+        case 'thread':
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(compute_statistics, data.iloc[start:stop][columns], group_marker,
+                                       statistics_pattern) for start, stop in ranges]
+                parts = [future.result() for future in futures]
+        case 'process':
+            from .parallel import SharedFrame
+            with SharedFrame(data, columns=columns) as shared, ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_shared_partition_statistics, shared.spec, start, stop,
+                                       group_marker, statistics_pattern) for start, stop in ranges]
+                parts = [future.result() for future in futures]
+        case _:
+            raise ValueError(f'Unknown executor {executor}')
+
+    frame_dict = {name:pd.concat([part[name] for part in parts]) for name in parts[0]}
+    index = next(iter(frame_dict.values())).index if frame_dict else pd.Index([])
+    repeated = index[index.duplicated()].unique()
+    if len(repeated):  # groups cut by partitions
+        keys = data[group_marker]
+        rows = keys.isin(repeated) if isinstance(group_marker, str) else \
+            pd.MultiIndex.from_frame(keys).isin(repeated)
+        fixed = compute_statistics(data.loc[rows, columns], group_marker, statistics_pattern)
+        for name, series in frame_dict.items():
+            frame_dict[name] = pd.concat([series[~series.index.isin(repeated)], fixed[name]])
+    return {name:series.sort_index() for name, series in frame_dict.items()}
+
+
+def fingerprint(data: pd.DataFrame, sample: int = 1024) -> str:
+    """
+    Cheap content fingerprint of dataframe: shape, column names, dtypes and hash of
+    sample rows (evenly spaced, including first and last) of all columns and index.
+    Changes only in rows out of sample are not detected, use sample=None to hash all rows.
+    Args:
+        data (pd.DataFrame): dataframe
+        sample (int): number of hashed rows, None - all rows
+
+    Returns:
+        (str) hex digest
+    """
+    hash_func = hashlib.sha1()
+    hash_func.update(repr((data.shape, list(data.columns), [str(i) for i in data.dtypes])).encode())
+    if len(data):
+        if sample is None or sample >= len(data):
+            rows = data
+        else:
+            rows = data.iloc[np.unique(np.linspace(0, len(data) - 1, sample).astype(np.int64))]
+        hash_func.update(pd.util.hash_pandas_object(rows, index=True).to_numpy().tobytes())
+    return hash_func.hexdigest()
+
+
+def canonical_pattern(statistics_pattern: dict) -> list[tuple]:
+    """Statistics pattern as ordered list of (column, method) pairs."""
+    pairs = []
+    for column, methods in statistics_pattern.items():
+        for method in ([methods] if isinstance(methods, str) else methods):
+            pairs.append((column, method))
+    return pairs
+
+
+class StatisticsCache:
+    """
+    Memoization of generate_statistics. Results are stored per (data fingerprint, group marker,
+    column, method), so adding method to pattern computes only this column.
+    Values are kept in in-process LRU (FrameCache) and optionally in on-disk store
+    with size limit (DiskStore), shared between sessions.
+    Data is identified by fingerprint of sample rows: data edited in place only in rows out
+    of sample gets stale results, use sample=None (hash of all rows) for data modified in place.
+    Args:
+        memory_limit (int): RAM budget of in-process LRU in bytes
+        directory (str): on-disk store directory, None - only in-process cache
+        disk_limit (int): on-disk store size limit in bytes, None - no limit
+        sample (int): rows hashed by fingerprint, None - all rows
+    """
+
+    def __init__(self, memory_limit: int = 512 * 1024 ** 2, directory: str = None, disk_limit: int = None,
+                 sample: int | None = 1024):
+        self.memory = FrameCache(memory_limit=memory_limit)
+        self.disk = DiskStore(directory, disk_limit) if directory is not None else None
+        self.sample = sample
+        self.hits = 0
+        self.misses = 0
+
+    def statistics(self, data: pd.DataFrame, group_marker, statistics_pattern: dict,
+                   workers: int = None, executor='thread') -> dict:
+        """
+        Dict 'column_method':pd.Series for pattern, missing pairs are computed
+        (in parallel if workers > 1) and stored.
+        """
+        data_key = (fingerprint(data, self.sample), repr(group_marker))
+        frame_dict = {}
+        missing = {}
+        for column, method in canonical_pattern(statistics_pattern):
+            value = self.get(data_key + (column, method))
+            if value is None:
+                self.misses += 1
+                missing.setdefault(column, []).append(method)
+            else:
+                self.hits += 1
+            frame_dict['_'.join([column, method])] = value
+        if missing:
+            computed = compute_statistics(data, group_marker, missing, workers, executor)
+            for column, methods in missing.items():
+                for method in methods:
+                    name = '_'.join([column, method])
+                    self.put(data_key + (column, method), computed[name])
+                    frame_dict[name] = computed[name]
+        return frame_dict
+
+    def get(self, key):
+        if key in self.memory:
+            return self.memory.get(key)
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+                return value
+        return None
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def __repr__(self):
+        return f"<StatisticsCache(hits={self.hits}, misses={self.misses}, memory={self.memory})>"
+
+
+_default_cache = None
+
+
+def default_statistics_cache() -> StatisticsCache:
+    """In-process StatisticsCache used by generate_statistics(cache=True)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = StatisticsCache()
+    return _default_cache
 
 
 def column_statistics(grouped_data: pd.DataFrame.groupby, column: str, methods: str | list):
@@ -161,13 +395,147 @@ class Check_pattern:  # Update
             return element < 0
 
 
-def find_pattern(statistics: pd.Series, pattern: str):
-    pattern_checker = Check_pattern(pattern)
+class StepPattern:
+    """
+    Compiled multi-column step pattern. Pattern is a list of conditions for consecutive steps
+    (rows of statistics), every element is dict in form {'column_name':(operation, value)}
+    for one condition per column or {'column_name':[(operation1, value1), (operation2, value2)]}
+    for multiple conditions for the column, for example CC charge to >4.1 V, rest,
+    CC discharge with I<-1 A:
+        [{'Status_unique_values':('contain', 'CC_Chg'), 'E_last':('more', 4.1)},
+         {'Status_unique_values':('contain', 'Rest')},
+         {'Status_unique_values':('contain', 'CC_DChg'), 'I_mean':('less', -1)}]
+    Operations: 'less' ('<'), 'more' ('>'), 'less_equal' ('<='), 'more_equal' ('>='),
+    'equal' ('=='), 'not_equal' ('!='), 'contain' (substring), 'approx' (within approx_tolerance),
+    'between' (value is (low, high), borders included), 'sign' (value is '+', '-' or '0').
+    Every distinct condition is evaluated once as boolean mask over whole table, masks of window
+    positions are combined with shifted AND, so search is O(n*k) vectorized operations.
+    Args:
+        pattern (list[dict]): conditions for every window position
+        approx_tolerance (float): relative tolerance for 'approx' operation
+    """
+
+    def __init__(self, pattern: list[dict], approx_tolerance: float = 0.01):
+        self.approx_tolerance = approx_tolerance
+        self.pattern = [self.transform_pattern(step) for step in pattern]
+
+    @classmethod
+    def from_signs(cls, pattern: str, column):
+        """Pattern from string of '+', '-' or '0' for positive, negative and zero values of column."""
+        return cls([{column:('sign', sign)} for sign in pattern])
+
+    def __len__(self):
+        return len(self.pattern)
+
+    @staticmethod
+    def transform_pattern(step: dict):
+        step_transform = []
+        for column, conditions in step.items():
+            if isinstance(conditions, list):
+                step_transform.extend((column, *condition) for condition in conditions)
+            else:
+                step_transform.append((column, *conditions))
+        return step_transform
+
+    def masks(self, statistics: pd.DataFrame):
+        """
+        Boolean masks of every window position over all rows of statistics.
+        Args:
+            statistics (pd.DataFrame): table with columns used in pattern
+
+        Returns:
+            np.ndarray of shape (len(pattern), len(statistics))
+        """
+        computed = {}
+        masks = np.ones((len(self.pattern), len(statistics)), dtype=bool)
+        for position, conditions in enumerate(self.pattern):
+            for column, operation, value in conditions:
+                key = (column, operation, repr(value))
+                if key not in computed:
+                    computed[key] = self.check_condition(statistics[column], operation, value)
+                masks[position] &= computed[key]
+        return masks
+
+    def match(self, statistics: pd.DataFrame):
+        """
+        Positions (row numbers) of first rows of all windows which match pattern.
+        Windows may overlap.
+        """
+        n, k = len(statistics), len(self.pattern)
+        if k == 0 or n < k:
+            return np.array([], dtype=np.int64)
+        masks = self.masks(statistics)
+        hits = masks[0, :n - k + 1].copy()
+        for position in range(1, k):
+            hits &= masks[position, position:n - k + 1 + position]
+        return np.flatnonzero(hits)
+
+    def check_condition(self, series: pd.Series, operation: str, value):
+        match operation:
+            case 'less' | '<':
+                result = series < value
+            case 'more' | '>':
+                result = series > value
+            case 'less_equal' | '<=':
+                result = series <= value
+            case 'more_equal' | '>=':
+                result = series >= value
+            case 'equal' | '==':
+                result = series == value
+            case 'not_equal' | '!=':
+                result = series != value
+            case 'contain':
+                result = series.astype(str).str.contains(value, regex=False)
+            case 'approx':
+                borders = sorted([value * (1 - self.approx_tolerance), value * (1 + self.approx_tolerance)])
+                result = series.between(*borders)
+            case 'between':
+                result = series.between(*value)
+            case 'sign':
+                result = {'+':series > 0, '-':series < 0, '0':series == 0}[value]
+            case _:
+                raise ValueError(f'Unknown pattern operation {operation}')
+        return np.asarray(result.fillna(False) if result.dtype == object else result, dtype=bool)
+
+
+@profiled
+def find_pattern(statistics: pd.Series | pd.DataFrame, pattern: str | list[dict]):
+    """
+    Finds all windows of consecutive steps, which correspond to pattern.
+    Args:
+        statistics (pd.Series|pd.DataFrame): Series for string pattern, DataFrame for list pattern
+        pattern (str|list[dict]): string of '+', '-' or '0' for positive, negative and zero values
+                                or list of conditions for StepPattern
+
+    Returns:
+        list of windows, every window is list of index values of statistics
+    """
+    if isinstance(pattern, str):
+        statistics = statistics.to_frame() if isinstance(statistics, pd.Series) else statistics
+        pattern_checker = StepPattern.from_signs(pattern, statistics.columns[0])  # unnamed Series - column 0
+    else:
+        pattern_checker = StepPattern(pattern)
     window_size = len(pattern_checker)
-    roll = statistics.rolling(window_size).apply(pattern_checker)
-    windows = []
-    for i in roll.index[roll == 1]:
-        end_index = i + 1
-        start_index = end_index - window_size
-        windows.append(list(range(start_index, end_index)))
-    return windows
+    index = statistics.index
+    return [index[start:start + window_size].tolist() for start in pattern_checker.match(statistics)]
+
+
+@profiled
+def find_segments(statistics: pd.DataFrame, column: str, pattern: list):
+    """
+    Finds all windows in statistics where values of column are exactly equal to pattern.
+    Args:
+        statistics (pd.DataFrame): statistics (or any) dataframe
+        column (str): column for comparison
+        pattern (list): sequence of values to find
+
+    Returns:
+        list of dataframe slices for every found window
+    """
+    arr = statistics[column].to_numpy()
+    pattern = np.asarray(pattern)
+    if arr.size < len(pattern):
+        return []
+    windows = np.lib.stride_tricks.sliding_window_view(arr, len(pattern))
+    match_indices = np.flatnonzero(np.all(windows == pattern, axis=1))
+    return [statistics.iloc[i:i + len(pattern)] for i in match_indices]
@@ -0,0 +1,202 @@
+"""
+Step-indexed storage of raw experiments in parquet (requires pyarrow).
+Row groups of the file are aligned to steps (small consecutive steps are packed into one group),
+the footer keeps index step -> (row group, offset, length), so reading several steps from
+month-long experiment reads only their row groups:
+
+    save_step_store(data, 'experiment.parquet')
+    cycle = read_steps('experiment.parquet', steps=[412, 413, 414], columns=['Time', 'E', 'I'])
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from .modifications import check_unity, merge_time
+from .profiling import profiled
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+INDEX_KEY = b'battery_parser.step_index'
+
+
+def _require_pyarrow():
+    if pq is None:
+        raise ImportError('Step store requires pyarrow: pip install pyarrow')
+
+
+def step_blocks(steps: np.ndarray):
+    """Start and stop (exclusive) positions of blocks of rows with the same step value."""
+    if len(steps) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate([[True], steps[1:] != steps[:-1]]))
+    return starts, np.append(starts[1:], len(steps))
+
+
+@profiled(writes='filepath')
+def save_step_store(data: pd.DataFrame,
+                    filepath: str,
+                    step_column='Step',
+                    min_group_rows: int = 10_000,
+                    compression='zstd'):
+    """
+    Save raw experiment to parquet with row groups aligned to steps and step index in file metadata.
+    Every block of rows of one step is kept inside one row group, consecutive blocks are packed
+    into a group until it has min_group_rows rows (groups of tiny steps would make metadata bigger
+    than data). Steps split to several blocks (see scan_integrity) are indexed by all blocks.
+    Args:
+        data (pd.DataFrame): raw experiment
+        filepath (str): destination .parquet file
+        step_column (str): step column
+        min_group_rows (int): minimal rows in row group (last group can be smaller)
+        compression (str): parquet compression
+
+    Returns:
+        pd.DataFrame - step index (step, row_group, offset, length, start)
+    """
+    _require_pyarrow()
+    steps = data[step_column].to_numpy()
+    starts, stops = step_blocks(steps)
+    group_bounds = [0]
+    for start, stop in zip(starts, stops):
+        if stop - group_bounds[-1] >= min_group_rows:
+            group_bounds.append(stop)
+    if group_bounds[-1] != len(data):
+        group_bounds.append(len(data))
+    group_of_block = np.searchsorted(group_bounds, starts, side='right') - 1
+    index = pd.DataFrame({'step':steps[starts] if len(starts) else [],
+                          'row_group':group_of_block,
+                          'offset':starts - np.asarray(group_bounds)[group_of_block] if len(starts) else [],
+                          'length':stops - starts,
+                          'start':starts})
+
+    range_index = isinstance(data.index, pd.RangeIndex)
+    table = pa.Table.from_pandas(data, preserve_index=not range_index)
+    meta = {'step_column':step_column,
+            'range':[data.index.start, data.index.step] if range_index else None,
+            'index_columns':[] if range_index else table.schema.pandas_metadata['index_columns'],
+            'index_names':list(data.index.names),
+            'index':index[['row_group', 'offset', 'length', 'start']].to_numpy().tolist(),
+            'steps':index['step'].tolist()}
+    metadata = dict(table.schema.metadata or {})
+    metadata[INDEX_KEY] = json.dumps(meta, default=_json_value).encode()
+    table = table.replace_schema_metadata(metadata)
+    with pq.ParquetWriter(filepath, table.schema, compression=compression) as writer:
+        for start, stop in zip(group_bounds[:-1], group_bounds[1:]):
+            writer.write_table(table.slice(start, stop - start), row_group_size=stop - start)
+    return index
+
+
+def _json_value(value):
+    """NumPy scalars (steps of object columns) are stored as numbers, not as their text."""
+    return value.item() if isinstance(value, np.generic) else str(value)
+
+
+def _read_meta(parquet_file) -> dict:
+    metadata = parquet_file.schema_arrow.metadata or {}
+    if INDEX_KEY not in metadata:
+        raise ValueError('File has no step index, use save_step_store to write it.')
+    return json.loads(metadata[INDEX_KEY])
+
+
+def step_index(filepath: str) -> pd.DataFrame:
+    """
+    Step index of step store: one row per block of step rows.
+    Returns:
+        pd.DataFrame with columns step, row_group, offset (in row group), length, start (row in file)
+    """
+    _require_pyarrow()
+    meta = _read_meta(pq.ParquetFile(filepath))
+    index = pd.DataFrame(meta['index'], columns=['row_group', 'offset', 'length', 'start'])
+    index.insert(0, 'step', meta['steps'])
+    return index
+
+
+@profiled(reads='filepath')
+def read_steps(filepath: str,
+               steps: list = None,
+               columns: list[str] = None,
+               as_list: bool = False,
+               memory_map: bool = True):
+    """
+    Read rows of given steps from step store, only row groups containing them are read
+    (file is memory-mapped by default). Rows keep index of original dataframe.
+    Args:
+        filepath (str): step store file
+        steps (list): step values, None - all steps
+        columns (list[str]): columns to read, None - all
+        as_list (bool): return list of dataframes in order of steps (as get_steps_data),
+                        otherwise one dataframe with rows in file order
+        memory_map (bool): memory-map file
+
+    Returns:
+        pd.DataFrame or list[pd.DataFrame]
+    """
+    _require_pyarrow()
+    parquet_file = pq.ParquetFile(filepath, memory_map=memory_map)
+    meta = _read_meta(parquet_file)
+    index = np.asarray(meta['index'], dtype=np.int64).reshape(-1, 4)
+    block_steps = pd.Series(meta['steps'], dtype=object)
+    if steps is None:
+        steps = list(pd.unique(block_steps))
+    selected = np.flatnonzero(block_steps.isin(list(steps)).to_numpy())
+    groups = np.unique(index[selected, 0])
+
+    if columns is not None:
+        columns = list(columns) + meta['index_columns']
+    table = parquet_file.read_row_groups(groups.tolist(), columns=columns, use_threads=True)
+    group_rows = np.array([parquet_file.metadata.row_group(int(i)).num_rows for i in groups], dtype=np.int64)
+    group_start = dict(zip(groups.tolist(), np.concatenate([[0], np.cumsum(group_rows)[:-1]]).tolist()))
+
+    def frame(blocks):
+        if not len(blocks):
+            result = table.slice(0, 0).to_pandas()
+        else:
+            parts = [table.slice(group_start[group] + offset, length) for group, offset, length, _ in index[blocks]]
+            result = pa.concat_tables(parts).to_pandas()
+        if meta['range'] is not None and len(blocks):
+            start, step = meta['range']
+            positions = np.concatenate([np.arange(row, row + length) for _, _, length, row in index[blocks]])
+            result.index = start + positions * step
+        names = meta.get('index_names')  # None in stores written before index names were kept
+        if names is not None and len(names) == result.index.nlevels:
+            result.index.names = names
+        return result
+
+    if not as_list:
+        return frame(selected)
+    return [frame(selected[(block_steps.iloc[selected] == step).to_numpy()]) for step in steps]
+
+
+@profiled
+def extract_sequences_from_store(filepath: str,
+                                 sequences: list[list[int]],
+                                 time_merge: str | float,
+                                 time_column='Time',
+                                 columns: list[str] = None):
+    """
+    extract_sequences for experiment in step store: row groups of all steps of sequences are read once.
+    Args:
+        filepath (str): step store file
+        sequences (list[list]): steps of every sequence
+        time_merge (str|float): method for time merge, see merge_time
+        time_column (str): name for time column
+        columns (list[str]): columns to read, None - all
+
+    Returns:
+        list of selected sequences
+    """
+    steps = list(pd.unique(pd.Series([step for sequence in sequences for step in sequence], dtype=object)))
+    frames = dict(zip(steps, read_steps(filepath, steps, columns=columns, as_list=True)))
+    sequences_data = []
+    for sequence in sequences:
+        data_steps = [frames[step].copy() for step in sequence]
+        if not check_unity(np.concatenate([step.index.to_numpy() for step in data_steps])):
+            print('get_steps_data: Warning! Merging values are not sequential!')
+        data_steps = merge_time(data_steps, time_merge, column=time_column)
+        sequences_data.append(pd.concat(data_steps))
+    return sequences_data
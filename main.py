@@ -2,45 +2,11 @@ import os.path
 from pathlib import Path
 
 import NewareNDA as N
-import numpy as np
 import pandas as pd
 
 import battery_parser as bp
 
 
-class Experiment:
-    def __init__(self, path=None, pouch=None, channel=None):
-        self.path = path
-        self.pouch = pouch
-        self.channel = channel
-        self.data = None
-        self.statistics = None
-        self.segments = {}
-
-
-def find_segments(df, column_name, pattern):
-    # Переводим колонку в массив NumPy
-    arr = df[column_name].to_numpy()
-
-    # Искомый шаблон
-    if not isinstance(pattern, np.ndarray):
-        pattern = np.array(pattern)
-
-    # Создаём матрицу окон размером len(pattern)
-    shape = (arr.size - len(pattern) + 1, len(pattern))
-    strides = (arr.strides[0], arr.strides[0])
-    windows = np.lib.stride_tricks.as_strided(arr, shape=shape, strides=strides)
-
-    # Сравниваем каждое окно с шаблоном
-    matches = np.all(windows == pattern, axis=1)
-
-    # Получаем начальные индексы совпадений
-    match_indices = np.where(matches)[0]
-
-    # Результат
-    return [df.iloc[i:i + len(pattern)] for i in match_indices]
-
-
 def process_segment_dfs(segment_dfs, func):
     """
     Применяет func ко всем DataFrame-сегментам и собирает результаты в один DataFrame.
@@ -98,7 +64,6 @@ def statistic_generation():
     mapping = pd.read_excel(r"D:\!Science\Analysis\Electrochem\2024 Na-ion\2025-01-10 target SoH "
                             r"cycling\Соответствие_каналов_и_аккумуляторов.xlsx", sheet_name='Соответствие')
     result = pd.merge(result, mapping, on=['channel'], how='left')
-    experiments = {}
     statistic_pattern = {'Current(mA)': ['mean', 'std'],
                          'Status':'unique_values',
                          'Step': 'mean',
@@ -111,26 +76,24 @@ def statistic_generation():
                          'T1': ['min', 'max'],
                          'Timestamp': 'min'}
     save_dir = os.path.join(directory, 'statistics')
-    for _, i in result.iterrows():
-        experiment = Experiment(path=i['path'], pouch=i['pouch'], channel=i['channel'])
-        experiments[experiment.pouch] = experiment
-        experiment.data = N.read(experiment.path, log_level='DEBUG')
-        experiment.statistics = bp.generate_statistics(experiment.data,
-                                                       group_marker='Step',
-                                                       statistics_pattern=statistic_pattern)
+    experiments = bp.ExperimentSet.from_frame(result,
+                                              memory_limit=4 * 1024 ** 3,
+                                              loader=lambda path: N.read(path, log_level='DEBUG'),
+                                              group_marker='Step',
+                                              statistics_pattern=statistic_pattern)
+    for experiment in experiments.prefetch(prefetch=2):  # следующие файлы читаются, пока считается текущий
         bp.exporting.save_experiment(experiment.statistics, os.path.join(save_dir, experiment.pouch + '.csv'),
                                      index=False)
+        experiment.release('data')
 
 
-def load_statistics():
+def load_statistics(segment_patterns=None):
     directory = r'D:\!Science\Analysis\Electrochem\2024 Na-ion\2025-01-10 target SoH cycling\2025-01-10 первое циклирование\statistics'
     files = bp.importing.list_files(directory=directory, filetype='csv')
-    statistics = {}
+    statistics = bp.ExperimentSet(memory_limit=1024 ** 3)
     for filepath in files:
-        pouch = Path(filepath).stem
-        experiment = Experiment(path=filepath, pouch=pouch, channel=None)
-        statistics[experiment.pouch] = experiment
-        experiment.statistics = bp.exporting.load_experiment(filepath)
+        statistics.add(path=filepath, pouch=Path(filepath).stem, statistics_path=filepath,
+                       segment_patterns=segment_patterns)
     return statistics
 
 
@@ -150,21 +113,17 @@ def calculate_soh2(df, capacity):
 
 if __name__ == '__main__':
     # statistic_generation()
-    statistics = load_statistics()
     pattern_cycles = [6, 7, 8, 9, 10]
     pattern_start_cycles = [1, 2, 3, 4]
     pattern_test_cycles = [28, 29, 30, 31]
+    statistics = load_statistics({'cycles': ('Step_Index_mean', pattern_cycles),
+                                  'start_cycles': ('Step_Index_mean', pattern_start_cycles),
+                                  'test_cycles': ('Step_Index_mean', pattern_test_cycles)})
     start_cycles = {}
     test_cycles = {}
     cycles = {}
     all_cycles = {}
     for pouch, experiment in statistics.items():
-        experiment.segments['cycles'] = find_segments(experiment.statistics, 'Step_Index_mean', pattern_cycles)
-        experiment.segments['start_cycles'] = find_segments(experiment.statistics, 'Step_Index_mean',
-                                                            pattern_start_cycles)
-        experiment.segments['test_cycles'] = find_segments(experiment.statistics, 'Step_Index_mean',
-                                                           pattern_test_cycles)
-
         cycles[experiment.pouch] = process_segment_dfs(experiment.segments['cycles'], analyze_cycle_segment)
         start_cycles[experiment.pouch] = process_segment_dfs(experiment.segments['start_cycles'], analyze_cycle_segment)
         test_cycles[experiment.pouch] = process_segment_dfs(experiment.segments['test_cycles'], analyze_cycle_segment)
@@ -0,0 +1,166 @@
+"""
+Small synthetic .ndax archives for test_ndax.py (ndc versions 2, 5, 11, 14, 16 and 17) and reference
+outputs of NewareNDA.read for them and for real archives of this directory.
+
+Record layouts follow NewareNDA (an independent reader), so the references check import_ndax against it:
+
+    python tests/data/ndax/make_ndax.py               # write synthetic archives
+    python tests/data/ndax/make_ndax.py --references  # write <name>.reference.csv.gz (requires NewareNDA)
+"""
+import argparse
+import glob
+import os
+import struct
+import zipfile
+
+PAGE = 4096
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# status codes of steps in cycling order: rest, CC charge, CV charge, CCCV charge, CC discharge, SIM
+STATUS_CODES = [4, 1, 3, 4, 2, 4, 7, 4, 2, 17, 1, 4, 2, 1]
+# bytes at the end of every page after the records, by (version, file type)
+RUN_INFO_TAIL = {11:16, 14:4, 16:64, 17:64}
+RUN_INFO_PADDING = {11:0, 14:8, 16:53, 17:53}
+TEST_INFO = (b'<?xml version="1.0" encoding="gb2312"?><root><config><TestInfo>'
+             b'<AuxT1 AuxID="1" ChlType="103"/><AuxH1 AuxID="2" ChlType="345"/>'
+             b'</TestInfo></config></root>')
+
+
+def step_sequence(n_records: int) -> list[tuple[int, int]]:
+    """(step index, status code) of every record: steps of STATUS_CODES with equal number of records."""
+    per_step = n_records // len(STATUS_CODES) + 1
+    sequence = []
+    for step_index, status in enumerate(STATUS_CODES, 1):
+        sequence.extend([(step_index, status)] * per_step)
+    return sequence[:n_records]
+
+
+def data_record(index: int, step_index: int, status: int) -> bytes:
+    """94-byte data record of ndc version 2 (version 5 uses its bytes 0-86 with type at byte 7)."""
+    record = bytearray(94)
+    record[0] = 0x55
+    record[1:8] = bytes(range(1, 8))
+    struct.pack_into('<IIBB', record, 8, index, step_index // 5, step_index, status)
+    struct.pack_into('<Qii', record, 23, index * 1000, 36000 + index, (-1) ** step_index * 500)
+    struct.pack_into('<qqqq', record, 43, index * 10, index * 3, index * 40, index * 7)
+    struct.pack_into('<HBBBBB', record, 75, 2024, 5, 3, 10, (index // 60) % 60, index % 60)
+    struct.pack_into('<i', record, 82, 1000 if index % 3 else -2000)  # current range
+    return bytes(record)
+
+
+def aux_record(index: int) -> bytes:
+    """94-byte aux record (voltage and temperature) of ndc version 2."""
+    record = bytearray(94)
+    record[0] = 0x65
+    record[1:8] = b'\x09' * 7
+    record[3] = 1
+    struct.pack_into('<I', record, 8, index)
+    struct.pack_into('<i', record, 31, 1000 + index)
+    struct.pack_into('<h', record, 41, 250 + index % 7)
+    return bytes(record)
+
+
+def header(file_type: int, version: int, size: int = PAGE) -> bytearray:
+    page = bytearray(size)
+    page[0], page[2] = file_type, version
+    return page
+
+
+def paged(file_type: int, version: int, start: int, end: int, records: list[bytes]) -> bytes:
+    """ndc file of header page and pages with records between start and PAGE - end bytes."""
+    per_page = (PAGE - start - end) // len(records[0])
+    pages = [header(file_type, version)]
+    for first in range(0, len(records), per_page):
+        block = b''.join(records[first:first + per_page])
+        page = bytearray(PAGE)
+        page[start:start + len(block)] = block
+        pages.append(page)
+    return b''.join(bytes(page) for page in pages)
+
+
+def version_2(n_records: int) -> dict:
+    records = [data_record(index, *step) for index, step in enumerate(step_sequence(n_records), 1)]
+    aux = [aux_record(index) for index in range(1, n_records + 1)]
+    return {'data.ndc':bytes(header(1, 2, 517)) + b''.join(records),
+            'data_1.ndc':bytes(header(5, 2, 517)) + b''.join(aux)}
+
+
+def version_5(n_records: int) -> dict:
+    records = [data_record(index, *step) for index, step in enumerate(step_sequence(n_records), 1)]
+    records = [record[:7] + b'\x55' + record[8:87] for record in records]
+    return {'data.ndc':paged(1, 5, 125, 56, records)}
+
+
+def split_version(version: int, n_records: int) -> dict:
+    """
+    Versions 11-17: voltage and current in data.ndc, step types in data_step.ndc, time and capacities
+    of every 4th record in data_runInfo.ndc (the rest is interpolated), aux channels for 14 and 17.
+    """
+    sequence = step_sequence(n_records)
+    voltage_scale, current_scale, capacity_scale = (1e4, 1, 3600) if version in (11, 16) else (1, 1e-3, 1e-3)
+    data = [struct.pack('<ff', (3.6 + i * 1e-4) * voltage_scale, (-1) ** step_index * 500 * current_scale)
+            for i, (step_index, _) in enumerate(sequence)]
+    data[5] = struct.pack('<ff', 0, 0)  # records with zero voltage are dropped by readers
+
+    steps = []
+    for step_index, status in sorted(set(sequence)):
+        if version in (11, 14):
+            steps.append(struct.pack('<ii16sb12s', step_index // 5, step_index, b'', status, b''))
+        else:
+            steps.append(struct.pack('<ii16sb8si63s', step_index // 5, step_index, b'', status, b'', step_index * 3, b''))
+
+    run_info = []
+    for i, (step_index, _) in enumerate(sequence):
+        if i % 4 and i != len(sequence) - 1:
+            continue
+        capacities = [i * value * capacity_scale for value in (0.01, 0.002, 0.03, 0.005)]
+        record = struct.pack('<ixffff8xiiiih', i * 1000, *capacities, 1000, 1714730000 + i, step_index, i + 1, 250)
+        run_info.append(record + bytes(RUN_INFO_PADDING[version]))
+
+    files = {'data.ndc':paged(1, version, 132, 4, data),
+             'data_step.ndc':paged(7, version, 132, 5 if version in (11, 14) else 64, steps),
+             'data_runInfo.ndc':paged(18, version, 132, RUN_INFO_TAIL[version], run_info)}
+    if version in (14, 17):
+        for channel, base in ((1, 25), (2, 40)):
+            values = [struct.pack('<f', base + i * 0.01) for i in range(n_records)]
+            files[f'data_AUX_1_1_{channel}.ndc'] = paged(5, version, 132, 4, values)
+        files['TestInfo.xml'] = TEST_INFO
+    return files
+
+
+def write_archive(filepath: str, files: dict):
+    with zipfile.ZipFile(filepath, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+
+
+def write_synthetic(n_records: int = 1200):
+    """Archives v2.ndax ... v17.ndax, split versions have several data pages for chunked reading."""
+    write_archive(os.path.join(DIRECTORY, 'v2.ndax'), version_2(n_records))
+    write_archive(os.path.join(DIRECTORY, 'v5.ndax'), version_5(n_records))
+    for version in (11, 14, 16, 17):
+        write_archive(os.path.join(DIRECTORY, f'v{version}.ndax'), split_version(version, n_records))
+
+
+def write_references():
+    """
+    NewareNDA.read output for every archive of directory. Time zone aware timestamps
+    (versions 11-17 are converted to local time by readers) are written in UTC.
+    """
+    import NewareNDA
+    import pandas as pd
+    for filepath in sorted(glob.glob(os.path.join(DIRECTORY, '*.ndax'))):
+        data = NewareNDA.read(filepath)
+        if isinstance(data['Timestamp'].dtype, pd.DatetimeTZDtype):
+            data['Timestamp'] = data['Timestamp'].dt.tz_convert('UTC')
+        data.to_csv(filepath.replace('.ndax', '.reference.csv.gz'), index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=1200, help='records in synthetic archives')
+    parser.add_argument('--references', action='store_true', help='write NewareNDA.read outputs')
+    arguments = parser.parse_args()
+    if arguments.references:
+        write_references()
+    else:
+        write_synthetic(arguments.records)
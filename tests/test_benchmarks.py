@@ -0,0 +1,51 @@
+import importlib.util
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_parser.benchmarks import compare, run_benchmarks
+from battery_parser.benchmarks.__main__ import main
+
+NAMES = ['generate_statistics', 'find_pattern', 'extract_sequences', 'rename_columns', 'parse_time', 'file_hash']
+
+
+@pytest.fixture(scope='module')
+def results(tmp_path_factory):
+    return run_benchmarks(cycles=1, rows_per_step=20, repeat=1, xlsx_rows=50,
+                          workdir=str(tmp_path_factory.mktemp('benchmarks')))
+
+
+def test_run_benchmarks_tiny(results):
+    excel = any(importlib.util.find_spec(engine) is not None for engine in ('openpyxl', 'xlsxwriter'))
+    assert list(results.index) == NAMES + (['import_xls'] if excel else [])
+    assert list(results.columns) == ['rows', 'MB', 'time_s', 'rows_per_s', 'MB_per_s', 'peak_memory_MB']
+    assert (results['time_s'] > 0).all() and (results['peak_memory_MB'] >= 0).all()
+    assert results.loc['generate_statistics', 'rows'] == results.loc['extract_sequences', 'rows'] > 0
+    assert np.isnan(results.loc['file_hash', 'rows']) and results.loc['file_hash', 'MB'] > 0
+    expected = results.loc['generate_statistics', 'rows'] / results.loc['generate_statistics', 'time_s']
+    assert results.loc['generate_statistics', 'rows_per_s'] == pytest.approx(expected)
+
+
+def test_include_and_compare(results):
+    selected = run_benchmarks(cycles=1, rows_per_step=20, repeat=1, include=['find_pattern'])
+    assert list(selected.index) == ['find_pattern']
+    slower = results.assign(time_s=results['time_s'] * 2)
+    comparison = compare(slower, results, tolerance=0.5)
+    assert comparison['ratio'].tolist() == pytest.approx([2.0] * len(results))
+    assert comparison['regression'].all()
+    assert not compare(results, slower, tolerance=0.5)['regression'].any()
+
+
+def test_command_line_baseline(tmp_path, capsys):
+    output = tmp_path / 'results.csv'
+    arguments = ['--cycles', '1', '--rows-per-step', '20', '--repeat', '1', '--include', 'find_pattern']
+    assert main(arguments + ['--output', str(output)]) == 0
+    saved = pd.read_csv(output, index_col='name')
+    assert list(saved.index) == ['find_pattern']
+
+    saved.assign(time_s=saved['time_s'] * 1000).to_csv(tmp_path / 'slow.csv')
+    assert main(arguments + ['--baseline', str(tmp_path / 'slow.csv')]) == 0
+    saved.assign(time_s=saved['time_s'] / 1000).to_csv(tmp_path / 'fast.csv')
+    assert main(arguments + ['--baseline', str(tmp_path / 'fast.csv')]) == 1
+    assert 'regression' in capsys.readouterr().out
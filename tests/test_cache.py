@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_parser import cache as cache_module
+from battery_parser.cache import FrameCache, frame_memory
+from battery_parser.experiment import ExperimentSet
+
+
+def numeric_frame(value=0.0, rows=1000):
+    return pd.DataFrame({'E':np.full(rows, value), 'Step':np.arange(rows)})
+
+
+def test_frame_memory_deep_only_for_objects():
+    numeric = numeric_frame()
+    assert frame_memory(numeric) == numeric.memory_usage(deep=True).sum()
+    text = pd.DataFrame({'E':np.zeros(100), 'Status':['CC_Chg' * 5] * 100}).astype({'Status':object})
+    assert frame_memory(text) == text.memory_usage(deep=True).sum() > text.memory_usage().sum()
+    labelled = pd.Series(np.zeros(100), index=pd.Index(['label' * 4] * 100, dtype=object))
+    assert frame_memory(labelled) == labelled.memory_usage(deep=True)
+    assert frame_memory([numeric, {'a':text}, 'other']) == frame_memory(numeric) + frame_memory(text)
+
+
+def test_size_measured_once_per_entry(monkeypatch):
+    calls = []
+    monkeypatch.setattr(cache_module, 'frame_memory', lambda value:calls.append(value) or 100)
+    cache = FrameCache(memory_limit=1000)
+    cache.put('a', numeric_frame())
+    for _ in range(5):
+        cache.get('a')
+    assert len(calls) == 1 and cache.memory_of('a', 'missing') == 100
+
+
+def test_lru_eviction_without_spill():
+    size = frame_memory(numeric_frame())
+    cache = FrameCache(memory_limit=2 * size)
+    cache.put('a', numeric_frame(1))
+    cache.put('b', numeric_frame(2))
+    cache.get('a')  # a becomes most recently used
+    cache.put('c', numeric_frame(3))
+    assert cache.resident() == ['a', 'c'] and 'b' not in cache
+    assert cache.memory_usage == 2 * size
+    with pytest.raises(KeyError):
+        cache.get('b')
+    assert cache.get('b', lambda:numeric_frame(4))['E'].iloc[0] == 4  # recreated by factory
+    assert cache.resident() == ['c', 'b']
+
+    big = FrameCache(memory_limit=size // 2)
+    big.put('a', numeric_frame())  # last value is kept even over the budget
+    assert big.resident() == ['a']
+
+
+@pytest.mark.parametrize('value', [numeric_frame(5), {'E':numeric_frame(6), 'meta':[1, 2]}], ids=['frame', 'other'])
+def test_spill_and_reload(tmp_path, value):
+    size = frame_memory(value)
+    cache = FrameCache(memory_limit=size, cache_dir=str(tmp_path / 'spill'))
+    cache.put('a', value)
+    cache.put('b', numeric_frame(7))
+    assert cache.resident() == ['b'] and 'a' in cache
+    spilled = os.listdir(tmp_path / 'spill')
+    assert len(spilled) == 1
+    assert spilled[0].endswith('.parquet' if isinstance(value, pd.DataFrame) else '.pkl')
+
+    reloaded = cache.get('a')
+    if isinstance(value, pd.DataFrame):
+        pd.testing.assert_frame_equal(reloaded, value)
+    else:
+        pd.testing.assert_frame_equal(reloaded['E'], value['E'])
+        assert reloaded['meta'] == [1, 2]
+    assert cache.resident()[-1] == 'a' and 'b' in cache  # b is spilled in turn
+    assert len(os.listdir(tmp_path / 'spill')) == 2  # spill of a is kept until a is replaced
+
+    cache.put('a', numeric_frame(8))  # new value drops stale spill
+    cache.discard('b')
+    assert os.listdir(tmp_path / 'spill') == [] and cache.resident() == ['a']
+    cache.clear()
+    assert os.listdir(tmp_path / 'spill') == [] and len(cache) == 0 and 'a' not in cache
+
+
+def test_prefetch_measures_values_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(cache_module, 'frame_memory', lambda value:calls.append(value) or frame_memory(value))
+    experiments = ExperimentSet(memory_limit=10 * frame_memory(numeric_frame()), loader=lambda path:numeric_frame())
+    for i in range(4):
+        experiments.add(path=f'p{i}', pouch=f'p{i}')
+    assert len(list(experiments.prefetch(prefetch=2))) == 4
+    assert len(calls) == 4
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_parser.downsampling import DownsamplePyramid, lttb, minmax, step_boundaries
+
+
+@pytest.fixture
+def signal():
+    rng = np.random.default_rng(0)
+    x = np.arange(200_000, dtype=float)
+    return x, np.sin(x / 500) + rng.normal(0, 0.1, x.size)
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+def test_many_steps_respect_budget(signal, method):
+    x, y = signal
+    boundaries = step_boundaries(np.repeat(np.arange(10_000), 20))
+    positions = lttb(x, y, 2000, boundaries) if method == 'lttb' else minmax(y, 2000, boundaries)
+    assert len(positions) <= 2000
+    assert np.all(np.diff(positions) > 0)
+
+
+def test_few_steps_keep_boundaries(signal):
+    x, y = signal
+    boundaries = step_boundaries(np.repeat(np.arange(10), 20_000))
+    positions = lttb(x, y, 2000, boundaries)
+    assert len(positions) <= 2000
+    assert set(boundaries[:-1]) <= set(positions)
+    assert set(boundaries[1:] - 1) <= set(positions)
+    assert set(boundaries[:-1]) <= set(minmax(y, 2000, boundaries))
+
+
+def test_lttb_keeps_peak():
+    y = np.zeros(10_000)
+    y[5_123] = 10.0
+    positions = lttb(np.arange(y.size, dtype=float), y, 100)
+    assert len(positions) == 100
+    assert {0, 5_123, 9_999} <= set(positions)
+
+
+def test_pyramid_levels_are_nested(signal):
+    x, y = signal
+    data = pd.DataFrame({'Time':x, 'U':y, 'Step':np.repeat(np.arange(100), 2000)})
+    pyramid = DownsamplePyramid(data, 'U', 'Time', 'Step', method='lttb', factor=4, min_points=2000)
+    assert pyramid.n_levels == 3
+    for number in range(1, pyramid.n_levels + 1):
+        level, previous = pyramid.level(number), pyramid.level(number - 1)
+        assert len(level) <= len(data) // 4 ** number
+        assert np.isin(level, previous).all()
+    assert len(pyramid.view(50_000, 60_000, 1000)) <= 1000
@@ -0,0 +1,36 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from battery_parser.cache import FrameCache, frame_memory
+from battery_parser.experiment import ExperimentSet
+
+FRAME = pd.DataFrame({'E':np.zeros(100_000)})
+
+
+def test_prefetched_data_is_read_once():
+    reads = Counter()
+
+    def loader(path):
+        reads[path] += 1
+        return FRAME.copy()
+
+    experiments = ExperimentSet(memory_limit=int(2.5 * frame_memory(FRAME)), loader=loader)
+    for i in range(1, 7):
+        experiments.add(path=f'p{i}', pouch=f'p{i}')
+    for experiment in experiments.prefetch(prefetch=4, memory_limit=10 * frame_memory(FRAME)):
+        assert len(experiment.data) == len(FRAME)
+    assert reads == {f'p{i}':1 for i in range(1, 7)}
+    assert experiments.cache.memory_usage <= experiments.cache.memory_limit
+
+
+def test_pinned_values_are_not_evicted():
+    cache = FrameCache(memory_limit=frame_memory(FRAME))
+    cache.pin('a')
+    cache.put('a', FRAME)
+    cache.put('b', FRAME)
+    cache.put('c', FRAME)
+    assert cache.resident() == ['a', 'c']
+    cache.unpin('a')
+    assert cache.resident() == ['c']
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_parser import exporting
+from battery_parser.exporting import load_experiment_set, load_sequence_tensor, save_experiment, save_sequence_tensor
+
+
+@pytest.fixture
+def statistics_dir(tmp_path):
+    """Output directory of run_job: per-pouch statistics, summary.csv and a segment subfolder."""
+    for pouch, offset in (('101-1-1', 0), ('102-1-2', 10)):
+        data = pd.DataFrame({'E':np.arange(4.) + offset, 'I':[1., -1., 1., -1.]}, index=[1, 2, 5, 7])
+        save_experiment(data, str(tmp_path / f'{pouch}.csv'))
+        save_experiment(data.iloc[:2], str(tmp_path / 'charge' / f'{pouch}.csv'))
+    pd.DataFrame({'path':['a', 'b'], 'status':['done', 'done']}).to_csv(tmp_path / 'summary.csv', index=False)
+    return tmp_path
+
+
+@pytest.fixture(params=['pyarrow', 'default'])
+def engine(request, monkeypatch):
+    if request.param == 'pyarrow':
+        pytest.importorskip('pyarrow')
+    else:
+        monkeypatch.setattr(exporting.importlib.util, 'find_spec', lambda name:None)
+    return request.param
+
+
+def test_positional_and_named_index_col(statistics_dir, engine):
+    by_position = load_experiment_set(str(statistics_dir), index_col=0)
+    by_name = load_experiment_set(str(statistics_dir), index_col='Index')
+    pd.testing.assert_frame_equal(by_position, by_name)
+    assert by_position.index.names == ['pouch', 'Index']
+    assert list(by_position.columns) == ['E', 'I']
+    assert by_position.loc[('102-1-2', 5), 'E'] == 12
+
+
+def test_top_level_files_only_by_default(statistics_dir, engine):
+    data, views = load_experiment_set(str(statistics_dir), index_col=0, as_dict=True)
+    assert sorted(views) == ['101-1-1', '102-1-2']  # no summary.csv, no charge/ files
+    assert len(data) == 8 and all(len(view) == 4 for view in views.values())
+
+
+def test_recursive_duplicate_pouches_raise(statistics_dir):
+    with pytest.raises(ValueError, match='101-1-1'):
+        load_experiment_set(str(statistics_dir), recursive=True)
+    data = load_experiment_set(str(statistics_dir / 'charge'), recursive=True)
+    assert len(data) == 4
+
+
+def test_blank_header_names_match_default_engine(tmp_path, engine):
+    (tmp_path / 'a.csv').write_text(',,E\n0,1,2.5\n1,3,4.5\n')
+    data = load_experiment_set(str(tmp_path))
+    assert list(data.columns) == ['Unnamed: 0', 'Unnamed: 1', 'E']
+    indexed = load_experiment_set(str(tmp_path), index_col=0)
+    assert indexed.index.names == ['pouch', 'step']
+    assert list(indexed.columns) == ['Unnamed: 1', 'E']
+
+
+@pytest.fixture
+def ragged_sequences():
+    sequences = []
+    for length, steps in ((5, [3, 4]), (8, [7, 8, 9]), (3, [12])):
+        sequences.append(pd.DataFrame({'Step':np.repeat(steps, -(-length // len(steps)))[:length],
+                                       'Time':np.arange(length) * 2.0 + 100 * length,
+                                       'E':3.5 + np.arange(length) * 0.1, 'I':-np.arange(length, dtype=float)}))
+    return sequences
+
+
+def test_sequence_tensor_padded_round_trip(ragged_sequences, tmp_path):
+    filepath = str(tmp_path / 'tensors' / 'cycles.npy')
+    save_sequence_tensor(ragged_sequences, filepath, channels=['E', 'I'])
+    tensor, mask, meta = load_sequence_tensor(filepath)
+    assert isinstance(tensor, np.memmap) and isinstance(mask, np.memmap)
+    assert tensor.shape == (3, 8, 2) and tensor.dtype == np.float32
+    assert (tmp_path / 'tensors' / 'cycles_mask.npy').exists() and (tmp_path / 'tensors' / 'cycles.json').exists()
+    assert mask.sum(axis=1).tolist() == [5, 8, 3]
+    for i, sequence in enumerate(ragged_sequences):
+        np.testing.assert_allclose(tensor[i, :len(sequence)], sequence[['E', 'I']], rtol=1e-6)
+        assert mask[i, :len(sequence)].all() and not mask[i, len(sequence):].any()
+        assert (tensor[i, len(sequence):] == 0).all()
+    assert meta == {'channels':['E', 'I'], 'lengths':[5, 8, 3], 'grid_column':None, 'grid':None,
+                    'steps':[[3, 4], [7, 8, 9], [12]]}
+
+    save_sequence_tensor(ragged_sequences, filepath, channels=['E'], n_points=4, step_column='Cycle', dtype='float64')
+    tensor, mask, meta = load_sequence_tensor(filepath, mmap_mode=None)
+    assert tensor.shape == (3, 4, 1) and tensor.dtype == np.float64 and not isinstance(tensor, np.memmap)
+    assert mask.sum(axis=1).tolist() == [4, 4, 3]  # cut to n_points
+    assert meta['lengths'] == [5, 8, 3] and meta['steps'] == [None, None, None]
+
+
+def test_sequence_tensor_grid_round_trip(ragged_sequences, tmp_path):
+    filepath = str(tmp_path / 'grid.npy')
+    save_sequence_tensor(ragged_sequences, filepath, channels=['E', 'I'], grid_column='Time', n_points=8)
+    tensor, mask, meta = load_sequence_tensor(filepath)
+    grid = np.linspace(0, 14.0, 8)  # longest extent: 8 points 2 s apart
+    np.testing.assert_allclose(meta['grid'], grid)
+    assert meta['grid_column'] == 'Time'
+    for i, sequence in enumerate(ragged_sequences):
+        time = sequence['Time'].to_numpy() - sequence['Time'].iloc[0]
+        inside = grid <= time[-1]
+        assert (mask[i] == inside).all()
+        expected = np.column_stack([np.interp(grid[inside], time, sequence[column]) for column in ('E', 'I')])
+        np.testing.assert_allclose(tensor[i, inside], expected, rtol=1e-6)
+        assert (tensor[i, ~inside] == 0).all()
@@ -0,0 +1,70 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from battery_parser.files import FileIndex, Plan
+
+
+@pytest.fixture
+def archive(tmp_path):
+    source, target = tmp_path / 'source', tmp_path / 'target'
+    for directory, files in ((source, {'a.csv':'same', 'b.csv':'same', 'c.csv':'other', 'd.csv':'longer'}),
+                             (target, {'x.csv':'same', 'd.csv':'long'})):
+        directory.mkdir()
+        for name, text in files.items():
+            (directory / name).write_text(text)
+    return source, target
+
+
+def test_delete_duplicates_default_keep_key(archive):
+    source, _ = archive
+    plan = Plan()
+    plan.delete_duplicates(FileIndex(source), 'hash')
+    assert [(i['op'], i['source']) for i in plan] == [('delete', str(source / 'b.csv'))]
+
+
+def test_remove_existing_files_default_move_key(archive):
+    source, target = archive
+    plan = Plan()
+    plan.remove_existing_files(FileIndex(source), FileIndex(target), 'hash')
+    assert sorted(i['source'] for i in plan) == [str(source / 'a.csv'), str(source / 'b.csv')]
+    assert {i['op'] for i in plan} == {'delete'}
+
+    plan = Plan()
+    plan.remove_existing_files(FileIndex(source), FileIndex(target), 'name')
+    assert [(i['op'], i['source'], i['target']) for i in plan] == \
+           [('copy', str(source / 'd.csv'), str(target / 'd.csv')), ('delete', str(source / 'd.csv'), None)]
+
+
+def test_index_plans_reject_callable_keys(archive):
+    source, target = archive
+    with pytest.raises(TypeError):
+        Plan().delete_duplicates(FileIndex(source), 'hash', lambda x:x.mtime)
+    with pytest.raises(TypeError):
+        Plan().remove_existing_files(FileIndex(source), FileIndex(target), 'hash', lambda x:x.mtime)
+
+
+def test_default_keys_use_index_arrays(archive, monkeypatch):
+    from battery_parser.files import delete_duplicates, remove_existing_files
+    from battery_parser.files.index import FileIndex as Index
+    source, target = archive
+    monkeypatch.setattr(Index, '__iter__', lambda self:pytest.fail('File objects were created'))
+    plan = Plan()
+    plan.delete_duplicates(FileIndex(source))
+    assert [i['source'] for i in plan] == [str(source / 'b.csv')]
+    plan = Plan()
+    plan.remove_existing_files(FileIndex(source), FileIndex(target))
+    assert sorted(i['source'] for i in plan) == [str(source / 'a.csv'), str(source / 'b.csv')]
+
+    index = FileIndex(source)
+    delete_duplicates(index, workers=1)
+    assert sorted(index.paths()) == [str(source / name) for name in ('a.csv', 'c.csv', 'd.csv')]
+    remove_existing_files(index, FileIndex(target), workers=1)
+    assert sorted(index.paths()) == [str(source / name) for name in ('c.csv', 'd.csv')]
+
+
+def test_custom_key_with_index_uses_files(archive):
+    source, _ = archive
+    plan = Plan()
+    plan.delete_duplicates(FileIndex(source), delete_key=lambda x:x.name)
+    assert [i['source'] for i in plan] == [str(source / 'b.csv')]
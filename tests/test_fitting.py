@@ -0,0 +1,110 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_parser import fitting
+from battery_parser.fitting import MODELS, fit_degradation, predict, predict_lifetime
+
+TRUE_PARAMETERS = {
+    'power_law':[[1.0, 2e-3, 0.6], [0.98, 4e-3, 0.5], [1.01, 1e-3, 0.8]],
+    'sqrt_linear':[[1.0, 2e-3, 5e-5], [0.99, 1e-3, 1e-4], [1.02, 3e-3, 2e-5]],
+    'double_exponential':[[1.0, -5e-5, -0.02, 3e-3], [0.99, -2e-5, -0.01, 4e-3], [1.01, -8e-5, -0.03, 2e-3]],
+}
+
+
+def trajectories(model, parameters, lengths=(200, 150, 120), noise=0.0, seed=0):
+    """Long table of cells with different number of points (padded differently)."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for cell, (p, length) in enumerate(zip(parameters, lengths)):
+        x = np.arange(1, length + 1) * 5.0
+        y = MODELS[model].function(x[None, :], np.array([p]))[0] + rng.normal(0, noise, length)
+        frames.append(pd.DataFrame({'pouch':f'cell{cell}', 'cycle':x, 'SoH':y}))
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.mark.parametrize('model', list(MODELS))
+def test_recovers_known_parameters(model):
+    table = trajectories(model, TRUE_PARAMETERS[model])
+    result = fit_degradation(table, model=model)
+    assert result['converged'].all()
+    assert (result['n_points'].to_numpy() == [200, 150, 120]).all()
+    fitted = result[MODELS[model].parameters].to_numpy()
+    np.testing.assert_allclose(fitted, TRUE_PARAMETERS[model], rtol=1e-4)
+    assert (result['rmse'] < 1e-8).all()
+
+
+@pytest.mark.parametrize('model', list(MODELS))
+def test_padding_and_missing_points_are_masked(model):
+    table = trajectories(model, TRUE_PARAMETERS[model], noise=1e-3)
+    alone = fit_degradation(table[table['pouch'] == 'cell2'], model=model)
+
+    holes = table.copy()
+    holes['SoH'] = holes['SoH'].astype(float)
+    extra = holes[holes['pouch'] == 'cell2'].iloc[::10].assign(SoH=np.nan)  # NaN rows between valid ones
+    shuffled = pd.concat([holes, extra]).sample(frac=1, random_state=0)
+    together = fit_degradation(shuffled, model=model)
+
+    columns = MODELS[model].parameters + ['rmse', 'n_points']
+    pd.testing.assert_frame_equal(together.loc[['cell2'], columns], alone[columns], rtol=1e-6)
+
+
+def test_double_exponential_convergence_rate():
+    rng = np.random.default_rng(1)
+    n_cells = 200
+    parameters = np.column_stack([rng.uniform(0.95, 1.02, n_cells), -rng.uniform(1e-5, 5e-5, n_cells),
+                                  -rng.uniform(0.01, 0.05, n_cells), rng.uniform(1e-3, 4e-3, n_cells)])
+    lengths = rng.integers(100, 300, n_cells)
+    table = trajectories('double_exponential', parameters, lengths, noise=1e-3, seed=2)
+    result = fit_degradation(table, model='double_exponential')
+    assert result['converged'].mean() > 0.95
+    assert result['iterations'].median() < 50
+    assert (result['rmse'] < 1.2e-3).all()  # noise level, non-converged cells included
+
+
+def test_iteration_limit_reported():
+    table = trajectories('power_law', TRUE_PARAMETERS['power_law'], noise=1e-3)
+    result = fit_degradation(table, model='power_law', max_iterations=1)
+    assert not result['converged'].any()
+    assert (result['iterations'] == 1).all()
+
+
+def test_standard_errors_and_intervals_match_sampling_spread():
+    # sqrt_linear is linear in parameters, so covariance s² (JᵀJ)⁻¹ is exact
+    n_cells, noise = 400, 2e-3
+    table = trajectories('sqrt_linear', [TRUE_PARAMETERS['sqrt_linear'][0]] * n_cells, [100] * n_cells,
+                         noise=noise, seed=3)
+    result = fit_degradation(table, model='sqrt_linear', confidence=0.95)
+    if fitting.stats is not None:
+        quantile = fitting.stats.t.ppf(0.975, 100 - 3)
+    else:
+        quantile = NormalDist().inv_cdf(0.975)
+    for name, true in zip(['a', 'b', 'c'], TRUE_PARAMETERS['sqrt_linear'][0]):
+        assert result[f'{name}_se'].mean() == pytest.approx(result[name].std(), rel=0.15)
+        covered = ((result[f'{name}_low'] <= true) & (true <= result[f'{name}_high'])).mean()
+        assert 0.91 <= covered <= 0.99
+        width = result[f'{name}_high'] - result[f'{name}_low']
+        np.testing.assert_allclose(width, 2 * quantile * result[f'{name}_se'])
+
+
+def test_predict_lifetime():
+    parameters = pd.DataFrame({'a':[1.0, 1.0, 1.0], 'b':[0.01, 0.002, 1e-6], 'c':[0.5, 0.6, 0.5],
+                               'model':'power_law'}, index=pd.Index(['fast', 'slow', 'flat'], name='pouch'))
+    lifetime = predict_lifetime(parameters, threshold=0.8, horizon=50_000, n_points=50_001)
+    expected = (0.2 / parameters['b']) ** (1 / parameters['c'])
+    np.testing.assert_allclose(lifetime[['fast', 'slow']], expected[['fast', 'slow']], rtol=1e-4)
+    assert np.isnan(lifetime['flat'])  # threshold not reached before horizon
+    values = predict(parameters, lifetime[['fast', 'slow']].to_numpy())
+    np.testing.assert_allclose(np.diag(values.to_numpy()[:2]), 0.8, atol=1e-6)
+
+
+def test_dict_input_and_predict_round_trip():
+    table = trajectories('power_law', TRUE_PARAMETERS['power_law'])
+    cells = {pouch:frame.drop(columns='pouch') for pouch, frame in table.groupby('pouch')}
+    result = fit_degradation(cells, model='power_law')
+    assert list(result.index) == ['cell0', 'cell1', 'cell2'] and result.index.name == 'pouch'
+    fitted = predict(result, [5.0, 500.0])
+    np.testing.assert_allclose(fitted.loc['cell0'], table.set_index('pouch').loc['cell0'].set_index('cycle')
+                               .loc[[5.0, 500.0], 'SoH'], atol=1e-8)
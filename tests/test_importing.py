@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from battery_parser.importing import AuxAligner, align_aux
+
+
+def test_align_aux_empty_aux_gives_nan_columns():
+    data = pd.DataFrame({'Datetime':pd.date_range('2025-01-01', periods=3, freq='s'), 'E':[3.0, 3.1, 3.2]})
+    aux = pd.DataFrame({'Datetime':pd.Series([], dtype='datetime64[ns]'), 'T':pd.Series([], dtype=float)})
+    result = align_aux(data, aux, on='Datetime')
+    assert result['T'].isna().all() and len(result) == 3
+
+
+def test_align_aux_timezone_aware_keys():
+    local = pd.date_range('2025-01-01 12:00', periods=4, freq='10s')
+    data = pd.DataFrame({'Datetime':local, 'E':np.arange(4.0)})
+    aux = pd.DataFrame({'Datetime':local.tz_localize('Europe/Moscow'), 'T':[20.0, 21.0, 22.0, 23.0]})
+    result = AuxAligner(aux, on='Datetime', tolerance=1)(data)
+    assert result['T'].tolist() == [20.0, 21.0, 22.0, 23.0]
+
+    aware = data.assign(Datetime=local.tz_localize('Europe/Moscow').tz_convert('UTC'))
+    assert AuxAligner(aux, on='Datetime', tolerance=1)(aware)['T'].tolist() == [20.0, 21.0, 22.0, 23.0]
+    naive_aux = aux.assign(Datetime=local)  # wall times are compared in time zone of data
+    moscow = data.assign(Datetime=local.tz_localize('Europe/Moscow'))
+    assert AuxAligner(naive_aux, on='Datetime', tolerance=1)(moscow)['T'].tolist() == [20.0, 21.0, 22.0, 23.0]
@@ -0,0 +1,55 @@
+import csv
+import os
+
+from battery_parser.benchmarks.synthetic import generate_cycling_data
+from battery_parser.jobs import collect_files, run_job
+
+
+def make_job(tmp_path, **input_options):
+    root = tmp_path / 'data'
+    root.mkdir()
+    data = generate_cycling_data(cycles=1, rows_per_step=20)
+    for name in ('101-1-1', '102-1-2'):
+        data.to_csv(root / f'{name}.csv', index=False)
+    job = {'input':{'roots':[str(root)], 'filetypes':['csv'], **input_options},
+           'statistics':{'group_marker':'Step', 'pattern':{'E':'mean'}},
+           'output':{'directory':str(root / 'statistics')}}  # output inside input root
+    return job, root
+
+
+def read_summary(job):
+    with open(os.path.join(job['output']['directory'], 'summary.csv'), newline='', encoding='utf-8') as f:
+        return {os.path.basename(line['path']):line for line in csv.DictReader(f)}
+
+
+def test_rerun_keeps_results_and_skips_outputs(tmp_path):
+    job, root = make_job(tmp_path)
+    first = run_job(job)
+    assert sorted(line['status'] for line in first) == ['done', 'done']
+
+    second = run_job(job)  # outputs under data/statistics are not collected as inputs
+    assert sorted(line['status'] for line in second) == ['skipped', 'skipped']
+    summary = read_summary(job)
+    assert set(summary) == {'101-1-1.csv', '102-1-2.csv'}
+    assert all(line['status'] == 'done' and line['rows'] == '100' for line in summary.values())
+
+
+def test_regex_mismatch_is_per_file_failure(tmp_path):
+    job, root = make_job(tmp_path, path_regex=r'(101-\d-\d)', regex_columns=['channel'])
+    records = collect_files(job)
+    assert sorted(record.get('error') is None for record in records) == [False, True]
+
+    summary = {os.path.basename(line['path']):line for line in run_job(job)}
+    assert summary['101-1-1.csv']['status'] == 'done'
+    assert summary['102-1-2.csv']['status'] == 'failed'
+    assert os.path.exists(os.path.join(job['output']['directory'], '101-1-1.csv'))
+
+
+def test_inside_output_directory_on_other_drive(monkeypatch):
+    import ntpath
+    from battery_parser import jobs
+    assert jobs._inside(os.path.join('out', 'x.csv'), 'out')
+    assert not jobs._inside(os.path.join('data', 'x.csv'), 'out')
+    monkeypatch.setattr(jobs.os, 'path', ntpath)  # drives exist only in Windows paths
+    assert jobs._inside(r'D:\archive\out\x.csv', r'D:\archive\out')
+    assert not jobs._inside(r'C:\data\x.csv', r'D:\archive\out')
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_parser.modifications import coulomb_counting, scan_integrity
+
+
+def test_scan_integrity_split_steps_and_sources():
+    data = pd.DataFrame({'Step':[1, 1, 2, 2, 1, 3, 3, 2, 4],
+                         'Source':['a', 'a', 'a', 'a', 'b', 'b', 'b', 'b', 'b'],
+                         'Time':np.arange(9.0)})
+    issues = scan_integrity(data, source_column='Source', index_column=None)
+    split = issues[issues['issue'] == 'split_step']
+    assert split[['start', 'stop', 'count']].values.tolist() == [[0, 5, 2], [2, 8, 2]]
+    assert split['detail'].tolist() == ['step 1 in 2 blocks', 'step 2 in 2 blocks']
+    across = issues[issues['issue'] == 'step_across_sources']
+    assert across[['start', 'stop', 'count']].values.tolist() == [[0, 5, 3], [2, 8, 3]]
+
+
+def test_step_classifier_lists_and_substrings(capsys):
+    from battery_parser.modifications import Find_key, StepClassifier
+    classifier = StepClassifier({'charge':['CC_Chg', 'CV_Chg'], 'rest':['Rest', 'CC_Chg']})
+    assert capsys.readouterr().out == ''
+    assert classifier('CV_Chg') == 'charge'
+    assert classifier('CC_Chg') == ['charge', 'rest']
+    assert classifier('Pause') == []
+
+    find_key = Find_key({'charge':'CC_Chg CV_Chg', 'discharge':'CC_DChg'})
+    assert find_key('CV_Chg') == 'charge'
+    assert find_key('CC_') == ['charge', 'discharge']
+    assert find_key('Rest') == []
+    statuses = pd.Series(['CC_Chg', 'CC_DChg', 'Rest'])
+    assert find_key.map(statuses, default='other').tolist() == ['charge', 'discharge', 'other']
+
+
+def test_step_id_creator_missing_steps():
+    from battery_parser.modifications import step_id_creator
+    pouch = pd.DataFrame({'Step':['1-1', '2-4.1', '3-1', None, '3-1']})
+    assert step_id_creator(pouch).tolist()[:3] == [1, 2, 2]
+    assert np.isnan(step_id_creator(pouch).iloc[3])
+
+
+@pytest.mark.parametrize('noise, max_steps, min_accuracy', [(0.0, 25, 0.99), (3e-3, 35, 0.93)])
+def test_segment_steps_noisy_current(noise, max_steps, min_accuracy):
+    from battery_parser.benchmarks.synthetic import generate_cycling_data
+    from battery_parser.modifications import segment_steps
+    data = generate_cycling_data(cycles=5, rows_per_step=1000)
+    data['I'] += np.random.default_rng(1).normal(0, noise, len(data))
+    result = segment_steps(data)
+    assert 25 <= result['Step'].max() <= max_steps
+    assert (result['Status'] == data['Status']).mean() >= min_accuracy
+
+
+def test_fill_runs_does_not_cross_groups():
+    from battery_parser.modifications import _fill_runs
+    codes = pd.Series([1.0, np.nan, np.nan, 2.0, np.nan])
+    filled = _fill_runs(codes, groups=np.array([1, 2, 2, 3, 3]))
+    assert filled[[0, 3, 4]].tolist() == [1.0, 2.0, 2.0]
+    assert np.isnan(filled[1:3]).all()
+
+
+def reference_counting(data):
+    """Per-step trapezoidal capacity and energy in plain loop, net charge for SoC."""
+    time, current, voltage, step = (data[column].tolist() for column in ('Time', 'I', 'E', 'Step'))
+    capacity, energy, throughput, net = [0.0], [0.0], [0.0], [0.0]
+    for i in range(1, len(data)):
+        dt = time[i] - time[i - 1]
+        if step[i] != step[i - 1]:
+            capacity.append(0.0)
+            energy.append(0.0)
+            throughput.append(throughput[-1])
+            net.append(net[-1])
+            continue
+        if not dt > 0:  # time going back, NaN
+            dt = 0.0
+        charge = (current[i] + current[i - 1]) / 2 * dt / 3600
+        work = (current[i] * voltage[i] + current[i - 1] * voltage[i - 1]) / 2 * dt / 3600
+        capacity.append(capacity[-1] + charge)
+        energy.append(energy[-1] + work)
+        throughput.append(throughput[-1] + abs(charge))
+        net.append(net[-1] + charge)
+    return [np.array(values) for values in (capacity, energy, throughput, net)]
+
+
+@pytest.fixture
+def counting_data():
+    rng = np.random.default_rng(0)
+    n = 400
+    time = np.cumsum(rng.uniform(0.5, 2.0, n))
+    time[220:] -= 150.0  # second file merged with overlapping time
+    time[[60, 61, 310]] = np.nan
+    step = np.repeat([1, 2, 3, 4, 1, 5, 2, 6], n // 8)  # labels repeated in later blocks
+    current = np.select([step == 1, step == 2, step == 4, step == 5], [1.5, -2.0, 0.5, -1.0], 0.0)
+    current = current + rng.normal(0, 0.01, n)
+    voltage = 3.7 + 0.001 * np.cumsum(current) + rng.normal(0, 1e-3, n)
+    return pd.DataFrame({'Time':time, 'I':current, 'E':voltage, 'Step':step}, index=np.arange(n) + 1000)
+
+
+def test_coulomb_counting_matches_loop(counting_data):
+    capacity, energy, throughput, net = reference_counting(counting_data)
+    result = coulomb_counting(counting_data)
+    assert list(result.columns) == ['Q', 'Q_throughput', 'Energy', 'SoC']
+    assert (result.index == counting_data.index).all()
+    np.testing.assert_allclose(result['Q'], np.abs(capacity), atol=1e-12)
+    np.testing.assert_allclose(result['Energy'], np.abs(energy), atol=1e-12)
+    np.testing.assert_allclose(result['Q_throughput'], throughput, atol=1e-12)
+    signed = coulomb_counting(counting_data, absolute=False)
+    np.testing.assert_allclose(signed['Q'], capacity, atol=1e-12)
+    np.testing.assert_allclose(signed['Energy'], energy, atol=1e-12)
+
+
+def test_coulomb_counting_skips_reversed_and_missing_time(counting_data):
+    result = coulomb_counting(counting_data, absolute=False)
+    capacity = result['Q'].to_numpy()
+    for position in (60, 61, 62, 220, 310, 311):  # intervals ending at NaN time, after it, time going back
+        assert capacity[position] == capacity[position - 1]
+    assert np.isfinite(result.to_numpy()).all()
+    # without step resets all blocks are integrated into one running sum
+    total = coulomb_counting(counting_data, step_column=None, voltage_column=None, absolute=False)
+    assert 'Energy' not in total
+    assert total['Q'].iloc[100] != total['Q'].iloc[99] and total['Q'].iloc[100] != 0.0
+    assert total['Q'].iloc[220] == total['Q'].iloc[219]
+
+
+@pytest.mark.parametrize('reference, position, soc', [('max', None, 1.0), ('min', None, 0.0), ('first', 0, 0.0),
+                                                      ('last', -1, 0.0), (1250, 250, 0.0)])
+def test_coulomb_counting_soc_reference(counting_data, reference, position, soc):
+    net = reference_counting(counting_data)[3]
+    capacity = net.max() - net.min()
+    if position is None:
+        position = int(np.argmax(net)) if reference == 'max' else int(np.argmin(net))
+    result = coulomb_counting(counting_data, reference=reference)
+    np.testing.assert_allclose(result['SoC'], soc + (net - net[position]) / capacity, atol=1e-12)
+    assert result['SoC'].iloc[position] == pytest.approx(soc)
+    if reference in ('max', 'min'):
+        assert result['SoC'].min() == pytest.approx(0.0) and result['SoC'].max() == pytest.approx(1.0)
+
+    given = coulomb_counting(counting_data, reference=reference, reference_soc=0.5, capacity=2.0)
+    np.testing.assert_allclose(given['SoC'], 0.5 + (net - net[position]) / 2.0, atol=1e-12)
@@ -0,0 +1,79 @@
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+from battery_parser.importing import UnsupportedNdcError, import_ndax
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'data', 'ndax')  # see README.md there
+VERSIONS = {'v2':(1200, -200.0, ['V1', 'T1']),
+            'v5':(1200, -200.0, []),
+            'v11':(1199, -1500.0, []),
+            'v14':(1199, -1500.0, ['T1', 'H2']),
+            'v16':(1199, -1500.0, []),
+            'v17':(1199, -1500.0, ['T1', 'H2'])}
+
+
+@pytest.mark.parametrize('version', VERSIONS)
+def test_import_ndax(version):
+    rows, current, aux_columns = VERSIONS[version]
+    data = import_ndax(os.path.join(FIXTURES, f'{version}.ndax'))
+    assert len(data) == rows
+    if aux_columns:
+        assert list(data.columns[-len(aux_columns):]) == aux_columns
+    assert data['Step'].max() == 14 and data['Cycle'].max() == 4
+    assert data['Current(mA)'].sum() == pytest.approx(current)
+    assert data['Index'].is_monotonic_increasing
+    assert data['Time'].notna().all() and data['Timestamp'].notna().all()
+
+
+ARCHIVES = sorted(name[:-len('.ndax')] for name in os.listdir(FIXTURES) if name.endswith('.ndax'))
+
+
+@pytest.mark.parametrize('name', ARCHIVES)
+def test_import_ndax_chunks(name):
+    path = os.path.join(FIXTURES, f'{name}.ndax')
+    chunks = list(import_ndax(path, chunksize=300))
+    assert len(chunks) > 1 or name == 'v2'  # version 2 has no pages
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), import_ndax(path))
+
+
+@pytest.mark.parametrize('name', ARCHIVES)
+def test_import_ndax_as_neware_nda(name):
+    """Reference outputs of NewareNDA.read (make_ndax.py --references), navani_v5 is a real instrument file."""
+    data = import_ndax(os.path.join(FIXTURES, f'{name}.ndax'))
+    reference = pd.read_csv(os.path.join(FIXTURES, f'{name}.reference.csv.gz'))
+    timestamp = data['Timestamp']
+    if isinstance(timestamp.dtype, pd.DatetimeTZDtype):
+        data['Timestamp'] = timestamp.dt.tz_convert('UTC')
+        reference['Timestamp'] = pd.to_datetime(reference['Timestamp'], utc=True)
+    else:
+        reference['Timestamp'] = pd.to_datetime(reference['Timestamp'])
+    data['Status'] = data['Status'].astype(str)
+    pd.testing.assert_frame_equal(data, reference, check_dtype=False, check_like=False, atol=1e-5)
+
+
+@pytest.fixture
+def unsupported(tmp_path):
+    path = tmp_path / 'unsupported.ndax'
+    header = bytearray(4096)
+    header[0], header[2] = 1, 99  # data.ndc of unknown version
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('data.ndc', bytes(header))
+    return path
+
+
+def test_unsupported_raises_before_iteration(unsupported):
+    with pytest.raises(UnsupportedNdcError):
+        import_ndax(unsupported, chunksize=10, fallback=False)
+
+
+def test_unsupported_falls_back_to_neware_nda(unsupported, tmp_path, monkeypatch):
+    (tmp_path / 'NewareNDA.py').write_text('import pandas as pd\n'
+                                           'def read(path, **kwargs):\n'
+                                           '    return pd.DataFrame({"Index":[1, 2], "Voltage":[3.5, 3.6]})\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(__import__('sys').modules, 'NewareNDA', raising=False)
+    chunks = list(import_ndax(unsupported, chunksize=10))
+    assert len(chunks) == 1 and chunks[0]['Voltage'].tolist() == [3.5, 3.6]
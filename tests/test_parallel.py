@@ -0,0 +1,65 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_parser.modifications import extract_sequences
+from battery_parser.parallel import SharedFrame, attach, build_frame, extract_sequences_parallel
+
+
+def rebuild(spec, positions):
+    views = attach(spec)
+    return build_frame(spec, views, positions), {name:views[name].copy() for name in spec['arrays']}
+
+
+def attach_both(first, second):
+    views = attach(first)
+    attach(second)
+    return views['I'].sum()  # views of first frame are valid after attaching to second
+
+
+@pytest.fixture(scope='module')
+def experiment():
+    from battery_parser.benchmarks.synthetic import generate_cycling_data
+    data = generate_cycling_data(cycles=3, rows_per_step=30)
+    data.index = data.index + 100
+    data['Label'] = np.where(data['I'] > 0, 'charge', None)
+    data['Flag'] = data['I'] < 0
+    data['DateTime'] = pd.Timestamp('2024-05-03 10:00') + pd.to_timedelta(data['Time'], unit='s')
+    data['Local'] = data['DateTime'].dt.tz_localize('Europe/Moscow')
+    return data
+
+
+def test_shared_frame_round_trip(experiment):
+    order = np.arange(len(experiment))[::-1]
+    with SharedFrame(experiment, extra={'order':order}) as shared, ProcessPoolExecutor(max_workers=1) as pool:
+        frame, arrays = pool.submit(rebuild, shared.spec, slice(None)).result()
+        part, _ = pool.submit(rebuild, shared.spec, np.array([5, 2, 40])).result()
+    pd.testing.assert_frame_equal(frame, experiment)
+    pd.testing.assert_frame_equal(part, experiment.iloc[[5, 2, 40]])
+    np.testing.assert_array_equal(arrays['order'], order)
+    assert shared.spec['columns'][0]['block'] and not shared._blocks  # released on exit
+
+
+def test_attachments_kept_until_worker_exits(experiment):
+    with SharedFrame(experiment, columns=['I']) as first, SharedFrame(experiment.iloc[:10], columns=['I']) as second, \
+            ProcessPoolExecutor(max_workers=1) as pool:
+        assert pool.submit(attach_both, first.spec, second.spec).result() == pytest.approx(experiment['I'].sum())
+
+
+@pytest.mark.parametrize('time_merge', ['remove_first', 10])
+def test_extract_sequences_parallel_as_serial(experiment, time_merge, tmp_path):
+    sequences = [[1, 2, 3], [4, 5], [7, 8, 9, 10], [11, 99]]  # 99 - missing step
+    serial = extract_sequences(experiment, sequences, time_merge)
+    parallel = extract_sequences_parallel(experiment, sequences, time_merge, workers=2)
+    assert len(parallel) == len(serial)
+    for left, right in zip(parallel, serial):
+        pd.testing.assert_frame_equal(left, right)
+
+    assert extract_sequences_parallel(experiment, sequences, time_merge, workers=2, dir_path=str(tmp_path),
+                                      columns=['Step', 'Time', 'I', 'E']) is None
+    for i, sequence in enumerate(serial):
+        saved = pd.read_csv(tmp_path / f'{i}.csv', index_col=0)
+        np.testing.assert_allclose(saved[['Time', 'I', 'E']], sequence[['Time', 'I', 'E']])
+        assert saved.index.tolist() == sequence.index.tolist()
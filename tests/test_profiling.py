@@ -0,0 +1,89 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from battery_parser.profiling import Profiler, profiled
+
+
+@profiled
+def inner(data: pd.DataFrame):
+    time.sleep(0.01)
+    return data.iloc[:2]
+
+
+@profiled(stage='outer_stage')
+def outer(data: pd.DataFrame, repeat: int = 2):
+    return [inner(data) for _ in range(repeat)]
+
+
+@profiled(reads='source', writes='destination')
+def copy_file(source, destination):
+    with open(source, 'rb') as f, open(destination, 'wb') as g:
+        g.write(f.read() * 2)
+    return destination
+
+
+@profiled
+def failing(value):
+    raise KeyError(value)
+
+
+def test_pass_through_without_profiler():
+    data = pd.DataFrame({'a':range(5)})
+    result = outer(data, repeat=3)
+    assert len(result) == 3 and result[0].equals(data.iloc[:2])
+    assert outer.__name__ == 'outer' and outer.__wrapped__.__name__ == 'outer'
+    with pytest.raises(KeyError, match='x'):
+        failing('x')
+
+
+def test_records_timings_and_call_counts():
+    data = pd.DataFrame({'a':range(5)})
+    with Profiler() as profiler:
+        with profiler.file('cell.csv'):
+            result = outer(data, repeat=3)
+        inner(data)
+    assert [len(part) for part in result] == [2, 2, 2]
+    assert len(inner(data)) == 2  # profiler is inactive after exit
+
+    records = profiler.to_frame()
+    assert records['stage'].tolist() == ['inner'] * 3 + ['outer_stage', 'inner']
+    assert records['depth'].tolist() == [1, 1, 1, 0, 0]
+    assert records['file'].tolist()[:4] == ['cell.csv'] * 4 and pd.isna(records['file'].iloc[4])
+    assert records['rows'].tolist() == [5] * 5  # rows of dataframe argument
+    assert (records['wall_time_s'] >= 0.01).all()
+    assert records.loc[3, 'wall_time_s'] >= records.loc[:2, 'wall_time_s'].sum()
+    assert records['error'].isna().all()
+
+    table = profiler.profile_table()
+    assert table.loc[('cell.csv', 'inner'), 'calls'] == 3
+    assert table.loc[('cell.csv', 'outer_stage'), 'calls'] == 1
+    assert table.loc[('', 'inner'), 'calls'] == 1
+    assert table.loc[('cell.csv', 'inner'), 'rows'] == 15
+    assert list(profiler.profile_table(depth=0).index) == [('cell.csv', 'outer_stage'), ('', 'inner')]
+
+
+def test_exceptions_are_recorded_and_raised():
+    with Profiler() as profiler:
+        with pytest.raises(KeyError, match='missing'):
+            failing('missing')
+        inner(pd.DataFrame({'a':[1]}))
+    records = profiler.to_frame()
+    assert records['stage'].tolist() == ['failing', 'inner']
+    assert records.loc[0, 'error'] == "KeyError('missing')"
+    assert records['depth'].tolist() == [0, 0]  # depth restored after exception
+
+
+def test_bytes_and_cprofile_dumps(tmp_path):
+    source = tmp_path / 'source.bin'
+    source.write_bytes(b'x' * 100)
+    with Profiler(cprofile_dir=str(tmp_path / 'profiles')) as profiler:
+        with profiler.file(str(source)):
+            assert copy_file(str(source), str(tmp_path / 'copy.bin')) == str(tmp_path / 'copy.bin')
+            outer(pd.DataFrame({'a':range(3)}), repeat=1)
+    records = profiler.to_frame()
+    assert records.loc[0, ['bytes_read', 'bytes_written']].tolist() == [100, 200]
+    assert sorted(os.listdir(tmp_path / 'profiles')) == ['source.bin_copy_file_0.prof',
+                                                         'source.bin_outer_stage_2.prof']  # top-level calls, numbered by records
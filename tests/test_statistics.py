@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from battery_parser.statistics import find_pattern
+
+
+def test_find_pattern_signs_unnamed_series():
+    current = pd.Series([1.0, -1.0, 0.0, 2.0, -0.5, 0.0, 1.0])
+    assert find_pattern(current, '+-0') == [[0, 1, 2], [3, 4, 5]]
+
+
+def test_find_pattern_signs_named_series_keeps_index():
+    current = pd.Series([1.0, -1.0, 0.0, 1.0], index=[10, 11, 12, 13], name='I_mean')
+    assert find_pattern(current, '+-0') == [[10, 11, 12]]
+
+
+def test_find_pattern_conditions():
+    statistics = pd.DataFrame({'I_mean':[1.0, 0.0, -1.0, 1.0, 0.0, -1.0],
+                               'Time_range':[100, 10, 90, 100, 5, 95]})
+    pattern = [{'I_mean':('sign', '+')}, {'Time_range':('<', 20)}, {'I_mean':('sign', '-')}]
+    assert find_pattern(statistics, pattern) == [[0, 1, 2], [3, 4, 5]]
+
+
+@pytest.fixture(scope='module')
+def cycling():
+    from battery_parser.benchmarks.synthetic import generate_cycling_data
+    data = generate_cycling_data(cycles=4, rows_per_step=50)
+    data.loc[data['Step'] == 7, 'Step'] = 3  # step repeated far from its first block, across partitions
+    data['Channel'] = np.where(np.arange(len(data)) < len(data) // 2, 1, 2)
+    return data
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+@pytest.mark.parametrize('group_marker', ['Step', ['Channel', 'Step']])
+def test_parallel_statistics_as_serial(cycling, executor, group_marker):
+    from battery_parser.statistics import generate_statistics, parallel_statistics
+    serial = generate_statistics(cycling, group_marker)
+    parallel = pd.DataFrame(parallel_statistics(cycling, group_marker, workers=3, executor=executor))
+    pd.testing.assert_frame_equal(parallel, serial)
+    pd.testing.assert_frame_equal(generate_statistics(cycling, group_marker, workers=3, executor=executor), serial)
+
+
+def test_cache_reuses_column_method_pairs(cycling):
+    from battery_parser.statistics import StatisticsCache, generate_statistics
+    cache = StatisticsCache()
+    pattern = {'I':['mean', 'max'], 'E':'mean'}
+    first = generate_statistics(cycling, 'Step', pattern, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 3)
+    pd.testing.assert_frame_equal(first, generate_statistics(cycling, 'Step', pattern))
+
+    second = generate_statistics(cycling, 'Step', pattern, cache=cache)
+    assert (cache.hits, cache.misses) == (3, 3)
+    pd.testing.assert_frame_equal(second, first)
+
+    extended = generate_statistics(cycling, 'Step', {'I':['mean', 'min'], 'E':'mean'}, cache=cache)
+    assert (cache.hits, cache.misses) == (5, 4)  # only I_min is computed
+    pd.testing.assert_frame_equal(extended, generate_statistics(cycling, 'Step', {'I':['mean', 'min'], 'E':'mean'}))
+
+    generate_statistics(cycling, ['Channel', 'Step'], pattern, cache=cache)
+    assert cache.misses == 7  # group marker is part of the key
+
+
+def test_cache_invalidated_by_data_changes(cycling):
+    from battery_parser.statistics import StatisticsCache, generate_statistics
+    cache = StatisticsCache()
+    pattern = {'I':'mean'}
+    generate_statistics(cycling, 'Step', pattern, cache=cache)
+
+    changed = cycling.copy()
+    changed.iloc[0, changed.columns.get_loc('I')] += 1.0  # first row is always in sample
+    result = generate_statistics(changed, 'Step', pattern, cache=cache)
+    assert cache.misses == 2
+    pd.testing.assert_frame_equal(result, generate_statistics(changed, 'Step', pattern))
+
+    generate_statistics(changed.iloc[:-1], 'Step', pattern, cache=cache)  # shape
+    generate_statistics(changed.rename(columns={'E':'U'}), 'Step', pattern, cache=cache)  # column names
+    assert cache.misses == 4
+
+
+def test_cache_sample_misses_unsampled_rows(cycling):
+    from battery_parser.statistics import StatisticsCache, generate_statistics
+    pattern = {'I':'mean'}
+    cycling = pd.concat([cycling] * 3, ignore_index=True)  # more than 2 rows per sampled row
+    changed = cycling.copy()
+    changed.iloc[1, changed.columns.get_loc('I')] += 1.0  # between first and second sampled rows
+
+    sampled = StatisticsCache()
+    stale = generate_statistics(cycling, 'Step', pattern, cache=sampled)
+    pd.testing.assert_frame_equal(generate_statistics(changed, 'Step', pattern, cache=sampled), stale)
+    assert sampled.hits == 1  # documented limitation of sampled fingerprint
+
+    exact = StatisticsCache(sample=None)
+    generate_statistics(cycling, 'Step', pattern, cache=exact)
+    result = generate_statistics(changed, 'Step', pattern, cache=exact)
+    assert exact.hits == 0
+    pd.testing.assert_frame_equal(result, generate_statistics(changed, 'Step', pattern))
+
+
+def test_cache_on_disk_shared_between_instances(cycling, tmp_path):
+    from battery_parser.statistics import StatisticsCache, generate_statistics
+    pattern = {'I':'mean', 'E':['min', 'max']}
+    first = generate_statistics(cycling, 'Step', pattern, cache=StatisticsCache(directory=str(tmp_path)))
+    reopened = StatisticsCache(directory=str(tmp_path))
+    pd.testing.assert_frame_equal(generate_statistics(cycling, 'Step', pattern, cache=reopened), first)
+    assert (reopened.hits, reopened.misses) == (3, 0)
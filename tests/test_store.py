@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from battery_parser.store import read_steps, save_step_store, step_index
+
+
+@pytest.mark.parametrize('index', [np.arange(10, 20), np.arange(10)[::-1]])
+@pytest.mark.parametrize('columns', [None, ['E']])
+def test_read_steps_keeps_index_name(tmp_path, index, columns):
+    data = pd.DataFrame({'Index':index, 'Step':np.repeat([1, 2], 5), 'E':np.arange(10.0)}).set_index('Index')
+    save_step_store(data, tmp_path / 'store.parquet', min_group_rows=1)
+    result = read_steps(tmp_path / 'store.parquet', [2], columns=columns)
+    expected = data.iloc[5:] if columns is None else data.iloc[5:][columns]
+    pd.testing.assert_frame_equal(result, expected, check_index_type=False)
+
+
+def test_numpy_step_values_stay_numbers(tmp_path):
+    steps = pd.Series([np.int64(1)] * 3 + [np.int64(2)] * 3, dtype=object)
+    data = pd.DataFrame({'Step':steps, 'E':np.arange(6.0)})
+    save_step_store(data, tmp_path / 'store.parquet', min_group_rows=1)
+    assert step_index(tmp_path / 'store.parquet')['step'].tolist() == [1, 2]
+    assert read_steps(tmp_path / 'store.parquet', [2])['E'].tolist() == [3.0, 4.0, 5.0]
@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+from battery_parser.files.transaction import Plan, Transaction
+
+
+@pytest.fixture
+def tree(tmp_path):
+    archive = tmp_path / 'archive'
+    (archive / 'a').mkdir(parents=True)
+    for name in ('f1', 'f2', 'f3'):
+        (archive / 'a' / name).write_text(name)
+    return archive, tmp_path / 'reorganize.journal'
+
+
+def test_run_and_rollback(tree):
+    archive, journal = tree
+    plan = Plan()
+    plan.mkdir(archive / 'b')
+    plan.move(archive / 'a' / 'f1', archive / 'b' / 'f1')
+    plan.copy(archive / 'a' / 'f2', archive / 'a' / 'f3')
+    plan.delete(archive / 'a' / 'f2')
+    transaction = Transaction(journal, workers=1)
+    assert transaction.run(plan) == {'done':4, 'skipped':0, 'failed':0}
+    assert sorted(p.name for p in (archive / 'a').iterdir()) == ['f3']
+    assert (archive / 'a' / 'f3').read_text() == 'f2'
+    assert (archive / 'b' / 'f1').read_text() == 'f1'
+
+    transaction = Transaction(journal, workers=1)  # откат по журналу
+    assert transaction.rollback() == {'undone':4, 'failed':0}
+    assert not (archive / 'b').exists()
+    assert {p.name:p.read_text() for p in (archive / 'a').iterdir()} == {'f1':'f1', 'f2':'f2', 'f3':'f3'}
+
+
+def test_resume_skips_done_operations(tree):
+    archive, journal = tree
+    plan = Plan()
+    plan.delete(archive / 'a' / 'f1')
+    plan.delete(archive / 'a' / 'f2')
+    transaction = Transaction(journal, workers=1)
+    transaction.begin(plan)
+    transaction._execute(plan.operations[0])
+    with open(journal, 'a', encoding='utf-8') as f:  # сбой во время операции
+        f.write(json.dumps({'event':'start', 'id':1}) + '\n{"event": "do')
+    result = Transaction(journal, workers=1).run()
+    assert result == {'done':1, 'skipped':1, 'failed':0}
+    assert sorted(p.name for p in (archive / 'a').iterdir()) == ['f3']
+
+
+def test_plans_sharing_journal_do_not_share_backups(tree):
+    archive, journal = tree
+    first = Plan()
+    first.delete(archive / 'a' / 'f1')
+    Transaction(journal, workers=1).run(first)
+    second = Plan()
+    second.delete(archive / 'a' / 'f2')
+    transaction = Transaction(journal, workers=1)
+    assert transaction.run(second)['done'] == 1
+    assert not (archive / 'a' / 'f2').exists()
+    transaction.rollback()
+    assert (archive / 'a' / 'f2').read_text() == 'f2'
+
+
+def test_foreign_backup_is_not_reused(tree):
+    archive, journal = tree
+    plan = Plan()
+    plan.delete(archive / 'a' / 'f1')
+    transaction = Transaction(journal, workers=1)
+    transaction.begin(plan)
+    backup = transaction._backup_path(plan.operations[0])
+    backup.parent.mkdir(parents=True)
+    backup.write_text('other')
+    assert transaction.run()['failed'] == 1
+    assert (archive / 'a' / 'f1').exists()
+
+
+def test_purge(tree):
+    archive, journal = tree
+    plan = Plan()
+    plan.delete(archive / 'a' / 'f1')
+    plan.mkdir(archive / 'b')
+    transaction = Transaction(journal, workers=1)
+    transaction.run(plan)
+    assert any(transaction.trash.iterdir())
+    transaction.purge()
+    assert not transaction.trash.exists()
+    transaction = Transaction(journal, workers=1)
+    assert transaction.rollback() == {'undone':1, 'failed':1}
+    assert not (archive / 'b').exists()
+
+
+def test_same_plan_rerun_after_completion(tree):
+    archive, journal = tree
+    plan = Plan()
+    plan.delete(archive / 'a' / 'f1')
+    assert Transaction(journal, workers=1).run(plan)['done'] == 1
+    (archive / 'a' / 'f1').write_text('again')
+    transaction = Transaction(journal, workers=1)
+    assert transaction.run(plan) == {'done':1, 'skipped':0, 'failed':0}
+    assert not (archive / 'a' / 'f1').exists()
+    transaction.rollback()
+    assert (archive / 'a' / 'f1').read_text() == 'again'
+
+
+def test_new_plan_after_rollback(tree):
+    archive, journal = tree
+    first = Plan()
+    first.delete(archive / 'a' / 'f1')
+    transaction = Transaction(journal, workers=1)
+    transaction.run(first)
+    transaction.rollback()
+    second = Plan()
+    second.delete(archive / 'a' / 'f2')
+    assert Transaction(journal, workers=1).run(second)['done'] == 1
+    assert sorted(p.name for p in (archive / 'a').iterdir()) == ['f1', 'f3']